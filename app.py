@@ -1,4 +1,5 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import time
 from datetime import datetime
 import os
@@ -15,12 +16,17 @@ except ImportError:
 from modules.auth import AuthManager
 from modules.database_sqlite import SQLiteDatabase as Database
 from modules.chat_handler import ChatHandler
+from modules.chat_view import ChatHistoryView
 from modules.ui_components import render_sidebar
 from modules.archive_manager import ArchiveManager
+from modules.archive_export import ArchiveExporter, EXPORT_FORMATS, EXPORT_MAX_BYTES, ZIP_MEMBER_FORMATS
 from modules.request_counter import RequestCounter
+from modules.session_events import SessionEvents, QUOTA_CHANGED
 from modules.tab_manager import TabManager
 from modules.model_manager import ModelManager
+from modules.trace_panel import TracePanel
 from utils.config import setup_config
+from utils.metrics import start_metrics_server, mark_session_active
 from utils.helpers import load_css
 
 # ============================================
@@ -55,6 +61,11 @@ load_css()
 
 MAX_FREE_REQUESTS = int(os.getenv('MAX_FREE_REQUESTS', 15))
 
+# Métriques : /metrics servi sur le port local (une seule fois par processus)
+start_metrics_server()
+_script_ctx = get_script_run_ctx()
+mark_session_active(_script_ctx.session_id if _script_ctx else None)
+
 if not GOOGLE_API_KEY:
     st.warning("⚠️ Clé API manquante. Veuillez configurer votre clé API dans les secrets Streamlit.")
     st.info("Comment configurer :\n1. Allez dans Settings → Secrets\n2. Ajoutez `GOOGLE_API_KEY = 'votre-clé'`")
@@ -191,8 +202,20 @@ def _render_chat_interface():
     if st.session_state.viewing_archive_id is not None:
         st.info("📖 Consultation d'une ancienne conversation")
 
-    # Message d'accueil
-    if st.session_state.chat_session and not st.session_state.chat_session.history:
+    _render_chat_messages()
+
+
+@st.fragment
+def _render_chat_messages():
+    """
+    Historique et saisie dans un fragment : l'envoi d'un message ne réexécute que
+    cette partie (la barre latérale n'est pas redessinée)
+    """
+    # Zone de saisie (toujours affichée en bas de page, lue avant le message d'accueil)
+    user_input = st.chat_input("Posez une question à Simandou...")
+
+    # Message d'accueil, dans le fragment : masqué dès l'envoi du premier message
+    if st.session_state.chat_session and not st.session_state.chat_session.history and not user_input:
         st.markdown("""
         <div class="welcome-card">
             <h2 style="margin-bottom: 1rem; font-size: clamp(1.5rem, 4vw, 2rem);">👋 Wontanara !</h2>
@@ -203,48 +226,53 @@ def _render_chat_interface():
         </div>
         """, unsafe_allow_html=True)
 
-    # Afficher l'historique du chat
+    # Afficher l'historique du chat (derniers messages, les précédents à la demande)
     if st.session_state.chat_session:
-        for message in st.session_state.chat_session.history:
-            role = message.role
-            avatar = "👤" if role == "user" else "🤖"
-
-            with st.chat_message(role, avatar=avatar):
-                if hasattr(message, 'parts'):
-                    text_part = next((part.text for part in message.parts if hasattr(part, 'text')), "")
-                elif hasattr(message, 'text'):
-                    text_part = message.text
-                else:
-                    text_part = str(message)
-
-                if text_part:
-                    st.markdown(text_part)
-
-    # Zone de saisie
-    user_input = st.chat_input("Posez une question à Simandou...")
+        ChatHistoryView.render(st.session_state.chat_session.history, 'chat')
 
     # Traitement de la requête
     if user_input:
+        quota_version = SessionEvents.version(QUOTA_CHANGED)
         chat_handler.process_user_query(user_input)
+        if SessionEvents.version(QUOTA_CHANGED) != quota_version:
+            # Le compteur de la barre latérale est hors de ce fragment : la page est réaffichée
+            st.rerun()
 
 
 def _render_settings_interface():
     """Affiche l'interface des paramètres sans détails techniques"""
     st.header("Paramètres")
-#
-#     # Option d'export
-#     st.subheader("Export des données")
-#     if st.button("Exporter les archives", use_container_width=True):
-#         if hasattr(db, 'export_to_json'):
-#             data = db.export_to_json(st.session_state.username)
-#             filename = f"archives_{st.session_state.username}_{datetime.now().strftime('%Y%m%d')}.json"
-#
-#             st.download_button(
-#                 label="Télécharger",
-#                 data=data,
-#                 file_name=filename,
-#                 mime="application/json"
-#             )
+
+    # Option d'export
+    st.subheader("Export des données")
+    export_format = st.radio(
+        "Format d'export",
+        ['ndjson', 'zip'],
+        format_func=lambda fmt: "JSON Lines (une archive par ligne)" if fmt == 'ndjson'
+        else "ZIP (un fichier par archive)",
+        horizontal=True
+    )
+    formats = ZIP_MEMBER_FORMATS
+    if export_format == 'zip':
+        formats = st.multiselect("Fichiers par archive", list(ZIP_MEMBER_FORMATS), default=['json', 'txt'])
+
+    exporter = ArchiveExporter(db, st.session_state.username)
+
+    st.download_button(
+        label="📦 Exporter toutes les archives",
+        # Généré au clic seulement (hors de l'exécution du script), puis chargé en mémoire par Streamlit
+        data=lambda: exporter.download_data(export_format, tuple(formats)),
+        help=f"Export limité à {EXPORT_MAX_BYTES // (1024 * 1024)} Mo depuis l'interface",
+        file_name=exporter.export_file_name(export_format),
+        mime=EXPORT_FORMATS[export_format][0],
+        use_container_width=True
+    )
+
+    # Débogage : cascade des dernières requêtes (administrateurs uniquement)
+    if TracePanel.is_admin(st.session_state.username):
+        st.divider()
+        TracePanel.render()
+
 
 def render_main_interface():
     """Affiche l'interface principale"""
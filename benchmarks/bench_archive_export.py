@@ -0,0 +1,88 @@
+"""
+Benchmark de l'export des archives (dictionnaire complet + json.dumps vs export en flux)
+
+Crée une base SQLite temporaire de N archives, puis mesure dans un processus
+dédié par méthode le temps, la mémoire maximale et la taille produite.
+
+Usage : python -m benchmarks.bench_archive_export [nombre_d_archives]
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import tempfile
+from datetime import datetime
+from multiprocessing import Pool
+
+from modules.archive_export import ArchiveExporter
+from modules.database_sqlite import SQLiteDatabase
+
+USERNAME = 'benchmark'
+WORDS = ("gisement minerai bauxite fer transport port rail concession état investissement "
+         "communauté emploi environnement rapport production tonnes capacité étude").split()
+
+
+def _create_database(path, count):
+    database = SQLiteDatabase(path)
+    database.save_user(USERNAME, {'password_hash': 'x', 'security_q_index': 0, 'security_a_hash': 'x'})
+    user_id = database.get_user(USERNAME)['id']
+
+    rng = random.Random(3)
+    rows = []
+    for number in range(count):
+        history = []
+        for turn in range(rng.randint(4, 12)):
+            role = 'user' if turn % 2 == 0 else 'model'
+            history.append({'role': role, 'text': " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 80)))})
+        rows.append((user_id, f"Conversation {number}", json.dumps(history), datetime.now().isoformat()))
+
+    with database._get_cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO chat_archives (user_id, title, chat_data, archived_at) VALUES (?, ?, ?, ?)", rows
+        )
+    return os.path.getsize(path)
+
+
+def _run_method(args):
+    """Exécuté dans un processus dédié pour isoler la mesure mémoire"""
+    method, path, count, output_dir = args
+    database = SQLiteDatabase(path)
+    output_path = os.path.join(output_dir, f"export_{method}")
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+
+    if method == 'json complet':
+        # Ancien export : toutes les archives en mémoire puis une seule chaîne indentée
+        archives = database.get_user_archives(USERNAME, limit=count)
+        data = json.dumps({'username': USERNAME, 'export_date': datetime.now().isoformat(),
+                           'total_archives': len(archives), 'archives': archives},
+                          ensure_ascii=False, indent=2)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+    elif method == 'ndjson':
+        ArchiveExporter(database, USERNAME).write_to(output_path, 'ndjson')
+    else:
+        ArchiveExporter(database, USERNAME).write_to(output_path, 'zip', ('json', 'txt'))
+
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, (rss_after - rss_before) / 1024, os.path.getsize(output_path)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'archives.db')
+        db_size = _create_database(path, count)
+        print(f"{count} archives (base SQLite de {db_size / 1024 / 1024:.0f} Mo)")
+
+        for method in ('json complet', 'ndjson', 'zip json+txt'):
+            with Pool(1) as pool:
+                elapsed, rss_mb, size = pool.apply(_run_method, ((method, path, count, work_dir),))
+            print(f"{method:13s}: {elapsed:.2f} s, mémoire max +{rss_mb:.1f} Mo, {size / 1024 / 1024:.1f} Mo produits")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark de l'import par lot (DocumentWorkspace.classify_urls + run_with_host_limits)
+
+Ingère 100 URL (pages web et fichiers) réparties sur plusieurs serveurs locaux
+à latence simulée : traitement un par un (ancien comportement) puis par lot
+(classement et ingestion concurrents, limite par site). L'envoi à Gemini est
+remplacé par un faux envoi pour ne mesurer que la récupération et l'extraction.
+
+Usage : python -m benchmarks.bench_batch_ingestion [nombre_d_url] [latence_ms]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from types import SimpleNamespace
+
+os.environ.setdefault('SIMANDOU_CACHE_DIR', tempfile.mkdtemp(prefix='bench_batch_'))
+
+from benchmarks.bench_html_extraction import _build_page
+from benchmarks.local_http_server import start_server
+from modules import workspace as workspace_module
+from modules.media_extraction import MediaExtractor
+from modules.workspace import DocumentWorkspace, URL_SOURCE_TYPES, _source_host
+from utils.concurrency import run_with_host_limits
+
+SERVERS = 5
+
+
+def _fake_upload(file_path, display_name, mime_type_hint=None, progress=None):
+    os.unlink(file_path)
+    return SimpleNamespace(name=f"files/{display_name}")
+
+
+def _build_urls(count, base_urls):
+    rng = random.Random(42)
+    urls = []
+    for number in range(count):
+        base_url = base_urls[number % len(base_urls)]
+        if number % 5 < 3:
+            urls.append(f"{base_url}/page/{number}")
+        else:
+            urls.append(f"{base_url}/files/{rng.randint(100, 2000) * 1024}")
+    return urls
+
+
+def _ingest_one(url):
+    url_type = MediaExtractor.get_url_type(url)
+    source = DocumentWorkspace.url_source(url, URL_SOURCE_TYPES.get(url_type, 'url'))
+    return DocumentWorkspace._ingest_source(source)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    delay = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+    rng = random.Random(7)
+    routes = {f"/page/{number}": ('text/html; charset=utf-8', _build_page(rng, number)[0]) for number in range(count)}
+    servers = [start_server(routes, delay=delay) for _ in range(SERVERS)]
+    urls = _build_urls(count, [base_url for _, base_url in servers])
+    workspace_module.FileProcessor.upload_to_gemini = staticmethod(_fake_upload)
+
+    start = time.perf_counter()
+    sequential = [_ingest_one(url) for url in urls]
+    sequential_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classified = DocumentWorkspace.classify_urls(urls)
+    sources = [DocumentWorkspace.url_source(url, URL_SOURCE_TYPES.get(url_type, 'url')) for url, url_type in classified]
+    batch = run_with_host_limits(sources, DocumentWorkspace._ingest_source, _source_host,
+                                 max_workers=workspace_module.INGESTION_MAX_WORKERS,
+                                 per_host=workspace_module.INGESTION_PER_HOST)
+    batch_s = time.perf_counter() - start
+
+    ok_sequential = sum(1 for result in sequential if result[0])
+    ok_batch = sum(1 for _, result, error in batch if error is None and result[0])
+    print(f"{count} URL sur {SERVERS} sites, latence {delay * 1000:.0f} ms")
+    print(f"un par un : {sequential_s:6.2f} s ({ok_sequential}/{count} prêtes)")
+    print(f"par lot   : {batch_s:6.2f} s ({ok_batch}/{count} prêtes), "
+          f"{workspace_module.INGESTION_MAX_WORKERS} en parallèle, {workspace_module.INGESTION_PER_HOST} par site "
+          f"-> {sequential_s / batch_s:.1f}x")
+
+    for server, _ in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark de l'affichage des longues conversations (AppTest)
+
+Compare l'ancien rendu (tous les messages à chaque réexécution) au rendu fenêtré
+dans un fragment : temps d'exécution du script au premier affichage et après
+l'envoi d'un message, et nombre de messages rendus. AppTest réexécute tout le
+script : le gain du fragment (barre latérale non redessinée) s'y ajoute dans l'application.
+
+Usage : python -m benchmarks.bench_chat_rendering [nombre_de_messages]
+"""
+import sys
+import time
+import statistics
+
+from streamlit.testing.v1 import AppTest
+
+ROUNDS = 5
+
+
+def _chat_app(mode, count):
+    """Page de chat réduite : barre latérale, historique et saisie (exécutée par AppTest)"""
+    import random
+    import streamlit as st
+    from modules.chat_view import ChatHistoryView, message_text
+
+    class Part:
+        def __init__(self, text):
+            self.text = text
+
+    class Message:
+        def __init__(self, role, text):
+            self.role = role
+            self.parts = [Part(text)]
+
+    if 'history' not in st.session_state:
+        rng = random.Random(1)
+        words = ("gisement minerai bauxite fer transport port rail concession état investissement "
+                 "communauté emploi environnement rapport production tonnes capacité étude").split()
+        st.session_state.history = [
+            Message('user' if number % 2 == 0 else 'model',
+                    "\n\n".join(" ".join(rng.choice(words) for _ in range(60)) for _ in range(1 + number % 4)))
+            for number in range(count)
+        ]
+
+    with st.sidebar:
+        st.title("SIMANDOU-GN-IA")
+        for number in range(20):
+            st.button(f"Archive {number}", key=f"archive_{number}")
+
+    def _handle(query):
+        st.session_state.history.append(Message('user', query))
+        st.session_state.history.append(Message('model', f"Réponse à : {query}"))
+
+    if mode == 'legacy':
+        for message in st.session_state.history:
+            with st.chat_message(message.role):
+                text = message_text(message)
+                if text:
+                    st.markdown(text)
+        user_input = st.chat_input("Posez une question à Simandou...")
+        if user_input:
+            _handle(user_input)
+    else:
+        @st.fragment
+        def _messages():
+            ChatHistoryView.render(st.session_state.history, 'chat')
+            user_input = st.chat_input("Posez une question à Simandou...")
+            if user_input:
+                _handle(user_input)
+
+        _messages()
+
+
+def _measure(mode, count):
+    app = AppTest.from_function(_chat_app, args=(mode, count), default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+
+    reruns = []
+    for round_number in range(ROUNDS):
+        app.chat_input[0].set_value(f"question {round_number}")
+        start = time.perf_counter()
+        app.run()
+        reruns.append(time.perf_counter() - start)
+    return first, statistics.median(reruns), len(app.chat_message)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"Conversation de {count} messages, {ROUNDS} envois")
+    for mode in ('legacy', 'fenêtré'):
+        first, rerun, rendered = _measure(mode, count)
+        print(f"{mode:8s}: premier affichage {first * 1000:.0f} ms, réexécution après envoi {rerun * 1000:.0f} ms "
+              f"(médiane), {rendered} messages rendus")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark du moteur de téléchargement (modules.downloader.Downloader)
+
+Compare le débit de l'ancienne boucle (blocs de 8 Ko) avec le moteur
+(blocs adaptatifs, puis segments parallèles) sur un serveur local.
+
+Usage : python -m benchmarks.bench_downloads [taille_en_mo]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import requests
+
+from benchmarks.local_http_server import start_server
+from modules import downloader as downloader_module
+from modules.downloader import Downloader
+
+
+def _timed(label, size, func):
+    with tempfile.TemporaryDirectory(prefix='bench_download_') as work_dir:
+        path = os.path.join(work_dir, 'download.bin')
+        start = time.perf_counter()
+        func(path)
+        elapsed = time.perf_counter() - start
+        assert os.path.getsize(path) == size, "taille téléchargée incorrecte"
+    print(f"{label:<32} {elapsed:7.2f} s  {size / elapsed / (1024 * 1024):8.1f} Mo/s")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    size_bytes = size * 1024 * 1024
+    server, base_url = start_server()
+    url = f"{base_url}/files/{size_bytes}"
+
+    def legacy(path):
+        response = requests.get(url, stream=True, timeout=30)
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+
+    def engine(segments):
+        def run(path):
+            Downloader(url, segments=segments).start().save(path)
+        return run
+
+    try:
+        print(f"Fichier de {size} Mo servi par {base_url}")
+        _timed("requests, blocs de 8 Ko", size_bytes, legacy)
+        _timed("moteur, blocs adaptatifs", size_bytes, engine(1))
+        segments = downloader_module.PARALLEL_SEGMENTS
+        _timed(f"moteur, {segments} segments parallèles", size_bytes, engine(segments))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
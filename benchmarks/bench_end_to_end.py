@@ -0,0 +1,398 @@
+"""
+Benchmark de bout en bout avec un faux backend Gemini (testing.fake_genai)
+
+Rejoue des scénarios scriptés sur les classes réelles de l'application
+(AuthManager, DocumentWorkspace et FileProcessor, ChatHandler, ArchiveManager,
+ArchiveExporter) exécutées par AppTest, pour chaque base de données :
+inscription, connexions, envoi de documents, conversations de N tours,
+archivage, questions sur les archives, exports NDJSON et ZIP.
+
+Chaque base est mesurée dans un processus dédié : nombre d'opérations, erreurs,
+débit (opérations par seconde de traitement), latences p50/p95/p99 et mémoire
+maximale du processus à la fin du scénario.
+
+PostgreSQL (--postgres) utilise la configuration DB_HOST, DB_NAME... : à
+réserver à une base de test (un utilisateur « bench_<horodatage> » y est créé,
+ses archives sont supprimées à la fin).
+
+Lignes de base : --save-baseline enregistre les résultats, --compare signale
+les écarts au-delà de la tolérance (code de sortie 1 en cas de régression).
+
+Usage : python -m benchmarks.bench_end_to_end [--turns 50] [--conversations 2] [--postgres]
+        [--latency-ms 20] [--error-rate 0] [--processing-polls 0]
+        [--save-baseline | --compare] [--baseline chemin] [--tolerance 0.25]
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+from datetime import datetime
+from multiprocessing import Pool
+
+from streamlit.testing.v1 import AppTest
+
+from testing import fake_genai
+
+PASSWORD = 'benchmark-password'
+LOGIN_ROUNDS = 10
+SEARCH_QUESTIONS = 10  # Posées deux fois : la seconde série est servie par le cache des réponses
+EXPORT_ROUNDS = 3
+TIMEOUT = 300
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'bench_end_to_end.json')
+SCENARIOS = ('signup', 'login', 'upload', 'chat', 'archive', 'search', 'export_ndjson', 'export_zip')
+
+# Métrique -> écart absolu minimal pour signaler une régression (le débit se déduit de la moyenne)
+COMPARED_METRICS = {
+    'mean_ms': 5.0,
+    'p50_ms': 5.0,
+    'p95_ms': 10.0,
+    'p99_ms': 10.0,
+    'peak_mb': 10.0,
+}
+
+WORDS = ("gisement minerai bauxite fer transport port rail concession état investissement "
+         "communauté emploi environnement rapport production tonnes capacité étude").split()
+
+
+def _scenario_app(backend, db_path, username, password):
+    """Page réduite : services réels de l'application, une action scriptée par exécution"""
+    import io
+    import time
+    import types
+
+    import streamlit as st
+    from modules.archive_export import ArchiveExporter
+    from modules.archive_manager import ArchiveManager
+    from modules.auth import AuthManager
+    from modules.chat_handler import ChatHandler
+    from modules.model_manager import ModelManager
+    from modules.session_events import SessionEvents, ARCHIVES_CHANGED
+    from modules.workspace import DocumentWorkspace
+
+    @st.cache_resource
+    def _services():
+        if backend == 'postgres':
+            from modules.database import PostgreSQLDatabase
+            db = PostgreSQLDatabase()
+        else:
+            from modules.database_sqlite import SQLiteDatabase
+            db = SQLiteDatabase(db_path)
+        model_manager = ModelManager('fake-api-key')
+        chat_handler = ChatHandler(model_manager, db)
+        return db, AuthManager(db, model_manager), chat_handler, ArchiveManager(db, chat_handler)
+
+    db, auth, chat_handler, archive_manager = _services()
+
+    # Mêmes valeurs initiales que app.py
+    for key, default in {'logged_in': False, 'username': None, 'current_file': None, 'viewing_archive_id': None,
+                         'forgot_state': 0, 'user_stats': None, 'auth_token': None, 'login_time': None,
+                         'chat_session': None, 'results': []}.items():
+        if key not in st.session_state:
+            st.session_state[key] = default
+    if st.session_state.chat_session is None:
+        st.session_state.chat_session = chat_handler.model_manager.get_default_model().start_chat(history=[])
+
+    def _fail(message):
+        raise RuntimeError(message)
+
+    def _upload(payload):
+        name, mime_type, data = payload
+        uploaded_file = types.SimpleNamespace(name=name, type=mime_type, getvalue=lambda: data)
+        documents = chat_handler.workspace.ingest(username, [DocumentWorkspace.file_source(uploaded_file)])
+        if not documents or documents[0]['status'] != 'ready':
+            raise RuntimeError(f"Ingestion en échec : {name}")
+
+    def _search(payload):
+        question, position = payload
+        archives = SessionEvents.cached('archives', (ARCHIVES_CHANGED,),
+                                        lambda: db.get_user_archives(username, limit=100), scope=username)
+        archive_manager._process_archive_question(question, archives[position % len(archives)], username)
+
+    actions = {
+        'signup': lambda payload: auth.signup(username, password, 0, 'Conakry') or _fail("Inscription refusée"),
+        'setup': lambda payload: db.update_account_type(username, 'premium'),
+        'login': lambda payload: auth.login(username, password),
+        'upload': _upload,
+        'chat': chat_handler.process_user_query,
+        'archive': lambda payload: chat_handler.archive_and_start_new_chat(username),
+        'search': _search,
+        'export': lambda payload: ArchiveExporter(db, username).write_to(io.BytesIO(), payload),
+        'cleanup': lambda payload: db.delete_all_archives(username),
+    }
+
+    action = st.session_state.pop('action', None)
+    if action is None:
+        return
+
+    kind, payload = action
+    failed = True
+    start = time.perf_counter()
+    try:
+        actions[kind](payload)
+        failed = False
+    except Exception as e:
+        st.session_state.last_error = f"{kind}: {e!r}"
+    except BaseException:
+        # st.rerun (connexion, archivage) termine normalement l'action
+        failed = False
+        raise
+    finally:
+        st.session_state.results.append((kind, time.perf_counter() - start, failed))
+
+
+def _build_documents(rng):
+    """Un long texte (recherche par extraits) et un PDF textuel de 20 pages"""
+    import pymupdf
+
+    paragraphs = []
+    for number in range(400):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 30)))
+        paragraphs.append(f"Section {number}. {sentence.capitalize()}.")
+    text = "\n\n".join(paragraphs).encode('utf-8')
+
+    doc = pymupdf.open()
+    for page_number in range(20):
+        page = doc.new_page()
+        body = " ".join(rng.choice(WORDS) for _ in range(180))
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), f"Rapport - page {page_number + 1}\n\n{body}",
+                            fontsize=9)
+    pdf = doc.tobytes()
+    doc.close()
+    return [('rapport_simandou.txt', 'text/plain', text), ('etude_simandou.pdf', 'application/pdf', pdf)]
+
+
+def _script(options):
+    """Suite d'actions (scénario, type, paramètre) ; scénario None : préparation non mesurée"""
+    rng = random.Random(11)
+    documents = _build_documents(rng)
+
+    steps = [('signup', 'signup', None), (None, 'setup', None)]
+    steps += [('login', 'login', None)] * LOGIN_ROUNDS
+    for conversation in range(options['conversations']):
+        steps += [('upload', 'upload', document) for document in documents]
+        for turn in range(options['turns']):
+            first, second = rng.sample(WORDS, 2)
+            steps.append(('chat', 'chat', f"Tour {conversation}.{turn} : que disent les documents sur "
+                                          f"{first} et {second} ?"))
+        steps.append(('archive', 'archive', None))
+
+    questions = [f"Qu'a-t-on dit sur {word} ?" for word in rng.sample(WORDS, SEARCH_QUESTIONS)]
+    steps += [('search', 'search', (question, position)) for position, question in enumerate(questions * 2)]
+    steps += [('export_ndjson', 'export', 'ndjson')] * EXPORT_ROUNDS
+    steps += [('export_zip', 'export', 'zip')] * EXPORT_ROUNDS
+    if options['backend'] == 'postgres':
+        steps.append((None, 'cleanup', None))
+    return steps
+
+
+def _percentile(values, percent):
+    """Percentile au rang le plus proche (valeurs triées)"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def _summary(latencies, errors, peak_kb):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        'ops': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / total, 2) if total else 0.0,
+        'mean_ms': round(total / len(latencies) * 1000, 2),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'peak_mb': round(peak_kb / 1024, 1),
+    }
+
+
+def _postgres_unavailable():
+    """Message d'erreur si PostgreSQL n'est pas joignable, sinon None"""
+    try:
+        from modules.database import PostgreSQLDatabase
+        connected, message = PostgreSQLDatabase().test_connection()
+    except Exception as e:
+        return str(e).strip() or type(e).__name__
+    return None if connected else message
+
+
+def _run_backend(options):
+    """Exécute tous les scénarios sur une base (dans un processus dédié)"""
+    work_dir = tempfile.mkdtemp(prefix='simandou_e2e_')
+    # Caches, traces et statistiques isolés de ceux de l'application
+    os.environ['SIMANDOU_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    fake_genai.install(**options['fake'])
+    try:
+        backend = options['backend']
+        if backend == 'postgres':
+            reason = _postgres_unavailable()
+            if reason:
+                return {'skipped': reason}
+
+        username = f"bench_{int(time.time())}" if backend == 'postgres' else 'benchmark'
+        app = AppTest.from_function(_scenario_app, args=(backend, os.path.join(work_dir, 'e2e.db'), username, PASSWORD),
+                                    default_timeout=TIMEOUT)
+        app.run()
+
+        measures = {scenario: ([], [0], [0]) for scenario in SCENARIOS}
+        last_error = None
+        for scenario, kind, payload in _script(options):
+            app.session_state['action'] = (kind, payload)
+            app.run()
+            _, elapsed, failed = app.session_state['results'][-1]
+            # Erreurs affichées par l'application (quota, sécurité...) sans exception
+            failed = failed or bool(app.exception) or bool(app.error) or bool(app.warning)
+            if failed:
+                last_error = (app.session_state['last_error'] if 'last_error' in app.session_state
+                              else (app.exception or app.error or app.warning)[0].value)
+            if scenario is None:
+                continue
+            latencies, errors, peak = measures[scenario]
+            latencies.append(elapsed)
+            errors[0] += failed
+            peak[0] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        return {
+            'scenarios': {scenario: _summary(latencies, errors[0], peak[0])
+                          for scenario, (latencies, errors, peak) in measures.items() if latencies},
+            'fake_calls': fake_genai.stats(),
+            'last_error': str(last_error)[:200] if last_error else None,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _print_results(backend, result):
+    if 'skipped' in result:
+        print(f"\n{backend} : ignoré ({' '.join(result['skipped'].split())[:160]})")
+        return
+
+    print(f"\n{backend}")
+    print(f"{'scénario':14s} {'ops':>5s} {'err':>4s} {'débit/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} "
+          f"{'p99 ms':>9s} {'mém. Mo':>8s}")
+    for scenario, summary in result['scenarios'].items():
+        print(f"{scenario:14s} {summary['ops']:5d} {summary['errors']:4d} {summary['throughput']:9.2f} "
+              f"{summary['p50_ms']:9.1f} {summary['p95_ms']:9.1f} {summary['p99_ms']:9.1f} {summary['peak_mb']:8.1f}")
+    calls = result['fake_calls']
+    print(f"faux Gemini : {calls.get('generate', 0)} réponses, {calls.get('upload', 0)} envois, "
+          f"{calls.get('errors', 0)} erreurs injectées")
+    if result['last_error']:
+        print(f"dernière erreur : {result['last_error']}")
+
+
+def _host():
+    return {'machine': platform.node(), 'platform': platform.platform(), 'python': platform.python_version(),
+            'cpus': os.cpu_count()}
+
+
+def _settings(options):
+    return {'turns': options.turns, 'conversations': options.conversations, 'fake': _fake_settings(options)}
+
+
+def _fake_settings(options):
+    return {'latency_ms': options.latency_ms, 'error_rate': options.error_rate,
+            'processing_polls': options.processing_polls}
+
+
+def save_baseline(path, settings, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    baseline = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'host': _host(),
+        'settings': settings,
+        'results': {backend: result['scenarios'] for backend, result in results.items() if 'scenarios' in result}
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+    print(f"\nLigne de base enregistrée : {path}")
+
+
+def compare_baseline(path, settings, results, tolerance):
+    """Compare aux résultats enregistrés ; retourne la liste des régressions"""
+    with open(path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    print(f"\nComparaison avec {path} ({baseline['created']}, tolérance {tolerance:.0%})")
+    if baseline['settings'] != settings:
+        print(f"⚠️ Réglages différents de la ligne de base : {baseline['settings']}")
+    if baseline['host'] != _host():
+        print(f"⚠️ Mesures prises sur une autre machine : {baseline['host']}")
+
+    regressions = []
+    for backend, result in results.items():
+        reference = baseline['results'].get(backend)
+        if 'scenarios' not in result or not reference:
+            continue
+        for scenario, summary in result['scenarios'].items():
+            previous = reference.get(scenario)
+            if not previous:
+                continue
+            changes = []
+            if summary['errors'] > previous['errors']:
+                changes.append(f"erreurs {previous['errors']} → {summary['errors']}")
+                regressions.append((backend, scenario, 'errors'))
+            for metric, min_delta in COMPARED_METRICS.items():
+                before, after = previous[metric], summary[metric]
+                delta = after - before
+                ratio = delta / before if before else 0.0
+                if delta > max(tolerance * before, min_delta):
+                    changes.append(f"{metric} {before:g} → {after:g} ({ratio:+.0%}) RÉGRESSION")
+                    regressions.append((backend, scenario, metric))
+                elif abs(ratio) > tolerance and abs(delta) > min_delta:
+                    changes.append(f"{metric} {ratio:+.0%}")
+            print(f"{backend:8s} {scenario:14s} {'; '.join(changes) or 'stable'}")
+
+    print(f"{len(regressions)} régression(s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scénarios de bout en bout avec un faux backend Gemini")
+    parser.add_argument('--turns', type=int, default=50, help="Tours par conversation")
+    parser.add_argument('--conversations', type=int, default=2)
+    parser.add_argument('--postgres', action='store_true', help="Mesure aussi PostgreSQL (DB_HOST...)")
+    parser.add_argument('--latency-ms', type=float, default=fake_genai.FAKE_GENAI_SETTINGS['latency_ms'])
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Part des réponses en erreur")
+    parser.add_argument('--processing-polls', type=int, default=0,
+                        help="Lectures en PROCESSING par fichier (1 s d'attente chacune côté application)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save-baseline', action='store_true')
+    mode.add_argument('--compare', action='store_true', help="Compare à la ligne de base enregistrée")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Écart relatif toléré")
+    args = parser.parse_args()
+
+    backends = ['sqlite', 'postgres'] if args.postgres else ['sqlite']
+    print(f"{args.conversations} conversation(s) de {args.turns} tours, latence simulée {args.latency_ms:g} ms, "
+          f"erreurs {args.error_rate:.0%}")
+
+    results = {}
+    for backend in backends:
+        options = {'backend': backend, 'turns': args.turns, 'conversations': args.conversations,
+                   'fake': _fake_settings(args)}
+        # Processus dédié : mémoire maximale propre à la base mesurée
+        with Pool(1) as pool:
+            results[backend] = pool.apply(_run_backend, (options,))
+        _print_results(backend, results[backend])
+
+    settings = _settings(args)
+    if args.save_baseline:
+        save_baseline(args.baseline, settings, results)
+    elif args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\nAucune ligne de base ({args.baseline}) : lancer d'abord avec --save-baseline")
+            sys.exit(2)
+        if compare_baseline(args.baseline, settings, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark de l'extraction de texte des pages web (lxml vs BeautifulSoup)
+
+Mesure le temps par page, la mémoire maximale (processus dédié par moteur)
+et la qualité : rappel et précision des mots de l'article de référence
+(corpus généré) ou rappel du texte BeautifulSoup (corpus de fichiers .html).
+
+Usage : python -m benchmarks.bench_html_extraction [dossier_html | nombre_de_pages]
+"""
+import os
+import re
+import sys
+import time
+import random
+import resource
+from multiprocessing import Pool
+
+from modules.html_extraction import extract_html, lxml_html
+
+WORDS = ("gisement minerai bauxite fer transport port rail concession état investissement "
+         "communauté emploi environnement rapport production tonnes capacité étude").split()
+BOILERPLATE = ("Accueil Actualités Contact Connexion Newsletter Mentions légales Partager "
+               "Articles similaires Publicité Cookies Plan du site").split()
+
+
+def _sentence(rng, length=18):
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def _build_page(rng, number):
+    """Page réaliste : menus, barre latérale, commentaires et un article central"""
+    paragraphs = [" ".join(_sentence(rng) for _ in range(rng.randint(3, 6))) for _ in range(rng.randint(5, 15))]
+    article = "\n".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    menu = "".join(f'<li><a href="/{word.lower()}">{word}</a></li>' for word in BOILERPLATE)
+    related = "".join(f'<li><a href="/a/{i}">{_sentence(rng, 6)}</a></li>' for i in range(10))
+    scripts = "".join(f"<script>var tracker{i} = {{id: {i}, data: '{'x' * 400}'}};</script>" for i in range(5))
+    # Une partie des pages n'utilise aucune balise sémantique (<article>, <main>, <nav>)
+    if number % 2:
+        body = (f'<header><ul>{menu}</ul></header><nav><ul>{menu}</ul></nav>'
+                f'<main><article><h1>Article {number}</h1>{article}</article></main>'
+                f'<aside><ul>{related}</ul></aside><footer>{" ".join(BOILERPLATE)}</footer>')
+    else:
+        body = (f'<div class="top"><ul>{menu}</ul></div>'
+                f'<div class="layout"><div class="content"><h1>Article {number}</h1>{article}</div>'
+                f'<div class="sidebar"><ul>{related}</ul></div></div>'
+                f'<div class="bottom">{" ".join(BOILERPLATE)}</div>')
+    html = (f"<!DOCTYPE html><html><head><title>Article {number} - Actualités</title>"
+            f"<style>body {{ font-family: sans-serif; }}</style>{scripts}</head>"
+            f"<body>{body}<!-- fin de page --></body></html>")
+    reference = f"Article {number}\n" + "\n".join(paragraphs)
+    return html.encode('utf-8'), reference
+
+
+def _load_corpus(argument):
+    if argument and os.path.isdir(argument):
+        pages = []
+        for name in sorted(os.listdir(argument)):
+            if name.endswith(('.html', '.htm')):
+                with open(os.path.join(argument, name), 'rb') as f:
+                    pages.append((f.read(), None))
+        return pages
+    rng = random.Random(42)
+    count = int(argument) if argument else 1000
+    return [_build_page(rng, number) for number in range(count)]
+
+
+def _words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _run_backend(args):
+    """Exécuté dans un processus dédié pour isoler la mesure mémoire"""
+    backend, argument = args
+    pages = _load_corpus(argument)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    texts = []
+    start = time.perf_counter()
+    for content, _ in pages:
+        texts.append(extract_html(content, backend=backend)[1])
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, (rss_after - rss_before) / 1024, texts
+
+
+def main():
+    argument = sys.argv[1] if len(sys.argv) > 1 else None
+    pages = _load_corpus(argument)
+    total_mb = sum(len(content) for content, _ in pages) / (1024 * 1024)
+    print(f"{len(pages)} pages ({total_mb:.1f} Mo)")
+
+    backends = ['bs4'] + (['lxml'] if lxml_html is not None else [])
+    results = {}
+    for backend in backends:
+        with Pool(1) as pool:
+            results[backend] = pool.apply(_run_backend, ((backend, argument),))
+
+    baseline = results['bs4'][2]
+    for backend in backends:
+        elapsed, rss_mb, texts = results[backend]
+        recalls, precisions = [], []
+        for (_, reference), text, baseline_text in zip(pages, texts, baseline):
+            expected = _words(reference if reference is not None else baseline_text)
+            extracted = _words(text)
+            if expected and extracted:
+                recalls.append(len(expected & extracted) / len(expected))
+                precisions.append(len(expected & extracted) / len(extracted))
+        print(f"{backend:5s}: {elapsed:.2f} s ({elapsed / len(pages) * 1000:.2f} ms/page), "
+              f"mémoire max +{rss_mb:.1f} Mo, rappel {sum(recalls) / len(recalls):.1%}, "
+              f"précision {sum(precisions) / len(precisions):.1%}")
+
+    if 'lxml' in results:
+        print(f"accélération lxml : {results['bs4'][0] / results['lxml'][0]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+"""
+Générateur de charge multi-utilisateurs : sessions simulées sur un serveur Streamlit local
+
+Démarre app.py dans un processus dédié (benchmarks.load_server : faux backend
+Gemini, base SQLite et caches temporaires, traces activées), puis simule N
+sessions par des clients websocket sans navigateur qui parlent le protocole de
+Streamlit (BackMsg / ForwardMsg) : connexion, messages dans le chat, onglet
+des archives, nouvelle conversation, avec un temps de réflexion entre deux
+actions. La concurrence augmente par paliers ; pour chaque palier : débit,
+taux d'erreur et latences p50/p95/p99 vues du client par type d'interaction,
+puis durée des étapes côté serveur (spans des traces chat.turn).
+
+Point de saturation : premier palier dont le débit progresse de moins de
+SATURATION_GAIN par rapport au précédent, dont la latence p95 dépasse
+SATURATION_LATENCY_FACTOR fois celle du premier palier, ou dont le taux
+d'erreur dépasse de MAX_ERROR_RATE celui du premier palier (erreurs injectées
+comprises) ; la capacité retenue est le palier précédent.
+
+Usage : python -m benchmarks.bench_load [--levels 1,2,4,8,16] [--duration 20] [--think-ms 500]
+        [--messages 5] [--latency-ms 500] [--error-rate 0]
+"""
+import os
+import sys
+import json
+import math
+import time
+import socket
+import random
+import shutil
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+from tornado.websocket import websocket_connect
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+PASSWORD = 'load-password'
+RUN_TIMEOUT = 120  # Secondes d'attente maximale d'une exécution du script
+SERVER_START_TIMEOUT = 90
+SATURATION_GAIN = 0.10
+SATURATION_LATENCY_FACTOR = 3
+MAX_ERROR_RATE = 0.05
+MAIN_CONTAINER = 0  # delta_path[0] : 0 zone principale, 1 barre latérale
+WIDGET_TYPES = ('button', 'text_input', 'chat_input', 'radio')
+INTERACTIONS = ('page', 'login', 'chat', 'archives', 'chat_tab', 'new_conversation')
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = ("gisement minerai bauxite fer transport port rail concession état investissement "
+         "communauté emploi environnement rapport production tonnes capacité étude").split()
+
+
+class SimulatedSession:
+    """Onglet de navigateur simulé : état des widgets et relances du script par le websocket"""
+
+    def __init__(self, url, username):
+        self.url = url
+        self.username = username
+        self.widgets = {}  # Clé du widget (ou libellé) -> (id, fragment_id)
+        self.values = {}  # id -> WidgetState conservé entre les exécutions (champs, onglet)
+        self.connection = None
+
+    async def connect(self):
+        self.connection = await websocket_connect(self.url, subprotocols=['streamlit'])
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def widget(self, name):
+        if name not in self.widgets:
+            raise LookupError(f"Widget introuvable : {name}")
+        return self.widgets[name]
+
+    def set_value(self, name, **value):
+        widget_id, _ = self.widget(name)
+        self.values[widget_id] = WidgetState(id=widget_id, **value)
+
+    def trigger(self, name, **value):
+        """État ponctuel (bouton, message) et fragment à réexécuter"""
+        widget_id, fragment_id = self.widget(name)
+        return WidgetState(id=widget_id, **(value or {'trigger_value': True})), fragment_id
+
+    async def run(self, trigger=None):
+        """Relance le script (ou le fragment du widget) ; retourne les erreurs affichées"""
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.widget_states.widgets.extend(self.values.values())
+        if trigger is not None:
+            state, fragment_id = trigger
+            client_state.widget_states.widgets.append(state)
+            client_state.fragment_id = fragment_id
+        await self.connection.write_message(message.SerializeToString(), binary=True)
+
+        errors = []
+        while True:
+            data = await self.connection.read_message()
+            if data is None:
+                raise ConnectionError("Connexion fermée par le serveur")
+            forward = ForwardMsg.FromString(data)
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                in_main = forward.metadata.delta_path[:1] == [MAIN_CONTAINER]
+                self._inspect(forward.delta.new_element, forward.delta.fragment_id, in_main, errors)
+            # st.rerun : une nouvelle exécution suit immédiatement
+            elif kind == 'script_finished' and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return errors
+
+    def _inspect(self, element, fragment_id, in_main, errors):
+        kind = element.WhichOneof('type')
+        if kind == 'exception':
+            errors.append(element.exception.message)
+        elif kind == 'alert' and in_main and element.alert.format in (Alert.ERROR, Alert.WARNING):
+            # Les alertes de la barre latérale (limite journalière affichée) ne sont pas des échecs
+            errors.append(element.alert.body)
+        elif kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            # Identifiant « $$ID-<hash>-<clé> » : clé explicite, sinon libellé ou texte indicatif
+            key = widget.id.split('-', 2)[-1] if widget.id.startswith('$$ID-') else ''
+            name = key if key and key != 'None' else (getattr(widget, 'label', '') or
+                                                      getattr(widget, 'placeholder', ''))
+            self.widgets[name] = (widget.id, fragment_id)
+
+
+async def _timed(records, interaction, action):
+    """Exécute une interaction et enregistre (type, durée, erreur)"""
+    start = time.perf_counter()
+    failed = True
+    try:
+        failed = bool(await asyncio.wait_for(action, RUN_TIMEOUT))
+    except (asyncio.TimeoutError, ConnectionError, LookupError) as e:
+        records.append((interaction, time.perf_counter() - start, True))
+        raise RuntimeError(f"{interaction} : {e!r}")
+    records.append((interaction, time.perf_counter() - start, failed))
+
+
+async def _user_journey(session, deadline, options, records, rng):
+    """Parcours répété jusqu'à l'échéance : messages, archives, retour au chat, nouvelle conversation"""
+    loop = asyncio.get_running_loop()
+    think = options['think_ms'] / 1000
+
+    async def _pause():
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * think)
+
+    # Démarrages étalés : les sessions ne sont pas synchronisées
+    await asyncio.sleep(rng.uniform(0, think))
+    await session.connect()
+    try:
+        await _timed(records, 'page', session.run())
+        session.set_value('login_user', string_value=session.username)
+        session.set_value('login_pass', string_value=PASSWORD)
+        await _timed(records, 'login', session.run(session.trigger('btn_login')))
+        # Champs de connexion absents de l'interface principale
+        session.values.clear()
+
+        while loop.time() < deadline:
+            for _ in range(options['messages']):
+                await _pause()
+                first, second = rng.sample(WORDS, 2)
+                query = f"Que sait-on sur {first} et {second} ?"
+                await _timed(records, 'chat', session.run(
+                    session.trigger("Posez une question à Simandou...", chat_input_value={'data': query})))
+                if loop.time() >= deadline:
+                    return
+
+            await _pause()
+            session.set_value('tab_navigation', int_value=1)
+            await _timed(records, 'archives', session.run())
+            await _pause()
+            session.set_value('tab_navigation', int_value=0)
+            await _timed(records, 'chat_tab', session.run())
+            await _pause()
+            await _timed(records, 'new_conversation', session.run(session.trigger("➕ Nouvelle conversation")))
+    except (RuntimeError, LookupError) as e:
+        # Session abandonnée (délai dépassé, connexion perdue, page inattendue)
+        records.append(('abandoned', 0.0, True))
+        print(f"  session {session.username} abandonnée : {str(e)[:120]}")
+    finally:
+        session.close()
+
+
+async def _warm_up(url):
+    """Premier affichage hors mesure : imports et initialisations du serveur"""
+    session = SimulatedSession(url, 'load_000')
+    await session.connect()
+    try:
+        await asyncio.wait_for(session.run(), RUN_TIMEOUT)
+    finally:
+        session.close()
+
+
+async def _run_level(url, users, options):
+    """Un palier : users sessions simultanées pendant options['duration'] secondes"""
+    records = []
+    deadline = asyncio.get_running_loop().time() + options['duration']
+    sessions = [SimulatedSession(url, f"load_{number:03d}") for number in range(users)]
+    start = time.perf_counter()
+    await asyncio.gather(*(_user_journey(session, deadline, options, records, random.Random(number))
+                           for number, session in enumerate(sessions)))
+    return records, time.perf_counter() - start
+
+
+def _percentile(values, percent):
+    """Percentile au rang le plus proche (valeurs triées)"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def _latency_ms(values, percent):
+    return _percentile(sorted(values), percent) * 1000
+
+
+def _read_traces(path, offset):
+    """Traces chat.turn ajoutées au journal depuis offset ; retourne (durées par étape, nouvel offset)"""
+    stages = {}
+    if not os.path.exists(path):
+        return stages, offset
+    with open(path, 'r', encoding='utf-8') as f:
+        f.seek(offset)
+        for line in f:
+            record = json.loads(line)
+            if record['name'] != 'chat.turn':
+                continue
+            root_id = record['spans'][0]['span_id']
+            for item in record['spans']:
+                # Racine et étapes directes (les spans db.* sont inclus dans leur étape)
+                if item['parent_id'] in (None, root_id):
+                    stages.setdefault(item['name'], []).append(item.get('duration_ns', 0) / 1e9)
+        return stages, f.tell()
+
+
+def _create_users(db_path, count):
+    from modules.database_sqlite import SQLiteDatabase
+
+    database = SQLiteDatabase(db_path)
+    password_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    for number in range(count):
+        username = f"load_{number:03d}"
+        database.save_user(username, {'password_hash': password_hash, 'security_q_index': 0,
+                                      'security_a_hash': password_hash, 'account_type': 'premium'})
+        # Comptes premium : la limite journalière ne fausse pas la mesure
+        database.update_account_type(username, 'premium')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(work_dir, port, options):
+    # app.py lit la clé dans les secrets Streamlit du répertoire courant
+    os.makedirs(os.path.join(work_dir, '.streamlit'), exist_ok=True)
+    with open(os.path.join(work_dir, '.streamlit', 'secrets.toml'), 'w', encoding='utf-8') as f:
+        f.write('GOOGLE_API_KEY = "fake-api-key"\n')
+
+    env = dict(os.environ,
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get('PYTHONPATH')])),
+               SIMANDOU_CACHE_DIR=os.path.join(work_dir, 'cache'),
+               TRACE_ENABLED='true', TRACE_FORMAT='jsonl', TRACE_LOG_PATH=os.path.join(work_dir, 'traces.jsonl'),
+               METRICS_PORT='0',
+               FAKE_GENAI_LATENCY_MS=str(options['latency_ms']),
+               FAKE_GENAI_ERROR_RATE=str(options['error_rate']))
+    with open(os.path.join(work_dir, 'server.log'), 'wb') as log:
+        server = subprocess.Popen([sys.executable, '-m', 'benchmarks.load_server', str(port)],
+                                  cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    health_url = f"http://127.0.0.1:{port}/_stcore/health"
+    started = time.time()
+    while time.time() - started < SERVER_START_TIMEOUT:
+        if server.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(health_url, timeout=2) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.5)
+
+    server.kill()
+    with open(os.path.join(work_dir, 'server.log'), 'r', encoding='utf-8', errors='replace') as f:
+        raise RuntimeError(f"Serveur Streamlit non démarré :\n{f.read()[-2000:]}")
+
+
+def _saturation(levels):
+    """(capacité, palier saturé) ou None si le dernier palier progresse encore"""
+    for previous, current in zip(levels, levels[1:]):
+        if (current['error_rate'] > levels[0]['error_rate'] + MAX_ERROR_RATE
+                or current['throughput'] < previous['throughput'] * (1 + SATURATION_GAIN)
+                or current['p95'] > levels[0]['p95'] * SATURATION_LATENCY_FACTOR):
+            return previous['users'], current['users']
+    return None
+
+
+def _print_levels(levels):
+    print(f"\n{'sessions':>8s} {'interactions':>12s} {'débit/s':>8s} {'erreurs':>8s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for level in levels:
+        latencies = [elapsed for interactions in level['latencies'].values() for elapsed in interactions]
+        print(f"{level['users']:8d} {level['interactions']:12d} {level['throughput']:8.2f} "
+              f"{level['error_rate']:8.1%} {_latency_ms(latencies, 50):8.0f} {level['p95'] * 1000:8.0f} "
+              f"{_latency_ms(latencies, 99):8.0f}")
+
+    header = " ".join(f"{level['users']:>8d}" for level in levels)
+    print(f"\nLatence p95 par interaction (ms), par nombre de sessions\n{'interaction':24s} {header}")
+    for interaction in INTERACTIONS:
+        cells = " ".join(f"{_latency_ms(level['latencies'].get(interaction, []), 95):8.0f}"
+                         if level['latencies'].get(interaction) else f"{'-':>8s}" for level in levels)
+        print(f"{interaction:24s} {cells}")
+
+    names = sorted({name for level in levels for name in level['stages']},
+                   key=lambda name: (name != 'chat.turn', -max(sum(level['stages'].get(name, [])) for level in levels)))
+    print(f"\nÉtapes côté serveur, p95 (ms)\n{'étape':24s} {header}")
+    for name in names:
+        cells = " ".join(f"{_latency_ms(level['stages'][name], 95):8.1f}"
+                         if level['stages'].get(name) else f"{'-':>8s}" for level in levels)
+        print(f"{name:24s} {cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge multi-utilisateurs sur un serveur Streamlit local")
+    parser.add_argument('--levels', default='1,2,4,8,16', help="Nombres de sessions simultanées, par palier")
+    parser.add_argument('--duration', type=float, default=20, help="Durée de chaque palier (s)")
+    parser.add_argument('--think-ms', type=float, default=500, help="Temps de réflexion moyen entre deux actions")
+    parser.add_argument('--messages', type=int, default=5, help="Messages avant chaque nouvelle conversation")
+    parser.add_argument('--latency-ms', type=float, default=500, help="Latence du faux modèle")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Part des réponses du modèle en erreur")
+    args = parser.parse_args()
+
+    steps = [int(value) for value in args.levels.split(',') if value.strip()]
+    options = {'duration': args.duration, 'think_ms': args.think_ms, 'messages': args.messages,
+               'latency_ms': args.latency_ms, 'error_rate': args.error_rate}
+
+    work_dir = tempfile.mkdtemp(prefix='simandou_load_')
+    # Caches et statistiques partagés avec le serveur, isolés de ceux de l'application
+    os.environ['SIMANDOU_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    server = None
+    try:
+        _create_users(os.path.join(work_dir, 'simandou_data.db'), max(steps))
+        port = _free_port()
+        server = _start_server(work_dir, port, options)
+        url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        trace_path = os.path.join(work_dir, 'traces.jsonl')
+        print(f"Serveur {url} (pid {server.pid}), latence du modèle {args.latency_ms:g} ms, "
+              f"réflexion {args.think_ms:g} ms, paliers de {args.duration:g} s")
+
+        asyncio.run(_warm_up(url))
+        levels = []
+        offset = 0
+        for users in steps:
+            records, elapsed = asyncio.run(_run_level(url, users, options))
+            stages, offset = _read_traces(trace_path, offset)
+            completed = [record for record in records if record[0] != 'abandoned']
+            latencies = {}
+            for interaction, duration, _ in completed:
+                latencies.setdefault(interaction, []).append(duration)
+            levels.append({
+                'users': users,
+                'interactions': len(completed),
+                'throughput': len(completed) / elapsed if elapsed else 0.0,
+                'error_rate': sum(1 for record in records if record[2]) / len(records) if records else 1.0,
+                'p95': _percentile(sorted(duration for _, duration, _ in completed), 95),
+                'latencies': latencies,
+                'stages': stages,
+            })
+            print(f"  {users} session(s) : {len(completed)} interactions en {elapsed:.1f} s")
+            if levels[-1]['error_rate'] > 0.5:
+                print("  plus de la moitié des interactions en erreur : montée en charge arrêtée")
+                break
+
+        _print_levels(levels)
+        saturation = _saturation(levels)
+        if saturation:
+            print(f"\nSaturation à {saturation[1]} sessions : capacité ≈ {saturation[0]} sessions simultanées "
+                  f"(gain de débit < {SATURATION_GAIN:.0%}, p95 > {SATURATION_LATENCY_FACTOR}x ou erreurs "
+                  f"> +{MAX_ERROR_RATE:.0%} par rapport au premier palier)")
+        else:
+            print(f"\nSaturation non atteinte à {levels[-1]['users']} sessions")
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark du pré-traitement des médias, de bout en bout (envoi + analyse)
+
+Pour un jeu d'images (et de vidéos si ffmpeg est disponible), mesure les octets
+envoyés et le temps de FileProcessor.upload_to_gemini suivi d'une requête
+d'analyse du fichier, avec le faux backend Gemini (testing.fake_genai) et un
+débit montant simulé : sans pré-traitement, pré-traitement à froid, puis
+version optimisée servie par le cache.
+
+Usage : python -m benchmarks.bench_media_preprocessing [nombre_d_images] [--upload-mbps 20]
+        [--latency-ms 800]
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from PIL import Image
+
+from testing import fake_genai
+
+TIMEOUT = 1800
+
+
+def _build_images(directory, count):
+    """Génère des photos haute résolution avec métadonnées EXIF"""
+    paths = []
+    for index in range(count):
+        image = Image.effect_mandelbrot((4000, 3000), (-2.0 + index * 0.01, -1.2, 1.0, 1.2), 100).convert('RGB')
+        exif = Image.Exif()
+        exif[0x010F] = "Appareil de test"  # Make
+        exif[0x0132] = "2026:01:01 12:00:00"  # DateTime
+        path = os.path.join(directory, f"photo_{index}.jpg")
+        image.save(path, quality=95, exif=exif)
+        paths.append((path, 'image/jpeg'))
+    return paths
+
+
+def _build_videos(directory, count):
+    """Génère des vidéos 1080p de 20 secondes avec ffmpeg"""
+    ffmpeg_path = shutil.which('ffmpeg')
+    if not ffmpeg_path:
+        return []
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"video_{index}.mp4")
+        subprocess.run([ffmpeg_path, '-y', '-loglevel', 'error',
+                        '-f', 'lavfi', '-i', 'testsrc2=size=1920x1080:rate=30:duration=20',
+                        '-f', 'lavfi', '-i', 'sine=frequency=440:duration=20',
+                        '-c:v', 'libx264', '-b:v', '8M', '-c:a', 'aac', '-b:a', '192k', path], check=True)
+        paths.append((path, 'video/mp4'))
+    return paths
+
+
+def _upload_script(samples, work_dir, preprocess):
+    """Script AppTest : envoi (copie, upload_to_gemini supprime le fichier reçu) puis analyse de chaque média"""
+    import os
+    import time
+    import shutil
+
+    import streamlit as st
+    import google.generativeai as genai
+    from modules.file_processing import FileProcessor
+    from modules.media_preprocessing import MediaPreprocessor
+
+    # Les modules sont partagés entre les exécutions AppTest : le réglage est rétabli à la fin
+    can_preprocess = MediaPreprocessor.can_preprocess
+    if not preprocess:
+        MediaPreprocessor.can_preprocess = staticmethod(lambda mime_type: False)
+
+    sent = elapsed = 0
+    try:
+        for index, (path, mime_type) in enumerate(samples):
+            local_path = os.path.join(work_dir, f"upload_{index}{os.path.splitext(path)[1]}")
+            shutil.copyfile(path, local_path)
+
+            start = time.perf_counter()
+            gemini_file = FileProcessor.upload_to_gemini(local_path, os.path.basename(path), mime_type)
+            if gemini_file is None:
+                raise RuntimeError(f"envoi échoué : {path}")
+            genai.GenerativeModel('gemini-2.5-flash').generate_content([gemini_file, "Décris ce média."])
+            elapsed += time.perf_counter() - start
+            sent += gemini_file.size_bytes
+    finally:
+        MediaPreprocessor.can_preprocess = staticmethod(can_preprocess)
+    st.session_state.result = (sent, elapsed)
+
+
+def _upload_and_analyze(samples, work_dir, preprocess):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_function(_upload_script, args=(samples, work_dir, preprocess), default_timeout=TIMEOUT)
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return app.session_state.result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-traitement des médias : envoi + analyse de bout en bout")
+    parser.add_argument('count', nargs='?', type=int, default=10, help="Nombre d'images")
+    parser.add_argument('--upload-mbps', type=float, default=20, help="Débit montant simulé (Mbit/s)")
+    parser.add_argument('--latency-ms', type=float, default=800, help="Latence simulée de l'analyse")
+    args = parser.parse_args()
+
+    fake_genai.install(upload_ms=50, upload_mbps=args.upload_mbps, latency_ms=args.latency_ms, jitter_ms=0)
+    os.environ['SIMANDOU_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench_cache_')
+    from modules.media_preprocessing import MediaPreprocessor
+
+    corpus_dir = tempfile.mkdtemp(prefix='bench_media_')
+    try:
+        samples = _build_images(corpus_dir, args.count) + _build_videos(corpus_dir, max(1, args.count // 5))
+        if not shutil.which('ffmpeg'):
+            print("ffmpeg introuvable : vidéos ignorées")
+        source_bytes = sum(os.path.getsize(path) for path, _ in samples)
+        print(f"{len(samples)} médias, {MediaPreprocessor.format_size(source_bytes)}, "
+              f"débit montant {args.upload_mbps:g} Mbit/s, analyse {args.latency_ms:g} ms")
+
+        for label, preprocess in (("original", False), ("à froid", True), ("cache", True)):
+            sent, elapsed = _upload_and_analyze(samples, corpus_dir, preprocess)
+            print(f"{label:<9}: {elapsed:6.2f} s ({elapsed / len(samples) * 1000:5.0f} ms/média), "
+                  f"{MediaPreprocessor.format_size(sent)} envoyés "
+                  f"({100 * (1 - sent / source_bytes):.0f} % d'octets en moins)")
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+        shutil.rmtree(os.environ['SIMANDOU_CACHE_DIR'], ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark de l'export PDF des archives (canvas + fichier temporaire vs Platypus en mémoire)
+
+Mesure le temps de génération, la mémoire maximale (processus dédié par moteur)
+et le nombre de pages sur une archive générée (texte, markdown, code, accents,
+écritures non latines).
+
+Usage : python -m benchmarks.bench_pdf_export [nombre_de_messages]
+"""
+import os
+import sys
+import time
+import random
+import resource
+import tempfile
+from multiprocessing import Pool
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from modules.pdf_export import render_archive_pdf
+
+WORDS = ("gisement minerai bauxite fer transport port rail concession état investissement "
+         "communauté emploi environnement rapport production tonnes capacité étude").split()
+SNIPPETS = ("Résumé en français : déjà à côté", "Ελληνικά κείμενο", "Русский текст", "Ñandú über straße")
+
+
+def _build_archive(count):
+    rng = random.Random(7)
+    history = []
+    for number in range(count):
+        if number % 2 == 0:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))) + " ?"
+            history.append({'role': 'user', 'text': text})
+            continue
+        parts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))]
+        if number % 3 == 0:
+            parts.append("## Points clés\n" + "\n".join(f"- **{rng.choice(WORDS)}** : {rng.choice(SNIPPETS)}"
+                                                       for _ in range(4)))
+        if number % 5 == 0:
+            code = "\n".join(f"    total_{i} = calcul_production(site='{rng.choice(WORDS)}', "
+                             f"annee={2020 + i}, parametres={{'seuil': {i * 0.5}}})  # {'x' * 60}"
+                             for i in range(6))
+            parts.append(f"```python\ndef estimation():\n{code}\n```")
+        history.append({'role': 'model', 'text': "\n\n".join(parts)})
+    return {'id': 1, 'title': "Archive de test", 'timestamp': '2026-01-01T10:00:00', 'history': history}
+
+
+def _legacy_split_text(text, max_line_length):
+    words = text.split()
+    lines = []
+    current_line = []
+    for word in words:
+        if len(' '.join(current_line + [word])) <= max_line_length:
+            current_line.append(word)
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def _legacy_render(archive, username):
+    """Ancienne génération : canvas, découpage à 100 caractères, fichier temporaire relu"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', mode='wb') as tmp_file:
+        pdf_path = tmp_file.name
+        c = canvas.Canvas(pdf_path, pagesize=letter)
+        width, height = letter
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, height - 50, "Archive Simandou-GN-IA")
+        y_position = height - 130
+        c.setFont("Helvetica", 10)
+        for msg in archive['history']:
+            if y_position < 100:
+                c.showPage()
+                y_position = height - 50
+            c.setFont("Helvetica-Bold", 10)
+            c.drawString(50, y_position, "UTILISATEUR:" if msg['role'] == 'user' else "ASSISTANT:")
+            y_position -= 15
+            c.setFont("Helvetica", 10)
+            for line in _legacy_split_text(msg['text'], 100):
+                if y_position < 50:
+                    c.showPage()
+                    c.setFont("Helvetica", 10)
+                    y_position = height - 50
+                c.drawString(70, y_position, line)
+                y_position -= 15
+            y_position -= 10
+        c.save()
+    with open(pdf_path, 'rb') as f:
+        pdf_bytes = f.read()
+    os.unlink(pdf_path)
+    return pdf_bytes
+
+
+def _run_engine(args):
+    """Exécuté dans un processus dédié pour isoler la mesure mémoire"""
+    engine, count = args
+    archive = _build_archive(count)
+    render = _legacy_render if engine == 'canvas' else render_archive_pdf
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    pdf_bytes = render(archive, 'benchmark')
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, (rss_after - rss_before) / 1024, len(pdf_bytes), pdf_bytes.count(b'/Type /Page\n')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    archive = _build_archive(count)
+    total_kb = sum(len(msg['text']) for msg in archive['history']) / 1024
+    print(f"{count} messages ({total_kb:.0f} Ko de texte)")
+
+    for engine in ('canvas', 'platypus'):
+        with Pool(1) as pool:
+            elapsed, rss_mb, size, pages = pool.apply(_run_engine, ((engine, count),))
+        print(f"{engine:8s}: {elapsed:.2f} s, mémoire max +{rss_mb:.1f} Mo, "
+              f"{size / 1024:.0f} Ko, {pages} pages")
+
+
+if __name__ == '__main__':
+    main()
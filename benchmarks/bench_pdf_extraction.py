@@ -0,0 +1,72 @@
+"""
+Benchmark de l'extraction locale des PDF (FileProcessor.extract_pdf_text)
+
+Usage : python -m benchmarks.bench_pdf_extraction [nombre_de_pdf] [pages_par_pdf]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import pymupdf
+
+from utils.config import get_cache_dir
+
+
+def _build_corpus(directory, count, pages):
+    """Génère un corpus de PDF textuels"""
+    paths = []
+    paragraph = ("Simandou-GN-IA analyse les documents localement avant l'envoi au modèle. " * 12).strip()
+    for index in range(count):
+        doc = pymupdf.open()
+        for page_number in range(pages):
+            page = doc.new_page()
+            page.insert_textbox(pymupdf.Rect(50, 50, 550, 800),
+                                f"Document {index} - page {page_number + 1}\n\n{paragraph}",
+                                fontsize=9)
+        path = os.path.join(directory, f"doc_{index}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    os.environ['SIMANDOU_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench_cache_')
+    from modules import file_processing
+    from modules.file_processing import FileProcessor
+
+    corpus_dir = tempfile.mkdtemp(prefix='bench_pdf_')
+    try:
+        paths = _build_corpus(corpus_dir, count, pages)
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+
+        def run(label):
+            start = time.perf_counter()
+            compact_bytes = 0
+            for path in paths:
+                extraction = FileProcessor.extract_pdf_text(path)
+                compact_bytes += len(FileProcessor.build_compact_text(extraction).encode('utf-8'))
+            elapsed = time.perf_counter() - start
+            print(f"{label:<28} {elapsed:8.3f} s  ({elapsed / len(paths) * 1000:7.1f} ms/PDF, "
+                  f"{compact_bytes / 1024:.0f} Ko de texte pour {total_bytes / 1024:.0f} Ko de PDF)")
+
+        max_workers = file_processing.PDF_MAX_WORKERS
+        file_processing.PDF_MAX_WORKERS = 1
+        run("séquentiel (sans cache)")
+        shutil.rmtree(get_cache_dir(file_processing.PDF_CACHE_NAMESPACE))
+
+        file_processing.PDF_MAX_WORKERS = max_workers
+        run(f"pool de {max_workers} processus")
+        run("cache (même contenu)")
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+        shutil.rmtree(os.environ['SIMANDOU_CACHE_DIR'], ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
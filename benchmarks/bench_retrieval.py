@@ -0,0 +1,58 @@
+"""
+Benchmark de la recherche d'extraits sur de longs documents (DocumentIndex)
+
+Compare les tokens envoyés par question (document complet vs extraits)
+et mesure la latence locale de construction de l'index et de recherche.
+
+Usage : python -m benchmarks.bench_retrieval [nombre_de_pages]
+"""
+import sys
+import time
+import random
+
+from modules.document_index import DocumentIndex, estimate_tokens
+
+TOPICS = ['bauxite', 'chemin de fer', 'port minier', 'hydrologie', 'fiscalité',
+          'emploi local', 'biodiversité', 'énergie', 'financement', 'logistique']
+
+
+def _build_pages(count):
+    """Génère un long document dont chaque page traite d'un thème"""
+    rng = random.Random(42)
+    words = "analyse rapport projet données région production capacité étude impact".split()
+    pages = []
+    for number in range(1, count + 1):
+        topic = TOPICS[number % len(TOPICS)]
+        body = " ".join(topic if position % 40 == 0 else rng.choice(words) for position in range(700))
+        pages.append({'page': number, 'text': f"Chapitre {topic}.\n\n{body}", 'images': 0})
+    return pages
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    pages = _build_pages(page_count)
+    full_text = "\n\n".join(page['text'] for page in pages)
+
+    start = time.perf_counter()
+    index = DocumentIndex.from_pages(pages, "rapport.pdf")
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{page_count} pages, {len(index.chunks)} extraits, index construit en {build_ms:.1f} ms")
+
+    full_tokens = estimate_tokens(full_text)
+    latencies, context_tokens = [], []
+    for topic in TOPICS:
+        question = f"Que dit le rapport sur {topic} ?"
+        start = time.perf_counter()
+        context = index.build_context(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+        context_tokens.append(estimate_tokens(question) + estimate_tokens(context))
+
+    latencies.sort()
+    print(f"tokens/question : document complet ≈ {full_tokens}, "
+          f"extraits ≈ {sum(context_tokens) // len(context_tokens)} "
+          f"({full_tokens / (sum(context_tokens) / len(context_tokens)):.0f}x moins)")
+    print(f"latence de recherche : p50 {latencies[len(latencies) // 2]:.2f} ms, max {latencies[-1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
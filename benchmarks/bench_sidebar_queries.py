@@ -0,0 +1,121 @@
+"""
+Benchmark des requêtes SQL déclenchées par la barre latérale (AppTest sur app.py)
+
+Exécute l'application réelle (app.py) avec le faux backend Gemini
+(testing.fake_genai) et une base SQLite temporaire instrumentée, puis compte
+les requêtes et le temps d'exécution par interaction : premier affichage après
+connexion, message envoyé, clic dans la barre latérale, changement d'onglet
+dans la zone principale. Vérifie aussi que le compteur de requêtes de la barre
+latérale suit chaque message.
+
+Usage : python -m benchmarks.bench_sidebar_queries
+"""
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from testing import fake_genai
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+USERNAME = 'benchmark'
+PASSWORD = 'benchmark-password'
+ROUNDS = 5
+
+_queries = [0]
+_queries_lock = threading.Lock()
+
+
+def _instrument_database():
+    """Compte les instructions SQL de toutes les connexions SQLite ouvertes par l'application"""
+    from modules.database_sqlite import SQLiteDatabase
+
+    original = SQLiteDatabase._get_connection
+
+    def _count(statement):
+        if statement.lstrip().split(' ', 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE'):
+            with _queries_lock:
+                _queries[0] += 1
+
+    @contextmanager
+    def _counting_connection(self):
+        with original(self) as conn:
+            conn.set_trace_callback(_count)
+            yield conn
+
+    SQLiteDatabase._get_connection = _counting_connection
+
+
+def _interact(app, action):
+    before = _queries[0]
+    start = time.perf_counter()
+    action(app)
+    elapsed = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return _queries[0] - before, elapsed
+
+
+def _sidebar_count(app):
+    return next(element.value for element in app.sidebar.markdown if 'requêtes utilisées' in element.value)
+
+
+def _switch_tab(app):
+    navigation = app.radio(key='tab_navigation')
+    options = list(navigation.options)
+    navigation.set_value(options[(options.index(navigation.value) + 1) % 2]).run()
+
+
+def _run(work_dir):
+    from streamlit.testing.v1 import AppTest
+    from modules.database_sqlite import SQLiteDatabase
+
+    os.environ.setdefault('SIMANDOU_CACHE_DIR', os.path.join(work_dir, 'cache'))
+    database = SQLiteDatabase('simandou_data.db')
+    database.save_user(USERNAME, {'password_hash': hashlib.sha256(PASSWORD.encode()).hexdigest(),
+                                  'security_q_index': 0, 'security_a_hash': 'x'})
+    _instrument_database()
+
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    app.secrets['GOOGLE_API_KEY'] = 'fake-api-key'
+    app.run()
+    app.text_input[0].input(USERNAME)
+    app.text_input[1].input(PASSWORD)
+    queries, elapsed = _interact(app, lambda test: test.button[0].click().run())
+    print(f"{'premier affichage':22s}: {queries:3d} requêtes, {elapsed * 1000:.0f} ms")
+
+    interactions = {
+        'message envoyé': lambda test: test.chat_input[0].set_value("question").run(),
+        'clic barre latérale': lambda test: test.toggle(key='toggle_crawl_site').set_value(
+            not test.toggle(key='toggle_crawl_site').value).run(),
+        # Aller-retour entre deux onglets
+        'clic zone principale': _switch_tab,
+    }
+    for name, action in interactions.items():
+        results = [_interact(app, action) for _ in range(ROUNDS * (2 if action is _switch_tab else 1))]
+        queries = sum(result[0] for result in results) / len(results)
+        elapsed = sum(result[1] for result in results) / len(results)
+        print(f"{name:22s}: {queries:5.1f} requêtes, {elapsed * 1000:.0f} ms (moyenne sur {len(results)})")
+
+    expected = f"**{database.get_daily_request_count(USERNAME)}/15** requêtes utilisées"
+    shown = _sidebar_count(app)
+    print(f"compteur affiché      : {shown} ({'à jour' if shown == expected else f'attendu {expected}'})")
+
+
+def main():
+    fake_genai.install(latency_ms=0, jitter_ms=0, stream_chunk_ms=0, upload_ms=0)
+
+    initial_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # app.py ouvre simandou_data.db dans le répertoire courant
+        os.chdir(work_dir)
+        try:
+            _run(work_dir)
+        finally:
+            os.chdir(initial_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark de l'analyse des sous-titres automatiques (ancienne boucle vs parseur en flux)
+
+Génère des sous-titres automatiques YouTube (WebVTT avec lignes glissantes et
+minutage mot à mot, puis json3) pour une vidéo longue, et compare temps,
+taille du texte produit et proportion de mots répétés.
+
+Usage : python -m benchmarks.bench_subtitles [durée_en_heures]
+"""
+import sys
+import json
+import time
+import random
+
+from modules.subtitles import parse_subtitles
+
+WORDS = ("le projet simandou prévoit une ligne de chemin de fer vers le port minier "
+         "avec des investissements importants pour la région et les communautés locales").split()
+
+
+def _timestamp(seconds):
+    return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:06.3f}"
+
+
+def _spoken_lines(hours):
+    """Lignes prononcées : (début, fin, mots) toutes les ~3 secondes"""
+    rng = random.Random(42)
+    position = 0.0
+    while position < hours * 3600:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(5, 9))]
+        yield position, position + 3, words
+        position += 3
+
+
+def build_auto_vtt(hours):
+    """Format des sous-titres automatiques : chaque réplique répète la ligne précédente"""
+    parts = ["WEBVTT\nKind: captions\nLanguage: fr\n\n"]
+    previous = " "
+    for start, end, words in _spoken_lines(hours):
+        step = (end - start) / len(words)
+        timed = words[0] + ''.join(f"<{_timestamp(start + step * i)}><c> {word}</c>"
+                                   for i, word in enumerate(words[1:], 1))
+        parts.append(f"{_timestamp(start)} --> {_timestamp(end)} align:start position:0%\n"
+                     f"{previous}\n{timed}\n\n")
+        line = ' '.join(words)
+        # Réplique de transition de 10 ms qui ne fait que répéter la ligne
+        parts.append(f"{_timestamp(end)} --> {_timestamp(end + 0.01)} align:start position:0%\n{line}\n \n\n")
+        previous = line
+    return ''.join(parts)
+
+
+def build_json3(hours):
+    events = []
+    for start, end, words in _spoken_lines(hours):
+        events.append({'tStartMs': int(start * 1000), 'dDurationMs': int((end - start) * 1000),
+                       'segs': [{'utf8': words[0]}] + [{'utf8': f" {word}"} for word in words[1:]]})
+        events.append({'tStartMs': int(end * 1000), 'aAppend': 1, 'segs': [{'utf8': "\n"}]})
+    return json.dumps({'events': events})
+
+
+def legacy_parse(content):
+    """Ancienne boucle de extract_youtube_transcript (concaténation de chaînes)"""
+    transcript_text = ""
+    for line in content.split('\n'):
+        if '-->' not in line and line.strip() and not line.strip().isdigit():
+            transcript_text += line.strip() + ' '
+    return transcript_text
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    reference_words = sum(len(words) for _, _, words in _spoken_lines(hours))
+    vtt = build_auto_vtt(hours)
+    json3 = build_json3(hours)
+    print(f"vidéo de {hours:g} h : {reference_words} mots prononcés, VTT {len(vtt) / 1e6:.1f} Mo, "
+          f"json3 {len(json3) / 1e6:.1f} Mo")
+
+    runs = [
+        ("ancien (VTT)", lambda: legacy_parse(vtt)),
+        ("flux VTT", lambda: parse_subtitles(vtt, 'vtt', with_timestamps=False, max_chars=10 ** 9)),
+        ("flux VTT + ancres", lambda: parse_subtitles(vtt, 'vtt', with_timestamps=True, max_chars=10 ** 9)),
+        ("flux json3", lambda: parse_subtitles(json3, 'json3', with_timestamps=False, max_chars=10 ** 9)),
+    ]
+    for label, run in runs:
+        start = time.perf_counter()
+        text = run()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{label:18s}: {elapsed:8.1f} ms, {len(text) / 1e6:.2f} Mo de texte, "
+              f"{len(text.split())} mots ({len(text.split()) / reference_words:.0%} des mots prononcés)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark du cache des métadonnées YouTube (modules.youtube_cache)
+
+Rejoue un résultat yt-dlp enregistré (aucun accès réseau : YoutubeDL est
+remplacé par un lecteur de fixture et les sous-titres sont servis localement)
+et compte les appels à extract_info pour des vidéos demandées plusieurs fois,
+sous différentes formes d'URL.
+
+Usage : python -m benchmarks.bench_youtube_cache [nombre_de_vidéos] [répétitions]
+"""
+import os
+import sys
+import time
+import tempfile
+
+os.environ.setdefault('SIMANDOU_CACHE_DIR', tempfile.mkdtemp(prefix='bench_youtube_cache_'))
+
+from benchmarks.bench_subtitles import build_json3
+from benchmarks.local_http_server import start_server
+from modules import media_extraction
+from modules.media_extraction import MediaExtractor
+from modules.youtube_cache import YouTubeMetadataCache
+
+URL_FORMS = ("https://www.youtube.com/watch?v={id}&t=42s", "https://youtu.be/{id}",
+             "https://m.youtube.com/watch?feature=share&v={id}", "https://www.youtube.com/shorts/{id}")
+
+
+def _fixture(video_id, base_url):
+    """Sous-ensemble d'un résultat yt-dlp enregistré pour une vidéo sous-titrée automatiquement"""
+    return {
+        'id': video_id,
+        'title': f"Conférence Simandou {video_id}",
+        'duration': 3600,
+        'channel': 'Simandou TV',
+        'view_count': 1234,
+        'description': 'Présentation du projet.',
+        'formats': [{'format_id': str(i), 'url': f"{base_url}/f/{i}"} for i in range(40)],
+        'subtitles': {},
+        'automatic_captions': {
+            lang: [{'ext': ext, 'url': f"{base_url}/subs.{ext}?v={video_id}&lang={lang}"}
+                   for ext in ('json3', 'srv1', 'srv2', 'srv3', 'ttml', 'vtt')]
+            for lang in ('fr', 'en', 'de', 'es', 'ar')
+        },
+    }
+
+
+class _FixtureYoutubeDL:
+    """Remplace yt_dlp.YoutubeDL : rejoue la fixture et compte les extractions"""
+    calls = 0
+    base_url = None
+
+    def __init__(self, options):
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url, download=False):
+        _FixtureYoutubeDL.calls += 1
+        return _fixture(YouTubeMetadataCache.video_id(url), self.base_url)
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server, base_url = start_server({'/subs.json3': ('application/json', build_json3(1).encode('utf-8'))})
+    _FixtureYoutubeDL.base_url = base_url
+    media_extraction.yt_dlp.YoutubeDL = _FixtureYoutubeDL
+
+    video_ids = [f"vid{number:08d}"[:11] for number in range(videos)]
+    latencies = {'froid': [], 'cache': []}
+    for repeat in range(repeats):
+        for video_id in video_ids:
+            url = URL_FORMS[repeat % len(URL_FORMS)].format(id=video_id)
+            start = time.perf_counter()
+            path, _, _ = MediaExtractor.extract_youtube_transcript(url)
+            latencies['froid' if repeat == 0 else 'cache'].append((time.perf_counter() - start) * 1000)
+            os.unlink(path)
+
+    requests_made = videos * repeats
+    print(f"{requests_made} demandes ({videos} vidéos x {repeats}) : "
+          f"{_FixtureYoutubeDL.calls} appels extract_info (sans cache : {requests_made})")
+    for label, values in latencies.items():
+        values.sort()
+        if values:
+            print(f"{label:6s}: p50 {values[len(values) // 2]:.1f} ms, max {values[-1]:.1f} ms "
+                  f"(hors temps d'extraction yt-dlp)")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
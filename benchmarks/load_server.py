@@ -0,0 +1,38 @@
+"""
+Serveur Streamlit local de app.py avec le faux backend Gemini (testing.fake_genai)
+
+google.generativeai est remplacé avant le démarrage : les exécutions de app.py
+importent le faux module. Le faux backend se règle par les variables
+FAKE_GENAI_* (latence, taux d'erreur...), la base SQLite est créée dans le
+répertoire courant (simandou_data.db).
+
+Usage : python -m benchmarks.load_server [port]
+"""
+import os
+import sys
+
+from testing import fake_genai
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8501
+    fake_genai.install()
+    os.environ.setdefault('GOOGLE_API_KEY', 'fake-api-key')
+
+    from streamlit.web import bootstrap
+
+    flag_options = {
+        'server.port': port,
+        'server.address': '127.0.0.1',
+        'server.headless': True,
+        'server.fileWatcherType': 'none',
+        'browser.gatherUsageStats': False,
+    }
+    bootstrap.load_config_options(flag_options=flag_options)
+    bootstrap.run(APP_PATH, False, [], flag_options)
+
+
+if __name__ == '__main__':
+    main()
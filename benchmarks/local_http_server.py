@@ -0,0 +1,81 @@
+"""
+Serveur HTTP local pour les benchmarks (fichiers virtuels, plages Range, pages HTML)
+"""
+import re
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BLOCK = bytes(range(256)) * 4096  # 1 Mo de motif répété
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    routes = {}
+    delay = 0  # Latence simulée par requête (secondes)
+
+    def log_message(self, *args):
+        pass
+
+    def _send_virtual_file(self, size, head_only=False):
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if head_only:
+            return
+
+        position = start
+        try:
+            while position <= end:
+                offset = position % len(BLOCK)
+                chunk = BLOCK[offset:offset + min(len(BLOCK) - offset, end - position + 1)]
+                self.wfile.write(chunk)
+                position += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # Le client a fermé la connexion (bascule en segments parallèles)
+            self.close_connection = True
+
+    def do_HEAD(self):
+        self.do_GET(head_only=True)
+
+    def do_GET(self, head_only=False):
+        if self.delay:
+            time.sleep(self.delay)
+
+        match = re.match(r'/files/(\d+)$', self.path)
+        if match:
+            return self._send_virtual_file(int(match.group(1)), head_only)
+
+        route = self.routes.get(self.path.split('?')[0])
+        if route is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        content_type, body = route
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+
+def start_server(routes=None, delay=0):
+    """Démarre le serveur dans un thread et retourne (serveur, URL de base)"""
+    handler = type('Handler', (_Handler,), {'routes': dict(routes or {}), 'delay': delay})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
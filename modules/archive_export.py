@@ -0,0 +1,170 @@
+"""
+Export en flux de toutes les archives d'un utilisateur : JSON Lines (une archive
+par ligne) ou ZIP de fichiers JSON/TXT/PDF par archive, produit morceau par morceau
+
+Usage : python -m modules.archive_export --user NOM [--format ndjson|zip] [--output fichier]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+from datetime import datetime
+
+from modules.pdf_export import PdfExportJobs, render_archive_pdf
+from utils.zipstream import StreamingZipWriter
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', '.ndjson'),
+    'zip': ('application/zip', '.zip'),
+}
+ZIP_MEMBER_FORMATS = ('json', 'txt', 'pdf')
+EXPORT_BATCH_SIZE = 200
+# Taille maximale d'un export téléchargé depuis l'interface (Streamlit le garde en mémoire)
+EXPORT_MAX_BYTES = int(os.getenv('EXPORT_MAX_BYTES', 200 * 1024 * 1024))
+
+
+class ExportTooLargeError(ValueError):
+    """Export plus volumineux que la limite du téléchargement depuis l'interface"""
+
+
+def archive_to_text(archive, username):
+    """Version texte d'une archive"""
+    parts = [f"""Archive Simandou-GN-IA
+Titre: {archive['title']}
+Date: {archive['timestamp']}
+Utilisateur: {username}
+
+Historique de la conversation:
+{"=" * 50}
+
+"""]
+    for msg in archive['history']:
+        role = "UTILISATEUR" if msg['role'] == 'user' else "ASSISTANT"
+        parts.append(f"{role}:\n{msg['text']}\n\n{'=' * 50}\n\n")
+    return "".join(parts)
+
+
+def _member_name(archive):
+    """Nom de fichier stable et lisible : identifiant puis titre simplifié"""
+    slug = re.sub(r'[^\w-]+', '_', archive['title'] or '', flags=re.UNICODE).strip('_')[:40]
+    return f"{str(archive['id']).zfill(6)}_{slug or 'archive'}"
+
+
+def _archive_pdf(archive, username):
+    """PDF de l'archive : rendu en cache s'il existe, sinon rendu immédiat"""
+    cached_path = PdfExportJobs.get_cached(archive, username)
+    if cached_path:
+        with open(cached_path, 'rb') as f:
+            return f.read()
+    return render_archive_pdf(archive, username)
+
+
+class ArchiveExporter:
+    def __init__(self, database, username):
+        self.db = database
+        self.username = username
+
+    def _archives(self):
+        return self.db.iter_user_archives(self.username, batch_size=EXPORT_BATCH_SIZE)
+
+    def iter_ndjson(self):
+        """Une archive JSON par ligne, un morceau par archive"""
+        for archive in self._archives():
+            yield (json.dumps(archive, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def iter_zip(self, formats=ZIP_MEMBER_FORMATS):
+        """ZIP écrit en flux : un morceau par archive, puis le répertoire central"""
+        writer = StreamingZipWriter()
+        for archive in self._archives():
+            name = _member_name(archive)
+            parts = []
+            if 'json' in formats:
+                parts.append(writer.add(f"json/{name}.json", json.dumps(archive, ensure_ascii=False, indent=2)))
+            if 'txt' in formats:
+                parts.append(writer.add(f"txt/{name}.txt", archive_to_text(archive, self.username)))
+            if 'pdf' in formats:
+                # Le PDF est déjà compressé en interne
+                parts.append(writer.add(f"pdf/{name}.pdf", _archive_pdf(archive, self.username), compress=False))
+            yield b"".join(parts)
+        yield from writer.finish()
+
+    def iter_export(self, export_format='ndjson', formats=ZIP_MEMBER_FORMATS):
+        if export_format == 'zip':
+            return self.iter_zip(formats)
+        return self.iter_ndjson()
+
+    def write_to(self, output, export_format='ndjson', formats=ZIP_MEMBER_FORMATS, max_bytes=None):
+        """
+        Écrit l'export dans un fichier (chemin ou objet binaire) ; retourne le nombre
+        d'octets. Au-delà de max_bytes, l'écriture s'arrête (ExportTooLargeError).
+        """
+        if isinstance(output, (str, os.PathLike)):
+            with open(output, 'wb') as f:
+                return self.write_to(f, export_format, formats, max_bytes)
+
+        total = 0
+        for chunk in self.iter_export(export_format, formats):
+            if chunk:
+                total += len(chunk)
+                if max_bytes is not None and total > max_bytes:
+                    raise ExportTooLargeError(
+                        f"Export supérieur à {max_bytes // (1024 * 1024)} Mo : utilisez "
+                        f"python -m modules.archive_export --user {self.username} --format {export_format}")
+                output.write(chunk)
+        return total
+
+    def download_data(self, export_format='ndjson', formats=ZIP_MEMBER_FORMATS):
+        """
+        Contenu de l'export pour st.download_button (data=callable) : un fichier
+        ouvert en lecture, que Streamlit lit une seule fois. Streamlit garde le
+        contenu en mémoire, d'où la limite EXPORT_MAX_BYTES.
+        """
+        fd, path = tempfile.mkstemp(prefix='simandou_export_', suffix=EXPORT_FORMATS[export_format][1])
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                self.write_to(f, export_format, formats, max_bytes=EXPORT_MAX_BYTES)
+            return open(path, 'rb')
+        finally:
+            # Fichier déjà ouvert : l'espace disque est libéré à sa fermeture (POSIX)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def export_file_name(self, export_format):
+        return f"archives_{self.username}_{datetime.now().strftime('%Y%m%d')}{EXPORT_FORMATS[export_format][1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporte toutes les archives d'un utilisateur")
+    parser.add_argument('--user', required=True, help="Nom d'utilisateur")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+    parser.add_argument('--include', default=','.join(ZIP_MEMBER_FORMATS),
+                        help="Fichiers par archive dans le ZIP (json,txt,pdf)")
+    parser.add_argument('--output', help="Fichier de sortie ('-' : sortie standard)")
+    parser.add_argument('--backend', choices=('sqlite', 'postgres'), default='sqlite')
+    parser.add_argument('--db', default=os.getenv('STREAMLIT_DB_PATH', 'simandou_data.db'),
+                        help="Chemin de la base SQLite")
+    args = parser.parse_args(argv)
+
+    if args.backend == 'postgres':
+        from modules.database import PostgreSQLDatabase
+        database = PostgreSQLDatabase()
+    else:
+        from modules.database_sqlite import SQLiteDatabase
+        database = SQLiteDatabase(args.db)
+
+    exporter = ArchiveExporter(database, args.user)
+    formats = tuple(item.strip() for item in args.include.split(',') if item.strip() in ZIP_MEMBER_FORMATS)
+    output = args.output or exporter.export_file_name(args.format)
+    if output == '-':
+        exporter.write_to(sys.stdout.buffer, args.format, formats)
+    else:
+        size = exporter.write_to(output, args.format, formats)
+        print(f"{output} : {size / 1024:.0f} Ko", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
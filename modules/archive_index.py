@@ -0,0 +1,123 @@
+"""
+Recherche dans les archives de conversation : index BM25 des messages (construit
+à la demande et gardé en mémoire) et sélection sous un budget de tokens
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from modules.document_index import DocumentIndex, chunk_text, estimate_tokens
+from utils.cache import hash_bytes, read_json_cache, write_json_cache, evict_lru
+
+ARCHIVE_CONTEXT_TOKENS = int(os.getenv('ARCHIVE_CONTEXT_TOKENS', 8000))
+ARCHIVE_INDEX_CACHE_SIZE = 32  # Index gardés en mémoire (archives récemment consultées)
+ARCHIVE_TOP_K = 40  # Extraits candidats avant application du budget
+ARCHIVE_ANSWER_NAMESPACE = 'archive_answers'
+ARCHIVE_ANSWER_MAX_BYTES = int(os.getenv('ARCHIVE_ANSWER_MAX_BYTES', 10 * 1024 * 1024))
+ARCHIVE_PROMPT_VERSION = 1  # À incrémenter si le prompt change (invalide les réponses en cache)
+
+_indexes = OrderedDict()  # (id d'archive, empreinte du contenu) -> ArchiveIndex
+_lock = threading.Lock()
+
+
+def archive_fingerprint(archive):
+    """Empreinte du contenu d'une archive (change si l'historique est modifié)"""
+    return hash_bytes(json.dumps(archive['history'], ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+
+def _role_label(role):
+    return "Utilisateur" if role == 'user' else "Assistant"
+
+
+class ArchiveIndex:
+    """Messages d'une archive découpés en extraits, avec index BM25"""
+
+    def __init__(self, history):
+        self.messages = history
+        chunks = []
+        for position, msg in enumerate(history):
+            # Un extrait appartient toujours à un seul message (ancre = position)
+            chunks.extend(chunk_text(msg.get('text') or '', anchor=position))
+        self.index = DocumentIndex(chunks)
+
+    @staticmethod
+    def for_archive(archive):
+        """Index de l'archive, construit à la première question puis réutilisé"""
+        key = (archive['id'], archive_fingerprint(archive))
+        with _lock:
+            if key in _indexes:
+                _indexes.move_to_end(key)
+                return _indexes[key]
+
+        archive_index = ArchiveIndex(archive['history'])
+        with _lock:
+            _indexes[key] = archive_index
+            while len(_indexes) > ARCHIVE_INDEX_CACHE_SIZE:
+                _indexes.popitem(last=False)
+        return archive_index
+
+    def _format(self, position, text=None):
+        msg = self.messages[position]
+        return f"[message {position + 1}] {_role_label(msg['role'])}: {text or msg['text']}"
+
+    def build_context(self, question, max_tokens=ARCHIVE_CONTEXT_TOKENS):
+        """
+        Contexte pour une question : archive complète si elle tient dans le budget,
+        sinon les messages les plus pertinents (avec la question qui précède chaque
+        réponse retenue), dans l'ordre chronologique.
+        """
+        full = [self._format(position) for position in range(len(self.messages))]
+        if estimate_tokens("\n".join(full)) <= max_tokens:
+            return "\n".join(full), len(self.messages)
+
+        if not self.index.has_terms(question):
+            # Aucun terme de la question dans l'archive : la fin de la conversation
+            candidates = [{'anchor': position, 'text': None} for position in reversed(range(len(self.messages)))]
+        else:
+            candidates = self.index.search(question, ARCHIVE_TOP_K, document_order=False)
+
+        selected = {}  # position du message -> texte retenu
+        budget = max_tokens
+        for chunk in candidates:
+            position = chunk['anchor']
+            wanted = [position]
+            if self.messages[position]['role'] != 'user' and position > 0:
+                wanted.insert(0, position - 1)
+            for wanted_position in wanted:
+                if wanted_position in selected:
+                    continue
+                # Message court : en entier ; message long : uniquement l'extrait pertinent
+                text = self.messages[wanted_position]['text']
+                if wanted_position == position and chunk['text'] and len(text) > len(chunk['text']):
+                    text = chunk['text']
+                cost = estimate_tokens(self._format(wanted_position, text))
+                if cost > budget:
+                    continue
+                selected[wanted_position] = text
+                budget -= cost
+
+        lines = [self._format(position, selected[position]) for position in sorted(selected)]
+        return "\n".join(lines), len(selected)
+
+
+class ArchiveAnswerCache:
+    @staticmethod
+    def _key(archive, question, model_name):
+        normalized = ' '.join(question.lower().split())
+        payload = f"{ARCHIVE_PROMPT_VERSION}|{model_name}|{archive['id']}|{archive_fingerprint(archive)}|{normalized}"
+        return hash_bytes(payload.encode('utf-8'))
+
+    @staticmethod
+    def get(archive, question, model_name):
+        cached = read_json_cache(ARCHIVE_ANSWER_NAMESPACE, ArchiveAnswerCache._key(archive, question, model_name))
+        return cached['answer'] if cached else None
+
+    @staticmethod
+    def put(archive, question, model_name, answer):
+        try:
+            write_json_cache(ARCHIVE_ANSWER_NAMESPACE, ArchiveAnswerCache._key(archive, question, model_name),
+                             {'question': question, 'answer': answer})
+            evict_lru(ARCHIVE_ANSWER_NAMESPACE, ARCHIVE_ANSWER_MAX_BYTES)
+        except OSError:
+            pass
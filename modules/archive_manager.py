@@ -1,11 +1,14 @@
 # modules/archive_manager.py - VERSION MODIFIÉE
 import streamlit as st
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-import tempfile
-import os
+
+from modules.archive_export import archive_to_text
+from modules.archive_index import ArchiveIndex, ArchiveAnswerCache
+from modules.chat_view import ChatHistoryView
+from modules.session_events import SessionEvents, ARCHIVES_CHANGED
+from modules.pdf_export import PdfExportJobs
+
+PDF_POLL_SECONDS = 2
 
 
 class ArchiveManager:
@@ -17,7 +20,9 @@ class ArchiveManager:
         """Affiche l'interface de gestion des archives avec chat"""
         st.header("🗂️ Archives de conversation")
 
-        archives = self.db.get_user_archives(username, limit=100)
+        # Liste relue uniquement après la création ou la suppression d'une archive
+        archives = SessionEvents.cached('archives', (ARCHIVES_CHANGED,),
+                                        lambda: self.db.get_user_archives(username, limit=100), scope=username)
 
         if not archives:
             st.info("Aucune archive disponible.")
@@ -51,13 +56,13 @@ class ArchiveManager:
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            if st.button("📥 Télécharger en PDF", key=f"pdf_{archive['id']}"):
-                self._generate_pdf(archive, username)
+            self._render_pdf_controls(archive, username)
 
         with col2:
             if st.button("🗑️ Supprimer", key=f"delete_{archive['id']}"):
                 if st.session_state.get(f"confirm_delete_{archive['id']}", False):
                     if self.db.delete_archive(archive['id']):
+                        SessionEvents.emit(ARCHIVES_CHANGED)
                         st.success("Archive supprimée")
                         st.rerun()
                 else:
@@ -75,6 +80,7 @@ class ArchiveManager:
             with col_yes:
                 if st.button("Oui, supprimer", key=f"yes_del_{archive['id']}"):
                     if self.db.delete_archive(archive['id']):
+                        SessionEvents.emit(ARCHIVES_CHANGED)
                         st.session_state[f"confirm_delete_{archive['id']}"] = False
                         st.rerun()
             with col_no:
@@ -85,15 +91,15 @@ class ArchiveManager:
         # Zone de chat pour poser des questions sur cette archive
         st.markdown("### 💭 Poser une question sur cette conversation")
 
-        # Afficher l'historique original
+        # Afficher l'historique original (derniers messages, les précédents à la demande)
         with st.expander("📜 Historique de la conversation", expanded=True):
-            for msg in archive['history']:
-                avatar = "👤" if msg['role'] == 'user' else "🤖"
-                with st.chat_message(msg['role'], avatar=avatar):
-                    st.write(msg['text'])
-                    if 'timestamp' in msg:
-                        st.caption(f"_{msg['timestamp'][:19]}_")
+            ChatHistoryView.render(archive['history'], f"archive_{archive['id']}", show_timestamps=True)
 
+        self._render_archive_question(archive, username)
+
+    @st.fragment
+    def _render_archive_question(self, archive, username):
+        """Question sur l'archive dans un fragment : l'historique n'est pas redessiné"""
         # Zone pour poser des questions
         user_question = st.chat_input(
             f"Posez une question sur cette conversation...",
@@ -111,173 +117,100 @@ class ArchiveManager:
             st.markdown(question)
 
         try:
-            # Préparer le contexte de l'archive
-            archive_context = self._prepare_archive_context(archive)
+            model_manager = self.chat_handler.model_manager
+            model = model_manager.get_default_model()
+            model_name = model_manager.models['default']
+            if model is None:
+                st.error("Modèle indisponible pour le moment")
+                return
 
             with st.chat_message("assistant", avatar="🤖"):
                 message_placeholder = st.empty()
 
-                with st.spinner("Analyse de l'archive..."):
-                    # Créer une requête avec le contexte
-                    full_prompt = f"""J'ai une question concernant une conversation archivée:
+                # Même question sur la même archive : réponse déjà connue
+                answer = ArchiveAnswerCache.get(archive, question, model_name)
+                if answer is None:
+                    with st.spinner("Analyse de l'archive..."):
+                        # Préparer le contexte de l'archive (messages pertinents pour la question)
+                        archive_context, message_count = self._prepare_archive_context(archive, question)
+
+                        # Créer une requête avec le contexte
+                        full_prompt = f"""J'ai une question concernant une conversation archivée.
 
-                    CONTEXTE DE LA CONVERSATION:
-                    {archive_context}
+                        EXTRAITS DE LA CONVERSATION ({message_count} messages sur {len(archive['history'])}, numérotés dans l'ordre):
+                        {archive_context}
 
-                    QUESTION DE L'UTILISATEUR:
-                    {question}
+                        QUESTION DE L'UTILISATEUR:
+                        {question}
 
-                    Veuillez répondre en vous basant uniquement sur le contenu de la conversation archivée.
-                    Si la réponse n'est pas dans l'archive, dites-le clairement."""
+                        Veuillez répondre en vous basant uniquement sur le contenu de la conversation archivée.
+                        Si la réponse n'est pas dans l'archive, dites-le clairement."""
 
-                    # Utiliser le chat_handler pour la réponse
-                    response = self.chat_handler.model.generate_content(full_prompt)
+                        response = model.generate_content(full_prompt)
+                        answer = response.text
+                        ArchiveAnswerCache.put(archive, question, model_name, answer)
 
-                    message_placeholder.markdown(response.text)
+                message_placeholder.markdown(answer)
 
             # Optionnel: Sauvegarder cette interaction
-            self._save_archive_interaction(archive['id'], question, response.text, username)
+            self._save_archive_interaction(archive['id'], question, answer, username)
 
         except Exception as e:
             st.error(f"Erreur lors du traitement de la question: {e}")
 
-    def _prepare_archive_context(self, archive):
-        """Prépare le contexte à partir de l'archive"""
-        context_lines = []
-        for msg in archive['history']:
-            role = "Utilisateur" if msg['role'] == 'user' else "Assistant"
-            context_lines.append(f"{role}: {msg['text']}")
-
-        return "\n".join(context_lines[:50])  # Limiter à 50 messages max
+    def _prepare_archive_context(self, archive, question):
+        """Prépare le contexte à partir des messages de l'archive les plus pertinents pour la question"""
+        return ArchiveIndex.for_archive(archive).build_context(question)
 
     def _save_archive_interaction(self, archive_id, question, answer, username):
         """Sauvegarde l'interaction avec l'archive"""
         # Pour l'instant, on ne sauvegarde pas, mais on pourrait le faire
         pass
 
-    def _generate_pdf(self, archive, username):
-        """Génère un PDF à partir d'une archive"""
-        try:
-            # Créer un fichier temporaire pour le PDF
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', mode='wb') as tmp_file:
-                pdf_path = tmp_file.name
-
-                # Créer le PDF
-                c = canvas.Canvas(pdf_path, pagesize=letter)
-                width, height = letter
-
-                # En-tête
-                c.setFont("Helvetica-Bold", 16)
-                c.drawString(50, height - 50, "Archive Simandou-GN-IA")
-                c.setFont("Helvetica", 12)
-                c.drawString(50, height - 70, f"Titre: {archive['title']}")
-                c.drawString(50, height - 85, f"Date: {archive['timestamp'][:19]}")
-                c.drawString(50, height - 100, f"Utilisateur: {username}")
-
-                # Ligne de séparation
-                c.line(50, height - 110, width - 50, height - 110)
-
-                # Contenu
-                y_position = height - 130
-                c.setFont("Helvetica-Bold", 12)
-                c.drawString(50, y_position, "Historique de la conversation:")
-                y_position -= 20
-
-                c.setFont("Helvetica", 10)
-                for i, msg in enumerate(archive['history'], 1):
-                    role = "UTILISATEUR" if msg['role'] == 'user' else "ASSISTANT"
-                    text = msg['text']
-
-                    # Vérifier si on doit changer de page
-                    if y_position < 100:
-                        c.showPage()
-                        c.setFont("Helvetica", 10)
-                        y_position = height - 50
-
-                    # Écrire le rôle
-                    c.setFont("Helvetica-Bold", 10)
-                    c.drawString(50, y_position, f"{role}:")
-                    y_position -= 15
-
-                    # Écrire le texte avec retour à la ligne
-                    c.setFont("Helvetica", 10)
-                    lines = self._split_text(text, 100)
-                    for line in lines:
-                        if y_position < 50:
-                            c.showPage()
-                            c.setFont("Helvetica", 10)
-                            y_position = height - 50
-                        c.drawString(70, y_position, line)
-                        y_position -= 15
-
-                    y_position -= 10  # Espace entre les messages
-
-                # Pied de page
-                c.setFont("Helvetica-Oblique", 8)
-                c.drawString(50, 30, f"Généré le {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                c.drawString(50, 20, "Simandou-GN-IA - L'excellence IA made in Africa")
-
-                c.save()
-
-            # Proposer le téléchargement
-            with open(pdf_path, 'rb') as f:
-                pdf_bytes = f.read()
-
-            # Créer un bouton de téléchargement
-            st.download_button(
-                label="📥 Télécharger le PDF",
-                data=pdf_bytes,
-                file_name=f"archive_{archive['title'][:30]}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                mime="application/pdf",
-                key=f"download_pdf_{archive['id']}"
-            )
-
-            # Nettoyer le fichier temporaire
-            os.unlink(pdf_path)
+    def _render_pdf_controls(self, archive, username):
+        """Bouton PDF : rendu en arrière-plan, téléchargement servi depuis le cache"""
+        status, detail = PdfExportJobs.status(archive, username)
 
-        except Exception as e:
-            st.error(f"Erreur lors de la génération du PDF: {e}")
-            # Fallback: Exporter en texte
-            self._export_as_text(archive, username)
-
-    def _split_text(self, text, max_line_length):
-        """Divise un texte en lignes de longueur maximale"""
-        words = text.split()
-        lines = []
-        current_line = []
-
-        for word in words:
-            if len(' '.join(current_line + [word])) <= max_line_length:
-                current_line.append(word)
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
+        # Pendant le rendu, seul ce fragment est réexécuté périodiquement
+        @st.fragment(run_every=PDF_POLL_SECONDS if status == 'running' else None)
+        def _pdf_controls():
+            current_status, current_detail = PdfExportJobs.status(archive, username)
+            if current_status != status and status == 'running':
+                # Rendu terminé : la page est réaffichée une fois, sans rafraîchissement périodique
+                st.rerun()
 
-        if current_line:
-            lines.append(' '.join(current_line))
+            if current_status == 'ready':
+                with open(current_detail, 'rb') as f:
+                    st.download_button(
+                        label="📥 Télécharger le PDF",
+                        data=f.read(),
+                        file_name=f"archive_{archive['title'][:30]}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf",
+                        key=f"download_pdf_{archive['id']}"
+                    )
+            elif current_status == 'running':
+                st.button("⏳ PDF en préparation...", key=f"pdf_{archive['id']}", disabled=True)
+            else:
+                if current_status == 'failed':
+                    st.error(f"Erreur lors de la génération du PDF: {current_detail}")
+                    # Fallback: Exporter en texte
+                    self._export_as_text(archive, username)
+                if st.button("📥 Télécharger en PDF", key=f"pdf_{archive['id']}"):
+                    try:
+                        PdfExportJobs.submit(archive, username)
+                    except Exception as e:
+                        st.error(f"Erreur lors de la génération du PDF: {e}")
+                        return
+                    st.rerun()
 
-        return lines
+        _pdf_controls()
 
     def _export_as_text(self, archive, username):
         """Exporte l'archive en format texte (fallback)"""
-        text_content = f"""Archive Simandou-GN-IA
-Titre: {archive['title']}
-Date: {archive['timestamp']}
-Utilisateur: {username}
-
-Historique de la conversation:
-{"=" * 50}
-
-"""
-
-        for msg in archive['history']:
-            role = "UTILISATEUR" if msg['role'] == 'user' else "ASSISTANT"
-            text_content += f"{role}:\n{msg['text']}\n\n{'=' * 50}\n\n"
-
         st.download_button(
             label="📄 Télécharger en TXT (fallback)",
-            data=text_content,
+            data=archive_to_text(archive, username),
             file_name=f"archive_{archive['title'][:30]}.txt",
             mime="text/plain",
             key=f"download_txt_{archive['id']}"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,220 @@
+"""
+Pipeline audio pour les longs enregistrements : découpage en segments (ffmpeg),
+transcription concurrente des segments et assemblage dans l'ordre
+"""
+import os
+import time
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import google.generativeai as genai
+
+from utils.cache import read_json_cache, write_json_cache
+
+AUDIO_CACHE_NAMESPACE = 'audio_segments'
+AUDIO_PIPELINE_VERSION = 1
+AUDIO_SEGMENT_SECONDS = int(os.getenv('AUDIO_SEGMENT_SECONDS', 600))
+AUDIO_BITRATE = os.getenv('AUDIO_BITRATE', '32k')  # Opus mono : suffisant pour la parole
+AUDIO_MAX_WORKERS = int(os.getenv('AUDIO_MAX_WORKERS', 3))
+AUDIO_SPLIT_TIMEOUT = 1800
+AUDIO_RATE_LIMIT_WAIT = int(os.getenv('AUDIO_RATE_LIMIT_WAIT', 180))  # Attente maximale d'une place RPM par segment
+
+TRANSCRIPTION_PROMPT = (
+    "Transcris fidèlement cet extrait audio, dans la langue parlée. "
+    "Réponds uniquement avec la transcription, sans commentaire ni horodatage."
+)
+
+
+def _format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class TranscriptionLimitError(RuntimeError):
+    """Segment non transcrit : limite du modèle ou quota journalier de l'utilisateur atteint"""
+
+
+class TranscriptionBudget:
+    """
+    Limites des requêtes de transcription : débit du modèle (RPM du ModelManager)
+    et quota journalier de l'utilisateur (chaque segment compte comme une requête)
+    """
+
+    def __init__(self, model_manager, database=None, username=None, max_wait=AUDIO_RATE_LIMIT_WAIT):
+        self.model_manager = model_manager
+        self.db = database
+        self.username = username
+        self.max_wait = max_wait
+        self.charged = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def model(self):
+        return self.model_manager.get_default_model()
+
+    def acquire(self):
+        """Réserve une requête : quota de l'utilisateur, puis attente d'une place dans la limite RPM"""
+        if self.db is not None and self.username:
+            with self._lock:
+                # Les segments en cours comptent déjà : pas de dépassement par les appels concurrents
+                allowed, max_requests, current_count = self.db.check_and_update_requests(self.username)
+                if not allowed or current_count + self._in_flight >= max_requests:
+                    raise TranscriptionLimitError(f"Limite journalière atteinte ({current_count}/{max_requests})")
+                self._in_flight += 1
+
+        deadline = time.monotonic() + self.max_wait
+        while not self.model_manager.reserve('default'):
+            wait = min(self.model_manager.seconds_until_reset('default'), deadline - time.monotonic())
+            if wait <= 0:
+                self.release()
+                raise TranscriptionLimitError("Limite de requêtes par minute du modèle atteinte")
+            time.sleep(min(wait, 1))
+
+    def release(self):
+        if self.db is not None and self.username:
+            with self._lock:
+                self._in_flight = max(0, self._in_flight - 1)
+
+    def charge(self):
+        """Requête réussie : décomptée du quota journalier de l'utilisateur"""
+        with self._lock:
+            # Segments terminés en parallèle : increment_request_count lit puis réécrit le compteur
+            if self.db is not None and self.username and hasattr(self.db, 'increment_request_count'):
+                self.db.increment_request_count(self.username)
+            self.charged += 1
+
+
+class AudioPipeline:
+    @staticmethod
+    def is_available():
+        """Le découpage nécessite ffmpeg"""
+        return shutil.which('ffmpeg') is not None
+
+    @staticmethod
+    def _cache_key(source_key, index=None):
+        """Clé du manifeste (index=None) ou d'un segment ; change avec les paramètres de découpage"""
+        suffix = 'manifest' if index is None else f"{index:04d}"
+        return f"{source_key}_{AUDIO_SEGMENT_SECONDS}s_{AUDIO_BITRATE}_v{AUDIO_PIPELINE_VERSION}_{suffix}"
+
+    @staticmethod
+    def get_cached_transcript(source_key):
+        """Transcription complète si tous les segments sont déjà en cache (aucun téléchargement)"""
+        manifest = read_json_cache(AUDIO_CACHE_NAMESPACE, AudioPipeline._cache_key(source_key))
+        if not manifest:
+            return None
+
+        texts = []
+        for index in range(manifest['segments']):
+            cached = read_json_cache(AUDIO_CACHE_NAMESPACE, AudioPipeline._cache_key(source_key, index))
+            if cached is None:
+                return None
+            texts.append(cached['text'])
+        return AudioPipeline._stitch(texts)
+
+    @staticmethod
+    def split(audio_path, output_dir):
+        """Découpe l'audio en segments Opus mono de AUDIO_SEGMENT_SECONDS (un seul passage ffmpeg)"""
+        pattern = os.path.join(output_dir, 'segment_%04d.ogg')
+        command = [
+            shutil.which('ffmpeg'), '-y', '-loglevel', 'error', '-i', audio_path,
+            '-vn', '-map_metadata', '-1', '-ac', '1', '-c:a', 'libopus', '-b:a', AUDIO_BITRATE,
+            '-f', 'segment', '-segment_time', str(AUDIO_SEGMENT_SECONDS), '-reset_timestamps', '1',
+            pattern
+        ]
+        subprocess.run(command, check=True, capture_output=True, timeout=AUDIO_SPLIT_TIMEOUT)
+        return sorted(os.path.join(output_dir, name) for name in os.listdir(output_dir)
+                      if name.startswith('segment_'))
+
+    @staticmethod
+    def _transcribe_segment(segment_path, budget):
+        """Transcrit un segment dans les limites du budget (requête décomptée en cas de succès)"""
+        model = budget.model()
+        if model is None:
+            raise RuntimeError("Modèle de transcription indisponible")
+        budget.acquire()
+        try:
+            text = AudioPipeline._generate_transcript(segment_path, model)
+            budget.charge()
+            return text
+        finally:
+            budget.release()
+
+    @staticmethod
+    def _generate_transcript(segment_path, model):
+        """Envoie un segment, le fait transcrire puis supprime le fichier distant"""
+        gemini_file = genai.upload_file(path=segment_path, mime_type='audio/ogg')
+        try:
+            while gemini_file.state.name == "PROCESSING":
+                time.sleep(1)
+                gemini_file = genai.get_file(gemini_file.name)
+            if gemini_file.state.name == "FAILED":
+                raise RuntimeError("Échec du traitement du segment audio")
+
+            response = model.generate_content([TRANSCRIPTION_PROMPT, gemini_file])
+            return response.text.strip()
+        finally:
+            try:
+                genai.delete_file(gemini_file.name)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _stitch(texts):
+        """Assemble les transcriptions dans l'ordre, un paragraphe horodaté par segment"""
+        paragraphs = []
+        for index, text in enumerate(texts):
+            body = text if text is not None else "(transcription indisponible pour cet extrait)"
+            paragraphs.append(f"[{_format_timestamp(index * AUDIO_SEGMENT_SECONDS)}] {body}")
+        return "\n\n".join(paragraphs)
+
+    @staticmethod
+    def transcribe(audio_path, source_key, budget, progress_callback=None):
+        """
+        Découpe, transcrit les segments en parallèle dans les limites du budget
+        (TranscriptionBudget ; ceux déjà en cache sont réutilisés) et retourne
+        (transcription assemblée, segments en échec, nombre de segments).
+        """
+        work_dir = os.path.join(os.path.dirname(audio_path), 'segments')
+        os.makedirs(work_dir, exist_ok=True)
+
+        try:
+            segments = AudioPipeline.split(audio_path, work_dir)
+            write_json_cache(AUDIO_CACHE_NAMESPACE, AudioPipeline._cache_key(source_key),
+                             {'segments': len(segments)})
+
+            texts = [None] * len(segments)
+            pending = []
+            for index in range(len(segments)):
+                cached = read_json_cache(AUDIO_CACHE_NAMESPACE, AudioPipeline._cache_key(source_key, index))
+                if cached is not None:
+                    texts[index] = cached['text']
+                else:
+                    pending.append(index)
+
+            done = len(segments) - len(pending)
+            if progress_callback:
+                progress_callback(done, len(segments))
+
+            failed = 0
+            if pending:
+                with ThreadPoolExecutor(max_workers=min(AUDIO_MAX_WORKERS, len(pending))) as executor:
+                    futures = {executor.submit(AudioPipeline._transcribe_segment, segments[index], budget): index
+                               for index in pending}
+                    for future in as_completed(futures):
+                        index = futures[future]
+                        try:
+                            texts[index] = future.result()
+                            # Un segment terminé n'est jamais refait lors d'une nouvelle tentative
+                            write_json_cache(AUDIO_CACHE_NAMESPACE, AudioPipeline._cache_key(source_key, index),
+                                             {'text': texts[index]})
+                        except Exception:
+                            failed += 1
+                        done += 1
+                        if progress_callback:
+                            progress_callback(done, len(segments))
+
+            return AudioPipeline._stitch(texts), failed, len(segments)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -187,13 +187,7 @@ class AuthManager:
         if st.session_state.logged_in and 'chat_session' in st.session_state:
             self.db.save_active_chat(st.session_state.username, st.session_state.chat_session)
 
-        # Nettoyer les fichiers
-        if st.session_state.current_file:
-            try:
-                import google.generativeai as genai
-                genai.delete_file(name=st.session_state.current_file.name)
-            except Exception:
-                pass
+        # Les fichiers de l'espace de travail restent persistés avec la conversation
 
         # ============ NETTOYAGE COMPLET DE LA SESSION ============
         # Liste de toutes les variables de session à supprimer
@@ -201,6 +195,8 @@ class AuthManager:
             'auth_token', 'login_time',  # Tokens de session
             'logged_in', 'username', 'chat_session',  # Authentification
             'current_file', 'viewing_archive_id',  # Données chat
+            'document_indexes', 'query_stats',  # Index des documents
+            'workspace_documents', 'workspace_files', 'workspace_loaded_for',  # Espace de travail
             'forgot_state', 'user_stats',  # État utilisateur
             'active_tab'  # Interface
         ]
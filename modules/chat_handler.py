@@ -1,35 +1,55 @@
+import time
 import streamlit as st
 import google.generativeai as genai
 from datetime import datetime
 
+from modules.chat_view import ChatHistoryView
+from modules.document_index import estimate_tokens
+from modules.file_state import FileStateCache
+from modules.session_events import SessionEvents, QUOTA_CHANGED, ARCHIVES_CHANGED, DOCUMENTS_CHANGED
+from modules.workspace import DocumentWorkspace
+from utils.metrics import CHAT_REQUESTS, QUOTA_REJECTIONS, GEMINI_LATENCY, GEMINI_PROMPT_TOKENS
+from utils.tracing import trace, span, annotate
+
+MAX_QUERY_STATS = 50
+
 
 class ChatHandler:
     def __init__(self, model_manager, database):
         self.model_manager = model_manager
         self.db = database
+        self.workspace = DocumentWorkspace(database, model_manager)
 
     def process_user_query(self, query):
-        """Traite une requête utilisateur de manière transparente"""
+        """Traite une requête utilisateur de manière transparente (tracée étape par étape)"""
+        with trace('chat.turn', user=st.session_state.username or ''):
+            self._process_user_query(query)
 
+    def _process_user_query(self, query):
         # Vérification de base
         if st.session_state.viewing_archive_id is not None:
             st.error("Mode lecture seule activé")
             return
 
         # Vérifier la limite de requêtes
-        can_request, max_requests, current_count = self.db.check_and_update_requests(
-            st.session_state.username
-        )
+        with span('chat.quota'):
+            can_request, max_requests, current_count = self.db.check_and_update_requests(
+                st.session_state.username
+            )
 
         if not can_request:
+            QUOTA_REJECTIONS.inc()
             st.error(f"❌ Limite journalière atteinte ({current_count}/{max_requests} requêtes)")
             return
 
         # Analyser le type de fichier
-        file_type = self._get_file_type()
+        with span('chat.file_type'):
+            file_type = self._get_file_type()
 
         # Sélection automatique et transparente du modèle
-        model, model_type = self.model_manager.select_model(query, file_type)
+        with span('chat.select_model'):
+            model, model_type = self.model_manager.select_model(query, file_type)
+        annotate(model_type=model_type, file_type=file_type or '')
 
         # Afficher le message utilisateur
         with st.chat_message("user", avatar="👤"):
@@ -40,9 +60,12 @@ class ChatHandler:
             message_placeholder = st.empty()
 
             with st.spinner("Simandou réfléchit..."):
+                valid_files = []
+                mode = 'text'
                 try:
-                    # Vérifier et préparer le fichier
-                    valid_file = self._validate_current_file()
+                    # Vérifier et préparer les fichiers de l'espace de travail
+                    with span('chat.validate_files'):
+                        valid_files = self._get_valid_files()
 
                     # Préparer la session de chat
                     history = st.session_state.chat_session.history[:] if hasattr(st.session_state.chat_session,
@@ -50,70 +73,159 @@ class ChatHandler:
                     new_chat = model.start_chat(history=history)
                     st.session_state.chat_session = new_chat
 
-                    # Envoyer la requête
-                    if valid_file:
-                        response = new_chat.send_message([query, valid_file])
+                    # Préparer les parties (extraits pertinents pour les longs documents)
+                    parts = [query]
+                    context_chars = 0
+                    with span('chat.build_context', files=len(valid_files)):
+                        for valid_file in valid_files:
+                            document_index = self._get_document_index(valid_file)
+                            if document_index is not None:
+                                context = document_index.build_context(query)
+                                context_chars += len(context)
+                                parts.append(context)
+                            else:
+                                parts.append(valid_file)
+
+                    if context_chars:
+                        mode = 'retrieval'
                     else:
-                        response = new_chat.send_message(query)
+                        mode = 'file' if valid_files else 'text'
+
+                    # Envoyer la requête
+                    start_time = time.perf_counter()
+                    with span('chat.model_call', mode=mode):
+                        response = new_chat.send_message(parts if len(parts) > 1 else query)
 
                     # Afficher la réponse
                     message_placeholder.markdown(response.text)
 
+                    latency_ms = (time.perf_counter() - start_time) * 1000
+                    GEMINI_LATENCY.labels(model=model_type, mode=mode).observe(latency_ms / 1000)
+                    if mode == 'retrieval':
+                        self._strip_retrieval_context(new_chat, query)
+                    self._record_query_stats(mode, response, query, context_chars, latency_ms, model_type)
+
                     # Mettre à jour les compteurs (transparent)
-                    self.model_manager.update_counter(model_type)
+                    with span('chat.update_counters'):
+                        self.model_manager.update_counter(model_type)
 
-                    # Incrémenter le compteur utilisateur
-                    if hasattr(self.db, 'increment_request_count'):
-                        self.db.increment_request_count(st.session_state.username)
+                        # Incrémenter le compteur utilisateur
+                        if hasattr(self.db, 'increment_request_count'):
+                            self.db.increment_request_count(st.session_state.username)
+                    SessionEvents.emit(QUOTA_CHANGED)
 
                     # Sauvegarder le chat
-                    self.db.save_active_chat(st.session_state.username, new_chat)
+                    with span('chat.save'):
+                        self.db.save_active_chat(st.session_state.username, new_chat)
 
                     # Mettre à jour les statistiques
                     if st.session_state.username:
-                        st.session_state.user_stats = self.db.get_user_stats(st.session_state.username)
+                        with span('chat.user_stats'):
+                            st.session_state.user_stats = self.db.get_user_stats(st.session_state.username)
+                    CHAT_REQUESTS.labels(model=model_type, mode=mode, status='ok').inc()
 
                 except Exception as e:
+                    # Les fichiers seront re-vérifiés au prochain message
+                    for valid_file in valid_files:
+                        FileStateCache.mark_for_check(valid_file.name)
+
                     # Gestion d'erreur discrète
-                    self._handle_error(e)
+                    CHAT_REQUESTS.labels(model=model_type, mode=mode, status=self._handle_error(e)).inc()
 
     def _get_file_type(self):
-        """Détection rapide du type de fichier"""
-        if not st.session_state.current_file:
+        """Détection rapide du type de fichier (sur l'ensemble des documents prêts)"""
+        file_names = [document['display_name'].lower() for document in self.workspace.get_documents()
+                      if document['status'] == 'ready']
+        if not file_names:
             return None
 
-        file_name = st.session_state.current_file.display_name.lower()
-
         # Vérifications rapides
-        if any(ext in file_name for ext in ['.pdf', '.doc', '.docx']):
+        if any(ext in file_name for file_name in file_names for ext in ['.pdf', '.doc', '.docx']):
             return 'document'
-        elif any(ext in file_name for ext in ['.py', '.js', '.java', '.cpp']):
+        elif any(ext in file_name for file_name in file_names for ext in ['.py', '.js', '.java', '.cpp']):
             return 'code'
 
         return 'other'
 
-    def _validate_current_file(self):
-        """Vérification rapide de validité du fichier"""
-        if not st.session_state.current_file:
-            return None
+    def _get_valid_files(self):
+        """Retourne les fichiers de l'espace de travail encore disponibles"""
+        return [valid_file for valid_file in map(self._validate_file, self.workspace.get_ready_files())
+                if valid_file]
+
+    def _validate_file(self, current_file):
+        """
+        Vérification de validité d'un fichier, sans appel réseau tant que
+        le fichier n'approche pas de son expiration et qu'aucun envoi n'a échoué
+        """
+        if not FileStateCache.needs_verification(current_file.name):
+            return current_file
 
         try:
-            genai.get_file(st.session_state.current_file.name)
-            return st.session_state.current_file
+            remote_file = genai.get_file(current_file.name)
+            if remote_file.state.name == "ACTIVE":
+                FileStateCache.record(remote_file)
+                return remote_file
         except Exception:
-            st.session_state.current_file = None
+            pass
+
+        # Fichier expiré ou introuvable : ré-envoi transparent depuis la copie locale
+        return self.workspace.refresh_file(st.session_state.username, current_file.name)
+
+    def _get_document_index(self, valid_file):
+        """Retourne l'index d'extraits du fichier s'il est assez long pour la recherche"""
+        if not valid_file:
             return None
 
+        document_index = st.session_state.get('document_indexes', {}).get(valid_file.name)
+        if document_index is not None and document_index.is_large():
+            return document_index
+        return None
+
+    def _strip_retrieval_context(self, chat, query):
+        """Retire les extraits du dernier message pour ne pas les renvoyer aux tours suivants"""
+        try:
+            history = chat.history
+            if len(history) >= 2 and history[-2].role == 'user':
+                # Les références de fichiers sont conservées, seuls les extraits textuels sont retirés
+                file_parts = [part for part in history[-2].parts[1:] if part.file_data.file_uri]
+                history[-2] = genai.protos.Content(
+                    role='user',
+                    parts=[genai.protos.Part(text=query)] + file_parts
+                )
+        except Exception:
+            pass
+
+    def _record_query_stats(self, mode, response, query, context_chars, latency_ms, model_type=None):
+        """Conserve les mesures (tokens envoyés, latence) des dernières requêtes"""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', None) if usage else None
+        if isinstance(prompt_tokens, int):
+            GEMINI_PROMPT_TOKENS.labels(model=model_type, mode=mode).observe(prompt_tokens)
+
+        stats = st.session_state.setdefault('query_stats', [])
+        stats.append({
+            'mode': mode,
+            'prompt_tokens': prompt_tokens,
+            'estimated_tokens': estimate_tokens(query) + context_chars // 4,
+            'context_chars': context_chars,
+            'latency_ms': round(latency_ms, 1),
+            'timestamp': datetime.now().isoformat()
+        })
+        del stats[:-MAX_QUERY_STATS]
+
     def _handle_error(self, error):
-        """Gestion d'erreur sans détails techniques"""
+        """Gestion d'erreur sans détails techniques ; retourne la catégorie (quota, safety, error)"""
         error_msg = str(error).lower()
 
         if "quota" in error_msg or "limit" in error_msg:
             st.warning("⚠️ Veuillez patienter un instant avant de réessayer.")
+            return 'quota'
         elif "safety" in error_msg:
             st.error("⚠️ Cette requête ne peut pas être traitée.")
+            return 'safety'
         else:
             st.error("⚠️ Une erreur est survenue. Veuillez réessayer.")
+            return 'error'
 
     # Méthodes pour la gestion des archives
 
@@ -152,9 +264,13 @@ class ChatHandler:
         # Réinitialiser avec le modèle par défaut
         default_model = self.model_manager.get_default_model()
         st.session_state.chat_session = default_model.start_chat(history=[])
-        st.session_state.current_file = None
         st.session_state.viewing_archive_id = None
 
+        # Les documents ont été rattachés à l'archive
+        self.workspace.reset()
+        ChatHistoryView.reset('chat')
+        SessionEvents.emit(ARCHIVES_CHANGED, DOCUMENTS_CHANGED)
+
         # Mettre à jour les statistiques
         if st.session_state.username:
             st.session_state.user_stats = self.db.get_user_stats(st.session_state.username)
@@ -175,12 +291,9 @@ class ChatHandler:
         st.session_state.chat_session = self.create_chat_session_from_history(loaded_history)
         st.session_state.viewing_archive_id = archive_id
 
-        # Nettoyer le fichier actuel
-        if st.session_state.current_file:
-            try:
-                genai.delete_file(name=st.session_state.current_file.name)
-            except Exception:
-                pass
-            st.session_state.current_file = None
+        # L'espace de travail est rechargé avec les documents rattachés à l'archive
+        self.workspace.reset()
+        ChatHistoryView.reset('chat')
+        SessionEvents.emit(DOCUMENTS_CHANGED)
 
         st.rerun()
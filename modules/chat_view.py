@@ -0,0 +1,98 @@
+"""
+Affichage fenêtré des longues conversations : seuls les derniers messages sont
+rendus, les plus anciens sont chargés par pages à la demande
+"""
+import os
+import hashlib
+
+import streamlit as st
+
+CHAT_WINDOW_SIZE = int(os.getenv('CHAT_WINDOW_SIZE', 40))  # Messages affichés au départ
+CHAT_PAGE_SIZE = int(os.getenv('CHAT_PAGE_SIZE', 40))  # Messages ajoutés par « Charger plus »
+
+
+def message_text(message):
+    """Texte d'un message (objet Gemini, message reconstruit ou dictionnaire d'archive)"""
+    if isinstance(message, dict):
+        return message.get('text') or ''
+    if hasattr(message, 'parts'):
+        return next((part.text for part in message.parts if hasattr(part, 'text')), "")
+    if hasattr(message, 'text'):
+        return message.text
+    return str(message)
+
+
+def _message_role(message):
+    return message.get('role') if isinstance(message, dict) else message.role
+
+
+def _fingerprint(role, text):
+    return hashlib.blake2b(f"{role}\x00{text}".encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ChatHistoryView:
+    @staticmethod
+    def prepare(messages, view_key):
+        """
+        Liste des messages prêts à afficher (rôle, texte, empreinte), mémorisée en session.
+        L'historique ne faisant que s'allonger, seuls les nouveaux messages sont convertis ;
+        la liste est reconstruite si le dernier message déjà préparé a changé.
+        """
+        state_key = f"_chat_prepared_{view_key}"
+        prepared = st.session_state.get(state_key, [])
+
+        if len(prepared) > len(messages):
+            prepared = []
+        elif prepared:
+            last = len(prepared) - 1
+            if _fingerprint(_message_role(messages[last]), message_text(messages[last])) != prepared[last]['hash']:
+                prepared = []
+
+        if len(prepared) < len(messages):
+            prepared = prepared + [
+                {'role': _message_role(msg), 'text': message_text(msg),
+                 'timestamp': msg.get('timestamp') if isinstance(msg, dict) else None,
+                 'hash': _fingerprint(_message_role(msg), message_text(msg))}
+                for msg in messages[len(prepared):]
+            ]
+        st.session_state[state_key] = prepared
+        return prepared
+
+    @staticmethod
+    def _load_older(window_key, hidden):
+        st.session_state[window_key] = st.session_state.get(window_key, CHAT_WINDOW_SIZE) + min(CHAT_PAGE_SIZE, hidden)
+
+    @staticmethod
+    def render(messages, view_key, show_timestamps=False):
+        """Affiche les derniers messages, avec un bouton pour charger les précédents par pages"""
+        prepared = ChatHistoryView.prepare(messages, view_key)
+        window_key = f"chat_window_{view_key}"
+        window = st.session_state.get(window_key, CHAT_WINDOW_SIZE)
+        start = max(0, len(prepared) - window)
+
+        if start:
+            st.button(
+                f"⬆️ Afficher {min(CHAT_PAGE_SIZE, start)} messages précédents ({start} masqués)",
+                key=f"load_older_{view_key}",
+                on_click=ChatHistoryView._load_older,
+                args=(window_key, start),
+                use_container_width=True
+            )
+
+        for index in range(start, len(prepared)):
+            item = prepared[index]
+            if not item['text']:
+                continue
+            # Clé stable (position + contenu) : un message déjà affiché garde son identité
+            with st.container(key=f"msg_{view_key}_{index}_{item['hash']}"):
+                avatar = "👤" if item['role'] == "user" else "🤖"
+                with st.chat_message(item['role'], avatar=avatar):
+                    st.markdown(item['text'])
+                    if show_timestamps and item['timestamp']:
+                        st.caption(f"_{item['timestamp'][:19]}_")
+
+    @staticmethod
+    def reset(view_key):
+        """Revient à la fenêtre initiale (nouvelle conversation, autre archive)"""
+        st.session_state.pop(f"chat_window_{view_key}", None)
+        st.session_state.pop(f"_chat_prepared_{view_key}", None)
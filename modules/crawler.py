@@ -0,0 +1,222 @@
+"""
+Exploration bornée d'un site (même domaine) : robots.txt, sitemap,
+canonicalisation des URL et détection des pages quasi identiques
+"""
+import os
+import re
+import time
+import zlib
+from urllib.parse import urlparse, urlunparse, urljoin, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+
+from modules.html_extraction import extract_page
+from modules.http_client import cached_get
+from utils.concurrency import run_with_host_limits
+
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', 2))
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', 30))
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', 4))
+CRAWL_MAX_CHARS = 500000  # Taille maximale du document combiné
+SITEMAP_MAX_URLS = 500
+
+SHINGLE_WORDS = 5
+SHINGLE_SAMPLING = 4  # Une empreinte sur 4 est conservée (échantillon déterministe)
+DUPLICATE_SIMILARITY = 0.9  # Similarité de Jaccard au-delà de laquelle une page est un doublon
+MIN_PAGE_CHARS = 100
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'ref_src'}  # En plus des utm_*
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.mp3', '.mp4',
+                      '.avi', '.mov', '.css', '.js', '.xml', '.json', '.doc', '.docx', '.xls', '.xlsx')
+
+_LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+
+
+def canonicalize_url(url):
+    """Forme canonique : schéma et hôte en minuscules, sans fragment, port par défaut ni pistage"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if parsed.port and (scheme, parsed.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parsed.port}"
+
+    path = re.sub(r'/{2,}', '/', parsed.path or '/')
+    if path.endswith(('/index.html', '/index.htm', '/index.php')):
+        path = path.rsplit('/', 1)[0] + '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path[:-1]
+
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                             if not (key.lower().startswith('utm_') or key.lower() in TRACKING_PARAMS)))
+    return urlunparse((scheme, host, path, '', query, ''))
+
+
+def _site_of(url):
+    """Domaine d'un site, sans le préfixe www"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def shingle_fingerprint(text):
+    """Échantillon des empreintes des suites de SHINGLE_WORDS mots d'un texte"""
+    words = text.lower().split()
+    fingerprint = set()
+    for position in range(max(1, len(words) - SHINGLE_WORDS + 1)):
+        value = zlib.crc32(' '.join(words[position:position + SHINGLE_WORDS]).encode('utf-8'))
+        if value % SHINGLE_SAMPLING == 0:
+            fingerprint.add(value)
+    return fingerprint
+
+
+def similarity(first, second):
+    """Similarité de Jaccard de deux empreintes"""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class SiteCrawler:
+    def __init__(self, start_url, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES,
+                 concurrency=CRAWL_CONCURRENCY, progress_callback=None):
+        self.start_url = canonicalize_url(start_url)
+        self.site = _site_of(self.start_url)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = max(1, concurrency)
+        self.progress_callback = progress_callback
+
+        self.robots = None
+        self.crawl_delay = 0
+        self.pages = []
+        self.stats = {'fetched': 0, 'from_cache': 0, 'duplicates': 0, 'skipped': 0, 'errors': 0}
+
+    # === RÈGLES D'EXPLORATION ===
+
+    def _load_robots(self):
+        """Lit robots.txt (absent ou illisible : tout est autorisé) et retourne ses sitemaps"""
+        parsed = urlparse(self.start_url)
+        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+        self.robots = RobotFileParser(robots_url)
+        try:
+            response = cached_get(robots_url, timeout=10)
+            lines = response.text.splitlines() if response.status_code == 200 else []
+        except Exception:
+            lines = []
+        self.robots.parse(lines)
+        self.crawl_delay = self.robots.crawl_delay('*') or 0
+        sitemaps = self.robots.site_maps() or ['/sitemap.xml']
+        return [urljoin(robots_url, sitemap) for sitemap in sitemaps]
+
+    def _sitemap_urls(self, sitemap_urls):
+        """URL listées dans les sitemaps (un niveau d'index de sitemaps)"""
+        urls = []
+        pending = list(sitemap_urls)
+        visited = set()
+        while pending and len(urls) < SITEMAP_MAX_URLS:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+            try:
+                response = cached_get(sitemap_url, timeout=10)
+                if response.status_code != 200:
+                    continue
+            except Exception:
+                continue
+
+            for location in _LOC_RE.findall(response.text):
+                if location.endswith('.xml') and len(visited) < 5:
+                    pending.append(location)
+                else:
+                    urls.append(location)
+        return urls[:SITEMAP_MAX_URLS]
+
+    def _is_allowed(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or _site_of(url) != self.site:
+            return False
+        if parsed.path.lower().endswith(SKIPPED_EXTENSIONS):
+            return False
+        return self.robots is None or self.robots.can_fetch('*', url)
+
+    # === EXPLORATION ===
+
+    def _fetch(self, url):
+        """Télécharge une page (requête conditionnelle via le cache HTTP) et l'analyse"""
+        if self.crawl_delay:
+            time.sleep(self.crawl_delay)
+        response = cached_get(url, timeout=15)
+        response.raise_for_status()
+        if 'html' not in response.headers.get('content-type', 'text/html').lower():
+            return None
+        title, text, links = extract_page(response.content, url)
+        return {'url': url, 'title': title, 'text': text, 'links': links, 'from_cache': response.from_cache}
+
+    def crawl(self):
+        """Parcours en largeur, niveau par niveau, pages d'un niveau téléchargées en parallèle"""
+        sitemap_urls = [canonicalize_url(url) for url in self._sitemap_urls(self._load_robots())]
+
+        seen = {self.start_url}
+        level = [self.start_url] if self._is_allowed(self.start_url) else []
+        # Les pages du sitemap sont traitées comme des liens de la page de départ
+        next_from_sitemap = [url for url in sitemap_urls if url not in seen and self._is_allowed(url)]
+        seen.update(next_from_sitemap)
+
+        fingerprints = []
+        depth = 0
+        while level and len(self.pages) < self.max_pages:
+            level = level[:self.max_pages - len(self.pages)]
+            next_level = []
+
+            results = run_with_host_limits(
+                level, self._fetch, lambda url: self.site,
+                max_workers=1 if self.crawl_delay else self.concurrency,
+                per_host=1 if self.crawl_delay else self.concurrency
+            )
+            # Ordre stable : celui de la découverte des liens
+            order = {url: position for position, url in enumerate(level)}
+            for url, page, error in sorted(results, key=lambda result: order[result[0]]):
+                if error is not None:
+                    self.stats['errors'] += 1
+                    continue
+                if page is None or len(page['text']) < MIN_PAGE_CHARS:
+                    self.stats['skipped'] += 1
+                    continue
+
+                self.stats['fetched'] += 1
+                self.stats['from_cache'] += page['from_cache']
+
+                fingerprint = shingle_fingerprint(page['text'])
+                if any(similarity(fingerprint, other) >= DUPLICATE_SIMILARITY for other in fingerprints):
+                    self.stats['duplicates'] += 1
+                else:
+                    fingerprints.append(fingerprint)
+                    self.pages.append(page)
+
+                if depth < self.max_depth:
+                    for link in page['links']:
+                        link = canonicalize_url(link)
+                        if link not in seen and self._is_allowed(link):
+                            seen.add(link)
+                            next_level.append(link)
+
+                if self.progress_callback:
+                    self.progress_callback(len(self.pages), self.max_pages)
+
+            if depth == 0 and self.max_depth > 0:
+                next_level = next_level + [url for url in next_from_sitemap if url not in next_level]
+            level = next_level
+            depth += 1
+
+        return self.pages
+
+    def build_document(self, max_chars=CRAWL_MAX_CHARS):
+        """Assemble les pages retenues en un seul texte, une section par page"""
+        sections = []
+        length = 0
+        for number, page in enumerate(self.pages, 1):
+            section = f"## Page {number} : {page['title'] or page['url']}\nURL: {page['url']}\n\n{page['text']}"
+            if length + len(section) > max_chars:
+                break
+            sections.append(section)
+            length += len(section) + 2
+        return "\n\n".join(sections)
@@ -7,7 +7,13 @@ from psycopg2.extras import RealDictCursor
 import streamlit as st
 from contextlib import contextmanager
 
+from utils.metrics import timed_methods, DB_QUERY_SECONDS, DB_ERRORS
+from utils.query_log import wrap_connection
+from utils.tracing import traced_methods
 
+
+@traced_methods('db')
+@timed_methods(DB_QUERY_SECONDS, DB_ERRORS, backend='postgres')
 class PostgreSQLDatabase:
     MAX_FREE_REQUESTS = 15
 
@@ -36,7 +42,8 @@ class PostgreSQLDatabase:
             conn = psycopg2.connect(**self.conn_params)
             # Définir l'encodage explicitement
             conn.set_client_encoding('UTF8')
-            yield conn
+            # Instructions chronométrées (journal des requêtes lentes)
+            yield wrap_connection(conn, 'postgres')
         except psycopg2.OperationalError as e:
             error_msg = self._safe_encode(str(e))
             st.error(f"Erreur de connexion à la base de données: {error_msg}")
@@ -114,6 +121,27 @@ class PostgreSQLDatabase:
             chat_data TEXT NOT NULL DEFAULT '[]',
             archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
+
+        -- Table des documents attachés aux conversations
+        CREATE TABLE IF NOT EXISTS conversation_documents (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            conversation_key VARCHAR(50) NOT NULL DEFAULT 'active',
+            doc_key VARCHAR(255) NOT NULL,
+            display_name VARCHAR(255),
+            source_type VARCHAR(20),
+            source TEXT,
+            remote_name VARCHAR(255),
+            mime_type VARCHAR(100),
+            status VARCHAR(20) DEFAULT 'pending',
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, conversation_key, doc_key)
+        );
+
+        -- Index des requêtes fréquentes (plans vérifiés : python -m utils.query_log --plans)
+        CREATE INDEX IF NOT EXISTS idx_user_active ON active_chats(user_id);
+        CREATE INDEX IF NOT EXISTS idx_archive_user_date ON chat_archives(user_id, archived_at);
         """
 
         try:
@@ -338,11 +366,20 @@ class PostgreSQLDatabase:
             sql = """
             INSERT INTO chat_archives (user_id, title, chat_data)
             VALUES (%s, %s, %s)
+            RETURNING id
             """
 
             try:
                 with self._get_cursor() as cursor:
                     cursor.execute(sql, (user['id'], title, json.dumps(history_data)))
+                    archive_id = cursor.fetchone()['id']
+
+                    # Rattacher les documents du chat actif à l'archive
+                    cursor.execute(
+                        "UPDATE conversation_documents SET conversation_key = %s "
+                        "WHERE user_id = %s AND conversation_key = 'active'",
+                        (f"archive:{archive_id}", user['id'])
+                    )
 
                 # Vider le chat actif
                 self._clear_active_chat(user['id'])
@@ -401,6 +438,124 @@ class PostgreSQLDatabase:
             st.warning(f"Erreur recuperation archives: {error_msg}")
             return []
 
+    def iter_user_archives(self, username, batch_size=200):
+        """
+        Parcourt toutes les archives d'un utilisateur avec un curseur côté serveur
+        (lots de batch_size, mémoire constante quel que soit le nombre d'archives)
+        """
+        user = self.get_user(username)
+        if not user:
+            return
+
+        sql = """
+        SELECT id, title, archived_at, chat_data
+        FROM chat_archives
+        WHERE user_id = %s
+        ORDER BY id
+        """
+
+        with self._get_connection() as conn:
+            # Curseur nommé : les lignes sont transférées par lots de itersize
+            with conn.cursor(name=f"archive_export_{user['id']}", cursor_factory=RealDictCursor) as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(sql, (user['id'],))
+                for archive in cursor:
+                    try:
+                        history = json.loads(archive['chat_data']) if archive['chat_data'] else []
+                    except ValueError:
+                        # Archive corrompue : ignorée sans interrompre l'export
+                        continue
+                    archived_at = archive['archived_at']
+                    yield {
+                        'id': archive['id'],
+                        'title': archive['title'] or f"Archive #{archive['id']}",
+                        'timestamp': archived_at.isoformat() if archived_at else datetime.now().isoformat(),
+                        'history': history
+                    }
+
+    def save_conversation_document(self, username, document, conversation_key='active'):
+        """Crée ou met à jour un document attaché à une conversation"""
+        user = self.get_user(username)
+        if not user:
+            return False
+
+        sql = """
+        INSERT INTO conversation_documents
+        (user_id, conversation_key, doc_key, display_name, source_type, source,
+         remote_name, mime_type, status, error)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (user_id, conversation_key, doc_key) DO UPDATE SET
+            display_name = EXCLUDED.display_name,
+            remote_name = EXCLUDED.remote_name,
+            mime_type = EXCLUDED.mime_type,
+            status = EXCLUDED.status,
+            error = EXCLUDED.error
+        """
+
+        try:
+            with self._get_cursor() as cursor:
+                cursor.execute(sql, (
+                    user['id'], conversation_key, document['key'],
+                    document.get('display_name'), document.get('source_type'), document.get('source'),
+                    document.get('remote_name'), document.get('mime_type'),
+                    document.get('status', 'pending'), document.get('error')
+                ))
+                return True
+        except Exception as e:
+            error_msg = self._safe_encode(str(e))
+            st.warning(f"Erreur sauvegarde document: {error_msg}")
+            return False
+
+    def get_conversation_documents(self, username, conversation_key='active'):
+        """Récupère les documents attachés à une conversation"""
+        user = self.get_user(username)
+        if not user:
+            return []
+
+        sql = """
+        SELECT doc_key, display_name, source_type, source, remote_name, mime_type, status, error
+        FROM conversation_documents
+        WHERE user_id = %s AND conversation_key = %s
+        ORDER BY created_at, id
+        """
+
+        try:
+            with self._get_cursor() as cursor:
+                cursor.execute(sql, (user['id'], conversation_key))
+                return [{
+                    'key': row['doc_key'],
+                    'display_name': row['display_name'],
+                    'source_type': row['source_type'],
+                    'source': row['source'],
+                    'remote_name': row['remote_name'],
+                    'mime_type': row['mime_type'],
+                    'status': row['status'],
+                    'error': row['error']
+                } for row in cursor.fetchall()]
+        except Exception as e:
+            error_msg = self._safe_encode(str(e))
+            st.warning(f"Erreur recuperation documents: {error_msg}")
+            return []
+
+    def delete_conversation_document(self, username, doc_key, conversation_key='active'):
+        """Détache un document d'une conversation"""
+        user = self.get_user(username)
+        if not user:
+            return False
+
+        try:
+            with self._get_cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM conversation_documents "
+                    "WHERE user_id = %s AND conversation_key = %s AND doc_key = %s",
+                    (user['id'], conversation_key, doc_key)
+                )
+                return cursor.rowcount > 0
+        except Exception as e:
+            error_msg = self._safe_encode(str(e))
+            st.warning(f"Erreur suppression document: {error_msg}")
+            return False
+
     def check_and_update_requests(self, username):
         """Vérifie et met à jour le compteur de requêtes"""
         user = self.get_user(username)
@@ -7,7 +7,13 @@ from datetime import datetime, date
 import streamlit as st
 from contextlib import contextmanager
 
+from utils.metrics import timed_methods, DB_QUERY_SECONDS, DB_ERRORS
+from utils.query_log import wrap_connection
+from utils.tracing import traced_methods
 
+
+@traced_methods('db')
+@timed_methods(DB_QUERY_SECONDS, DB_ERRORS, backend='sqlite')
 class SQLiteDatabase:
     MAX_FREE_REQUESTS = 15
 
@@ -22,7 +28,8 @@ class SQLiteDatabase:
         try:
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row  # Pour avoir des dictionnaires
-            yield conn
+            # Instructions chronométrées (journal des requêtes lentes)
+            yield wrap_connection(conn, 'sqlite')
         except Exception as e:
             st.error(f"Erreur de connexion SQLite: {e}")
             raise
@@ -103,11 +110,35 @@ class SQLiteDatabase:
                 )
                 ''')
 
+                # Table des documents attachés aux conversations
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    conversation_key TEXT NOT NULL DEFAULT 'active',
+                    doc_key TEXT NOT NULL,
+                    display_name TEXT,
+                    source_type TEXT,
+                    source TEXT,
+                    remote_name TEXT,
+                    mime_type TEXT,
+                    status TEXT DEFAULT 'pending',
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                    UNIQUE(user_id, conversation_key, doc_key)
+                )
+                ''')
+
                 # Créer des index pour la performance
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_username ON users(username)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_requests ON daily_requests(user_id, request_date)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_active ON active_chats(user_id)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_user ON chat_archives(user_id)')
+                # Liste des archives triée par date sans tri temporaire (plan vérifié : python -m utils.query_log)
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_user_date ON chat_archives(user_id, archived_at)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_conversation '
+                               'ON conversation_documents(user_id, conversation_key)')
 
             #st.success("✅Succès")
 
@@ -314,6 +345,14 @@ class SQLiteDatabase:
             try:
                 with self._get_cursor() as cursor:
                     cursor.execute(sql, (user['id'], title, json.dumps(history_data)))
+                    archive_id = cursor.lastrowid
+
+                    # Rattacher les documents du chat actif à l'archive
+                    cursor.execute(
+                        "UPDATE conversation_documents SET conversation_key = ? "
+                        "WHERE user_id = ? AND conversation_key = 'active'",
+                        (f"archive:{archive_id}", user['id'])
+                    )
 
                 # Vider le chat actif
                 self._clear_active_chat(user['id'])
@@ -368,6 +407,123 @@ class SQLiteDatabase:
             return []
 
 
+    def iter_user_archives(self, username, batch_size=200):
+        """
+        Parcourt toutes les archives d'un utilisateur par lots de batch_size
+        (mémoire constante quel que soit le nombre d'archives)
+        """
+        user = self.get_user(username)
+        if not user:
+            return
+
+        # Ordre de l'index (user_id, rowid) : aucun tri de l'ensemble des archives
+        sql = """
+        SELECT id, title, archived_at, chat_data
+        FROM chat_archives
+        WHERE user_id = ?
+        ORDER BY id
+        """
+
+        with self._get_connection() as conn:
+            with self._get_cursor(conn) as cursor:
+                cursor.execute(sql, (user['id'],))
+                while True:
+                    archives = cursor.fetchmany(batch_size)
+                    if not archives:
+                        break
+                    for archive in archives:
+                        try:
+                            history = json.loads(archive[3]) if archive[3] else []
+                        except ValueError:
+                            # Archive corrompue : ignorée sans interrompre l'export
+                            continue
+                        yield {
+                            'id': archive[0],
+                            'title': archive[1] or f"Archive #{archive[0]}",
+                            'timestamp': archive[2] or datetime.now().isoformat(),
+                            'history': history
+                        }
+
+    def save_conversation_document(self, username, document, conversation_key='active'):
+        """Crée ou met à jour un document attaché à une conversation"""
+        user = self.get_user(username)
+        if not user:
+            return False
+
+        sql = """
+        INSERT INTO conversation_documents
+        (user_id, conversation_key, doc_key, display_name, source_type, source,
+         remote_name, mime_type, status, error)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, conversation_key, doc_key) DO UPDATE SET
+            display_name = excluded.display_name,
+            remote_name = excluded.remote_name,
+            mime_type = excluded.mime_type,
+            status = excluded.status,
+            error = excluded.error
+        """
+
+        try:
+            with self._get_cursor() as cursor:
+                cursor.execute(sql, (
+                    user['id'], conversation_key, document['key'],
+                    document.get('display_name'), document.get('source_type'), document.get('source'),
+                    document.get('remote_name'), document.get('mime_type'),
+                    document.get('status', 'pending'), document.get('error')
+                ))
+                return True
+        except Exception as e:
+            st.error(f"Erreur sauvegarde document: {e}")
+            return False
+
+    def get_conversation_documents(self, username, conversation_key='active'):
+        """Récupère les documents attachés à une conversation"""
+        user = self.get_user(username)
+        if not user:
+            return []
+
+        sql = """
+        SELECT doc_key, display_name, source_type, source, remote_name, mime_type, status, error
+        FROM conversation_documents
+        WHERE user_id = ? AND conversation_key = ?
+        ORDER BY created_at, id
+        """
+
+        try:
+            with self._get_cursor() as cursor:
+                cursor.execute(sql, (user['id'], conversation_key))
+                return [{
+                    'key': row['doc_key'],
+                    'display_name': row['display_name'],
+                    'source_type': row['source_type'],
+                    'source': row['source'],
+                    'remote_name': row['remote_name'],
+                    'mime_type': row['mime_type'],
+                    'status': row['status'],
+                    'error': row['error']
+                } for row in cursor.fetchall()]
+        except Exception as e:
+            st.error(f"Erreur récupération documents: {e}")
+            return []
+
+    def delete_conversation_document(self, username, doc_key, conversation_key='active'):
+        """Détache un document d'une conversation"""
+        user = self.get_user(username)
+        if not user:
+            return False
+
+        try:
+            with self._get_cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM conversation_documents "
+                    "WHERE user_id = ? AND conversation_key = ? AND doc_key = ?",
+                    (user['id'], conversation_key, doc_key)
+                )
+                return cursor.rowcount > 0
+        except Exception as e:
+            st.error(f"Erreur suppression document: {e}")
+            return False
+
     def check_and_update_requests(self, username):
         """Vérifie si l'utilisateur peut faire une requête SANS l'incrémenter"""
         user = self.get_user(username)
@@ -0,0 +1,148 @@
+"""
+Index local des documents attachés (découpage en extraits + recherche BM25)
+"""
+import re
+import math
+import unicodedata
+from collections import Counter
+
+CHUNK_SIZE = 1500  # Taille cible d'un extrait (caractères)
+CHUNK_OVERLAP = 200
+DEFAULT_TOP_K = 5
+RETRIEVAL_MIN_CHARS = 20000  # En dessous, le document complet est envoyé
+
+STOPWORDS = {
+    'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de', 'd', 'l', 'et', 'ou', 'a', 'au', 'aux',
+    'en', 'dans', 'sur', 'pour', 'par', 'avec', 'sans', 'que', 'qui', 'quoi', 'ce', 'cet',
+    'cette', 'ces', 'est', 'sont', 'il', 'elle', 'ils', 'elles', 'je', 'tu', 'nous', 'vous',
+    'se', 'sa', 'son', 'ses', 'ne', 'pas', 'plus', 'y', 'the', 'of', 'and', 'to', 'in', 'is',
+    'it', 'for', 'on', 'that', 'this', 'with', 'as', 'are', 'be', 'an', 'or', 'what', 'how'
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Découpe un texte en termes normalisés (minuscules, sans accents)"""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    normalized = ''.join(c for c in normalized if not unicodedata.combining(c))
+    return [token for token in _TOKEN_RE.findall(normalized)
+            if token not in STOPWORDS and len(token) > 1]
+
+
+def estimate_tokens(text):
+    """Estimation grossière du nombre de tokens (≈ 4 caractères par token)"""
+    return len(text) // 4
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, anchor=None):
+    """Découpe un texte en extraits en respectant les paragraphes si possible"""
+    chunks = []
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    current = []
+    current_length = 0
+
+    for paragraph in paragraphs:
+        # Paragraphe trop long : découpage brut avec recouvrement
+        if len(paragraph) > chunk_size:
+            block = "\n\n".join(current + [paragraph])
+            current, current_length = [], 0
+            step = chunk_size - overlap
+            for start in range(0, len(block), step):
+                chunks.append({'text': block[start:start + chunk_size], 'anchor': anchor})
+                if start + chunk_size >= len(block):
+                    break
+            continue
+
+        if current_length + len(paragraph) > chunk_size and current:
+            chunks.append({'text': "\n\n".join(current), 'anchor': anchor})
+            current, current_length = [], 0
+
+        current.append(paragraph)
+        current_length += len(paragraph) + 2
+
+    if current:
+        chunks.append({'text': "\n\n".join(current), 'anchor': anchor})
+
+    return chunks
+
+
+class DocumentIndex:
+    """Extraits d'un document avec un index BM25 en mémoire"""
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, chunks, display_name=None):
+        self.display_name = display_name
+        self.chunks = chunks
+        self.total_chars = sum(len(chunk['text']) for chunk in chunks)
+
+        self._term_freqs = [Counter(tokenize(chunk['text'])) for chunk in chunks]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0
+
+        document_freqs = Counter()
+        for freqs in self._term_freqs:
+            document_freqs.update(freqs.keys())
+        count = len(chunks)
+        self._idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in document_freqs.items()
+        }
+
+    @classmethod
+    def from_text(cls, text, display_name=None):
+        """Construit l'index à partir d'un texte brut (transcription, page web...)"""
+        return cls(chunk_text(text), display_name)
+
+    @classmethod
+    def from_pages(cls, pages, display_name=None):
+        """Construit l'index à partir des pages extraites d'un PDF"""
+        chunks = []
+        for page in pages:
+            if page['text']:
+                chunks.extend(chunk_text(page['text'], anchor=f"page {page['page']}"))
+        return cls(chunks, display_name)
+
+    def is_large(self):
+        """Indique si le document justifie une recherche plutôt qu'un envoi complet"""
+        return self.total_chars >= RETRIEVAL_MIN_CHARS
+
+    def has_terms(self, query):
+        """Indique si au moins un terme de la requête figure dans le document"""
+        return any(term in self._idf for term in tokenize(query))
+
+    def search(self, query, top_k=DEFAULT_TOP_K, document_order=True):
+        """Retourne les extraits les plus pertinents (dans l'ordre du document ou par pertinence)"""
+        terms = set(tokenize(query))
+        if not terms or not self.chunks:
+            return self.chunks[:top_k]
+
+        scores = []
+        for position, freqs in enumerate(self._term_freqs):
+            score = 0.0
+            length_norm = self.K1 * (1 - self.B + self.B * self._lengths[position] / (self._avg_length or 1))
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.K1 + 1) / (tf + length_norm)
+            if score > 0:
+                scores.append((score, position))
+
+        if not scores:
+            return self.chunks[:top_k]
+
+        best = sorted(scores, reverse=True)[:top_k]
+        if not document_order:
+            return [self.chunks[position] for _, position in best]
+        # Conserver l'ordre du document pour la lisibilité
+        return [self.chunks[position] for _, position in sorted(best, key=lambda item: item[1])]
+
+    def build_context(self, query, top_k=DEFAULT_TOP_K):
+        """Construit le contexte textuel envoyé au modèle"""
+        parts = [f"Extraits pertinents du document « {self.display_name or 'joint'} » :"]
+        for chunk in self.search(query, top_k):
+            header = f"[{chunk['anchor']}]" if chunk.get('anchor') else "[extrait]"
+            parts.append(f"{header}\n{chunk['text']}")
+        return "\n\n".join(parts)
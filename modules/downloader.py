@@ -0,0 +1,213 @@
+"""
+Moteur de téléchargement : taille maximale contrôlée en cours de flux,
+blocs adaptatifs, reprise par plages HTTP (Range) et segments parallèles
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from modules.http_client import get_session
+
+MAX_DOWNLOAD_BYTES = int(os.getenv('MAX_DOWNLOAD_MB', 2048)) * 1024 * 1024  # Limite de l'API Gemini : 2 Go
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+FAST_CHUNK_SECONDS = 0.05  # Bloc reçu plus vite : on double la taille
+SLOW_CHUNK_SECONDS = 0.5  # Bloc reçu plus lentement : on la divise par deux
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+PARALLEL_SEGMENTS = int(os.getenv('DOWNLOAD_SEGMENTS', 4))
+MAX_RESUME_ATTEMPTS = 5
+PROGRESS_INTERVAL = 0.25
+
+RESUMABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+    ProtocolError,
+    ReadTimeoutError,
+)
+
+
+class DownloadError(Exception):
+    """Erreur de téléchargement présentable à l'utilisateur"""
+
+
+class DownloadTooLargeError(DownloadError):
+    """Le fichier dépasse la taille maximale autorisée"""
+
+
+class Downloader:
+    def __init__(self, url, max_bytes=MAX_DOWNLOAD_BYTES, progress_callback=None,
+                 segments=PARALLEL_SEGMENTS, timeout=30):
+        self.url = url
+        self.max_bytes = max_bytes
+        self.progress_callback = progress_callback
+        self.segments = max(1, segments)
+        self.timeout = timeout
+
+        self.response = None
+        self.content_type = ''
+        self.total_size = None
+        self.accept_ranges = False
+
+        self._downloaded = 0
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._report_inline = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+
+    def start(self):
+        """Ouvre le flux et lit les en-têtes (type, taille, support des plages)"""
+        self.response = get_session().get(self.url, stream=True, timeout=self.timeout)
+        self.response.raise_for_status()
+
+        headers = self.response.headers
+        self.content_type = headers.get('content-type', '').lower()
+        # Les positions de reprise ne sont valables que sur un flux non compressé
+        self.accept_ranges = (headers.get('accept-ranges', '').lower() == 'bytes'
+                              and not headers.get('content-encoding'))
+
+        # Content-Length ne reflète pas la taille décodée si le flux est compressé
+        if headers.get('content-length', '').isdigit() and not headers.get('content-encoding'):
+            self.total_size = int(headers['content-length'])
+            if self.total_size > self.max_bytes:
+                self.close()
+                raise DownloadTooLargeError(self._too_large_message())
+        return self
+
+    def save(self, dest_path):
+        """Télécharge le contenu dans dest_path et retourne le nombre d'octets écrits"""
+        try:
+            if (self.accept_ranges and self.total_size and self.segments > 1
+                    and self.total_size >= PARALLEL_MIN_BYTES):
+                self.close()
+                self._save_parallel(dest_path)
+            else:
+                with open(dest_path, 'wb') as f:
+                    self._stream_range(f, 0, self.total_size, self.response)
+            return self._downloaded
+        except Exception:
+            if os.path.exists(dest_path):
+                os.unlink(dest_path)
+            raise
+        finally:
+            self.close()
+
+    def _too_large_message(self):
+        return f"Fichier trop volumineux (maximum {self.max_bytes // (1024 * 1024)} Mo)"
+
+    def _add_progress(self, size):
+        with self._lock:
+            self._downloaded += size
+            if self._downloaded > self.max_bytes:
+                self._cancelled.set()
+                raise DownloadTooLargeError(self._too_large_message())
+            downloaded = self._downloaded
+        # En mode parallèle, la progression est remontée par le thread appelant
+        if self.progress_callback and self._report_inline:
+            self.progress_callback(downloaded, self.total_size)
+
+    def _open_range(self, start, end):
+        """Ouvre une requête pour les octets [start, end) et vérifie la réponse partielle"""
+        byte_range = f"bytes={start}-{end - 1}" if end else f"bytes={start}-"
+        response = get_session().get(self.url, stream=True, timeout=self.timeout,
+                                     headers={'Range': byte_range, 'Accept-Encoding': 'identity'})
+        if response.status_code != 206:
+            response.close()
+            raise DownloadError("Le serveur ne permet pas la reprise du téléchargement")
+        return response
+
+    def _stream_range(self, f, start, end, response=None):
+        """
+        Écrit les octets [start, end) à partir de la position courante du fichier,
+        en reprenant par plage après une coupure (end=None : jusqu'à la fin du flux).
+        """
+        position = start
+        attempts = 0
+        chunk_size = MIN_CHUNK_SIZE
+
+        while end is None or position < end:
+            try:
+                if response is None:
+                    response = self._open_range(position, end)
+
+                with response:
+                    while end is None or position < end:
+                        if self._cancelled.is_set():
+                            raise DownloadError("Téléchargement annulé")
+                        read_start = time.perf_counter()
+                        wanted = chunk_size if end is None else min(chunk_size, end - position)
+                        chunk = response.raw.read(wanted, decode_content=True)
+                        if not chunk:
+                            break
+
+                        f.write(chunk)
+                        position += len(chunk)
+                        self._add_progress(len(chunk))
+
+                        # Adapter la taille des blocs au débit observé
+                        elapsed = time.perf_counter() - read_start
+                        if elapsed < FAST_CHUNK_SECONDS:
+                            chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+                        elif elapsed > SLOW_CHUNK_SECONDS:
+                            chunk_size = max(chunk_size // 2, MIN_CHUNK_SIZE)
+                response = None
+
+                if end is None or position >= end:
+                    break
+                # Flux terminé avant la taille annoncée : reprise de la suite
+                raise requests.exceptions.ChunkedEncodingError("Flux interrompu")
+
+            except RESUMABLE_ERRORS as e:
+                response = None
+                attempts += 1
+                if not self.accept_ranges or attempts > MAX_RESUME_ATTEMPTS:
+                    raise DownloadError(f"Téléchargement interrompu : {e}")
+                time.sleep(min(2 ** attempts * 0.25, 5))
+
+        return position - start
+
+    def _save_parallel(self, dest_path):
+        """Télécharge le fichier en segments parallèles écrits à leur position"""
+        with open(dest_path, 'wb') as f:
+            f.truncate(self.total_size)
+
+        segment_size = -(-self.total_size // self.segments)
+        bounds = [(start, min(start + segment_size, self.total_size))
+                  for start in range(0, self.total_size, segment_size)]
+
+        def _download_segment(start, end):
+            with open(dest_path, 'r+b') as f:
+                f.seek(start)
+                return self._stream_range(f, start, end)
+
+        self._report_inline = False
+        failed = None
+        with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+            futures = [executor.submit(_download_segment, start, end) for start, end in bounds]
+            pending = futures
+            while pending:
+                done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                failed = next((future for future in done if future.exception()), None)
+                if failed is not None:
+                    self._cancelled.set()
+                    break
+                if self.progress_callback:
+                    self.progress_callback(self._downloaded, self.total_size)
+
+        # Erreur d'origine, et non l'annulation qu'elle a provoquée dans les autres segments
+        if failed is not None:
+            failed.result()
@@ -1,11 +1,77 @@
 import os
+import re
 import time
 import tempfile
 import mimetypes
+from concurrent.futures import ProcessPoolExecutor
 import google.generativeai as genai
 import streamlit as st
 
+from modules.document_index import DocumentIndex
+from modules.file_state import FileStateCache
+from modules.media_preprocessing import MediaPreprocessor
+from modules.progress import show
+from utils.cache import hash_file, read_json_cache, write_json_cache
+from utils.metrics import timed_methods, FILE_CALL_SECONDS, CALL_ERRORS, UPLOAD_BYTES, UPLOAD_SECONDS
+from utils.tracing import traced_methods
 
+# Extraction locale des PDF (optionnelle selon les bibliothèques installées)
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+PDF_CACHE_NAMESPACE = 'pdf_text'
+PDF_EXTRACTOR_VERSION = 1
+PDF_MIN_CHARS_PER_PAGE = 200  # En dessous, la page est considérée comme scannée/image
+PDF_TEXT_PAGE_RATIO = 0.9  # Part minimale de pages textuelles pour envoyer le texte seul
+PDF_PAGES_PER_WORKER = 25
+PDF_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+
+def _extract_pdf_page_range(file_path, start, end):
+    """Extrait le texte d'une plage de pages (exécuté dans un processus séparé)"""
+    pages = []
+    if pymupdf is not None:
+        with pymupdf.open(file_path) as doc:
+            for index in range(start, end):
+                page = doc.load_page(index)
+                pages.append({
+                    'page': index + 1,
+                    'text': page.get_text("text").strip(),
+                    'images': len(page.get_images(full=False))
+                })
+    else:
+        reader = PdfReader(file_path)
+        for index in range(start, end):
+            pages.append({
+                'page': index + 1,
+                'text': (reader.pages[index].extract_text() or '').strip(),
+                'images': 0
+            })
+    return pages
+
+
+def _count_pdf_pages(file_path):
+    """Compte les pages d'un PDF"""
+    if pymupdf is not None:
+        with pymupdf.open(file_path) as doc:
+            return doc.page_count
+    return len(PdfReader(file_path).pages)
+
+
+def _upload_kind(mime_type):
+    """Famille de fichier pour les métriques (pdf, image, video, audio, text, application)"""
+    return 'pdf' if mime_type == 'application/pdf' else mime_type.split('/')[0]
+
+
+@traced_methods('file')
+@timed_methods(FILE_CALL_SECONDS, CALL_ERRORS, component='file')
 class FileProcessor:
     @staticmethod
     def guess_mime_type(file_path, content_type=None):
@@ -17,49 +83,216 @@ class FileProcessor:
         return 'application/octet-stream'
 
     @staticmethod
-    def upload_to_gemini(file_path, display_name, mime_type_hint=None):
-        """Envoie le fichier à l'API Google et gère le nettoyage."""
-        temp_file_to_delete = file_path
+    def extract_pdf_text(file_path):
+        """
+        Extrait localement le texte d'un PDF, page par page.
+        Les résultats sont mis en cache selon l'empreinte du contenu.
+        """
+        if pymupdf is None and PdfReader is None:
+            return None
 
         try:
-            mime_type = FileProcessor.guess_mime_type(file_path, mime_type_hint)
+            cache_key = f"{hash_file(file_path)}_v{PDF_EXTRACTOR_VERSION}"
+            cached = read_json_cache(PDF_CACHE_NAMESPACE, cache_key)
+            if cached:
+                return cached
 
-            with st.status("Traitement intelligent en cours...", expanded=True) as status:
-                st.write(f"📤 Envoi de **{display_name}** ({mime_type})...")
+            page_count = _count_pdf_pages(file_path)
+            ranges = [(start, min(start + PDF_PAGES_PER_WORKER, page_count))
+                      for start in range(0, page_count, PDF_PAGES_PER_WORKER)]
 
-                gemini_file = genai.upload_file(
-                    path=file_path,
-                    display_name=display_name,
-                    mime_type=mime_type
-                )
+            pages = []
+            if len(ranges) > 1 and PDF_MAX_WORKERS > 1:
+                try:
+                    with ProcessPoolExecutor(max_workers=min(PDF_MAX_WORKERS, len(ranges))) as executor:
+                        futures = [executor.submit(_extract_pdf_page_range, file_path, start, end)
+                                   for start, end in ranges]
+                        for future in futures:
+                            pages.extend(future.result())
+                except (OSError, RuntimeError):
+                    # Pool indisponible (environnement restreint) : extraction séquentielle
+                    pages = []
 
-                st.write("⚙️ Analyse multimodale...")
-                while gemini_file.state.name == "PROCESSING":
-                    time.sleep(1)
-                    gemini_file = genai.get_file(gemini_file.name)
+            if not pages:
+                for start, end in ranges:
+                    pages.extend(_extract_pdf_page_range(file_path, start, end))
 
-                if gemini_file.state.name == "FAILED":
-                    status.update(label="Échec de l'analyse", state="error")
-                    try:
-                        genai.delete_file(gemini_file.name)
-                    except Exception:
-                        pass
-                    return None
+            text_pages = sum(1 for page in pages if len(page['text']) >= PDF_MIN_CHARS_PER_PAGE)
+            result = {
+                'page_count': page_count,
+                'text_pages': text_pages,
+                'text_rich': page_count > 0 and text_pages / page_count >= PDF_TEXT_PAGE_RATIO,
+                'pages': pages
+            }
+            write_json_cache(PDF_CACHE_NAMESPACE, cache_key, result)
+            return result
 
+        except Exception:
+            # PDF illisible localement : on laisse Gemini l'analyser
+            return None
+
+    @staticmethod
+    def build_compact_text(extraction):
+        """Construit un texte compact à partir des pages extraites"""
+        parts = []
+        for page in extraction['pages']:
+            text = page['text']
+            if len(text) < PDF_MIN_CHARS_PER_PAGE and page['images']:
+                text = (text + "\n" if text else "") + "[Contenu image non extrait]"
+            text = re.sub(r'[ \t]+', ' ', text)
+            text = re.sub(r'\n\s*\n+', '\n\n', text)
+            parts.append(f"--- Page {page['page']} ---\n{text}")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def prepare_pdf_upload(file_path):
+        """
+        Retourne (chemin du texte compact, extraction) si le PDF est textuel.
+        Le chemin vaut None si le PDF doit être envoyé complet (pages scannées).
+        """
+        extraction = FileProcessor.extract_pdf_text(file_path)
+        if not extraction or not extraction['text_rich']:
+            return None, extraction
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.txt', mode='w', encoding='utf-8') as tmp_file:
+            tmp_file.write(FileProcessor.build_compact_text(extraction))
+            return tmp_file.name, extraction
+
+    @staticmethod
+    def build_text_index(file_path, display_name):
+        """Construit l'index d'extraits d'un fichier texte (transcription, page web...)"""
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                return DocumentIndex.from_text(f.read(), display_name)
+        except OSError:
+            return None
+
+    @staticmethod
+    def register_document_index(file_name, document_index):
+        """Associe l'index d'extraits au fichier distant dans la session"""
+        if 'document_indexes' not in st.session_state:
+            st.session_state.document_indexes = {}
+        st.session_state.document_indexes[file_name] = document_index
+
+    @staticmethod
+    def upload_to_gemini(file_path, display_name, mime_type_hint=None, progress=None):
+        """
+        Envoie le fichier à l'API Google et gère le nettoyage. Sans progress, les étapes
+        s'affichent dans un st.status ; depuis un thread de travail, elles sont transmises
+        à progress(message, niveau) et rien n'est écrit dans la page.
+        """
+        if progress is not None:
+            return FileProcessor._upload(file_path, display_name, mime_type_hint, progress)
+
+        with st.status("Traitement intelligent en cours...", expanded=True) as status:
+            gemini_file = FileProcessor._upload(file_path, display_name, mime_type_hint, show)
+            if gemini_file:
                 status.update(label="Document prêt !", state="complete", expanded=False)
+            else:
+                status.update(label="Échec de l'analyse", state="error")
+        return gemini_file
+
+    @staticmethod
+    def _upload(file_path, display_name, mime_type_hint, progress):
+        """Prépare, envoie et attend l'analyse du fichier ; les étapes sont transmises à progress"""
+        temp_files_to_delete = [file_path]
+        start_time = time.perf_counter()
+        kind, outcome = 'unknown', 'error'
+
+        try:
+            mime_type = FileProcessor.guess_mime_type(file_path, mime_type_hint)
+            kind = _upload_kind(mime_type)
+            UPLOAD_BYTES.labels(kind=kind, stage='source').observe(os.path.getsize(file_path))
+
+            upload_path, upload_mime_type = file_path, mime_type
+            document_index = None
+
+            if mime_type == 'application/pdf':
+                progress("📝 Extraction locale du texte...", 'write')
+                text_path, extraction = FileProcessor.prepare_pdf_upload(file_path)
+                if text_path:
+                    temp_files_to_delete.append(text_path)
+                    upload_path, upload_mime_type = text_path, 'text/plain'
+                    document_index = DocumentIndex.from_pages(extraction['pages'], display_name)
+                    progress(f"✅ {extraction['page_count']} pages textuelles, envoi du texte compact", 'write')
+                elif extraction:
+                    progress(f"🖼️ {extraction['page_count'] - extraction['text_pages']} page(s) "
+                             f"scannée(s), envoi du document complet", 'write')
+
+            elif mime_type.startswith('text/'):
+                document_index = FileProcessor.build_text_index(file_path, display_name)
+
+            elif MediaPreprocessor.can_preprocess(mime_type):
+                progress("🗜️ Optimisation du média...", 'write')
+                processed = MediaPreprocessor.preprocess(file_path, mime_type)
+                if processed:
+                    upload_path, upload_mime_type = processed
+                    progress(f"📉 {MediaPreprocessor.format_size(os.path.getsize(file_path))} → "
+                             f"{MediaPreprocessor.format_size(os.path.getsize(upload_path))}", 'write')
+
+            progress(f"📤 Envoi de **{display_name}** ({upload_mime_type})...", 'write')
+            UPLOAD_BYTES.labels(kind=kind, stage='sent').observe(os.path.getsize(upload_path))
+
+            gemini_file = genai.upload_file(
+                path=upload_path,
+                display_name=display_name,
+                mime_type=upload_mime_type
+            )
+
+            progress("⚙️ Analyse multimodale...", 'write')
+            while gemini_file.state.name == "PROCESSING":
+                time.sleep(1)
+                gemini_file = genai.get_file(gemini_file.name)
+
+            if gemini_file.state.name == "FAILED":
+                outcome = 'failed'
+                progress(f"❌ Échec de l'analyse de {display_name}", 'error')
+                try:
+                    genai.delete_file(gemini_file.name)
+                except Exception:
+                    pass
+                return None
+
+            # Copie locale conservée pour un ré-envoi après expiration
+            FileStateCache.record(gemini_file, upload_path, upload_mime_type)
+
+            if document_index is not None and document_index.chunks:
+                FileProcessor.register_document_index(gemini_file.name, document_index)
+
+            outcome = 'ready'
             return gemini_file
 
         except Exception as e:
-            st.error(f"Erreur API : {e}")
+            progress(f"Erreur API : {e}", 'error')
             return None
 
         finally:
-            # Nettoyer le fichier temporaire local
-            if os.path.exists(temp_file_to_delete):
-                try:
-                    os.unlink(temp_file_to_delete)
-                except Exception:
-                    pass
+            UPLOAD_SECONDS.labels(kind=kind, status=outcome).observe(time.perf_counter() - start_time)
+
+            # Nettoyer les fichiers temporaires locaux
+            for temp_file in temp_files_to_delete:
+                if os.path.exists(temp_file):
+                    try:
+                        os.unlink(temp_file)
+                    except Exception:
+                        pass
+
+    @staticmethod
+    def reupload(local_path, display_name, mime_type):
+        """Ré-envoie silencieusement une copie locale (fichier distant expiré)"""
+        try:
+            gemini_file = genai.upload_file(path=local_path, display_name=display_name, mime_type=mime_type)
+            while gemini_file.state.name == "PROCESSING":
+                time.sleep(1)
+                gemini_file = genai.get_file(gemini_file.name)
+
+            if gemini_file.state.name == "FAILED":
+                return None
+
+            FileStateCache.record(gemini_file, local_path, mime_type)
+            return gemini_file
+        except Exception:
+            return None
 
     @staticmethod
     def process_uploaded_file(uploaded_file):
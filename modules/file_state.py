@@ -0,0 +1,134 @@
+"""
+Cache de l'état des fichiers distants (expiration, dernière vérification)
+et copies locales adressées par contenu pour le ré-envoi transparent
+"""
+import os
+import time
+import shutil
+import threading
+
+from utils.cache import hash_bytes, hash_file, get_cache_path, read_json_cache, write_json_cache
+from utils.config import get_cache_dir
+from utils.metrics import cache_lookup
+
+FILE_STATE_NAMESPACE = 'file_state'
+UPLOADS_NAMESPACE = 'uploads'
+REMOTE_FILE_TTL = 48 * 3600  # Durée de vie des fichiers de l'API Gemini
+EXPIRY_MARGIN = 3600  # Re-vérifier pendant la dernière heure avant expiration
+LOCAL_COPY_MAX_AGE = 7 * 24 * 3600
+
+_states = {}
+_lock = threading.Lock()
+
+
+def _expiration_timestamp(gemini_file):
+    """Date d'expiration du fichier distant (timestamp), estimée si absente"""
+    expiration = getattr(gemini_file, 'expiration_time', None)
+    try:
+        return expiration.timestamp()
+    except (AttributeError, ValueError, OverflowError):
+        return time.time() + REMOTE_FILE_TTL
+
+
+class FileStateCache:
+    @staticmethod
+    def _key(remote_name):
+        return hash_bytes(remote_name.encode('utf-8'))
+
+    @staticmethod
+    def get(remote_name):
+        """Retourne l'état connu d'un fichier distant (mémoire puis disque)"""
+        with _lock:
+            state = _states.get(remote_name)
+        if state is None:
+            state = read_json_cache(FILE_STATE_NAMESPACE, FileStateCache._key(remote_name))
+            if state is not None:
+                with _lock:
+                    _states[remote_name] = state
+        return state
+
+    @staticmethod
+    def _save(state):
+        with _lock:
+            _states[state['remote_name']] = state
+        try:
+            write_json_cache(FILE_STATE_NAMESPACE, FileStateCache._key(state['remote_name']), state)
+        except OSError:
+            pass
+
+    @staticmethod
+    def store_local_copy(local_path):
+        """Copie le fichier envoyé dans le stockage local adressé par contenu"""
+        extension = os.path.splitext(local_path)[1]
+        copy_path = get_cache_path(UPLOADS_NAMESPACE, hash_file(local_path), extension)
+        if not os.path.exists(copy_path):
+            FileStateCache.prune_local_copies()
+            shutil.copyfile(local_path, copy_path)
+        return copy_path
+
+    @staticmethod
+    def prune_local_copies(max_age=LOCAL_COPY_MAX_AGE):
+        """Supprime les copies locales trop anciennes pour être encore utiles"""
+        limit = time.time() - max_age
+        uploads_dir = get_cache_dir(UPLOADS_NAMESPACE)
+        for entry in os.scandir(uploads_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    os.unlink(entry.path)
+            except OSError:
+                continue
+
+    @staticmethod
+    def record(gemini_file, local_path=None, mime_type=None):
+        """Enregistre un fichier distant fraîchement envoyé ou vérifié"""
+        previous = FileStateCache.get(gemini_file.name) or {}
+        local_copy = previous.get('local_path')
+        if local_path and os.path.exists(local_path):
+            try:
+                local_copy = FileStateCache.store_local_copy(local_path)
+            except OSError:
+                pass
+
+        FileStateCache._save({
+            'remote_name': gemini_file.name,
+            'display_name': getattr(gemini_file, 'display_name', None) or previous.get('display_name'),
+            'mime_type': mime_type or getattr(gemini_file, 'mime_type', None) or previous.get('mime_type'),
+            'expiration_time': _expiration_timestamp(gemini_file),
+            'last_verified': time.time(),
+            'local_path': local_copy,
+            'needs_check': False
+        })
+
+    @staticmethod
+    def needs_verification(remote_name):
+        """Vrai si le fichier est inconnu, proche de l'expiration ou signalé après un échec"""
+        state = FileStateCache.get(remote_name)
+        if not state or state.get('needs_check'):
+            return not cache_lookup('remote_file', False)
+        # Vérification évitée : comptée comme succès du cache d'état
+        return not cache_lookup('remote_file', time.time() < state['expiration_time'] - EXPIRY_MARGIN)
+
+    @staticmethod
+    def mark_for_check(remote_name):
+        """Demande une vérification au prochain message (après un envoi en échec)"""
+        state = FileStateCache.get(remote_name)
+        if state:
+            FileStateCache._save(dict(state, needs_check=True))
+
+    @staticmethod
+    def get_local_copy(remote_name):
+        """Retourne la copie locale d'un fichier distant si elle existe encore"""
+        state = FileStateCache.get(remote_name)
+        if state and state.get('local_path') and os.path.exists(state['local_path']):
+            return state['local_path'], state.get('display_name'), state.get('mime_type')
+        return None
+
+    @staticmethod
+    def forget(remote_name):
+        """Oublie l'état d'un fichier distant (la copie locale reste partagée)"""
+        with _lock:
+            _states.pop(remote_name, None)
+        try:
+            os.unlink(get_cache_path(FILE_STATE_NAMESPACE, FileStateCache._key(remote_name), '.json'))
+        except OSError:
+            pass
@@ -0,0 +1,173 @@
+"""
+Extraction du contenu textuel des pages web
+(moteur rapide lxml avec détection du contenu principal, repli BeautifulSoup)
+"""
+import os
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+
+# lxml est optionnel : sans lui, on garde l'analyse BeautifulSoup d'origine
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    lxml_html = None
+
+HTML_EXTRACTOR = os.getenv('HTML_EXTRACTOR', 'auto')  # auto | lxml | bs4
+
+BOILERPLATE_TAGS = ['script', 'style', 'header', 'footer', 'nav', 'aside', 'iframe', 'form', 'noscript',
+                    'svg', 'template']
+PARAGRAPH_TAGS = {'p', 'pre', 'li', 'td', 'blockquote', 'dd', 'h1', 'h2', 'h3', 'h4'}
+MAIN_CONTENT_MIN_RATIO = 0.4  # Part minimale du texte total pour retenir un bloc principal
+MIN_PARAGRAPH_CHARS = 25
+
+
+def _clean_title(title):
+    return ' '.join(title.split()) if title else None
+
+
+def _absolute_links(hrefs, base_url):
+    """Liens absolus http(s), sans doublons, dans l'ordre du document"""
+    links = []
+    seen = set()
+    for href in hrefs:
+        href = (href or '').strip()
+        if not href or href.startswith(('#', 'mailto:', 'javascript:', 'tel:')):
+            continue
+        link = urljoin(base_url, href)
+        if link.startswith(('http://', 'https://')) and link not in seen:
+            seen.add(link)
+            links.append(link)
+    return links
+
+
+def extract_with_bs4(content, base_url=None):
+    """Moteur d'origine : html.parser puis get_text sur l'arbre nettoyé"""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    links = None
+    if base_url is not None:
+        # Les liens de navigation sont relevés avant le nettoyage
+        base = soup.find('base', href=True)
+        base_url = urljoin(base_url, base['href']) if base else base_url
+        links = _absolute_links((a['href'] for a in soup.find_all('a', href=True)), base_url)
+
+    # Supprimer les éléments non pertinents
+    for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav', 'aside', 'iframe', 'form']):
+        script_or_style.decompose()
+
+    title = soup.title.string if soup.title else None
+    return _clean_title(title), soup.get_text(separator='\n', strip=True), links
+
+
+def _detect_encoding(content):
+    """Encodage déclaré (BOM, <meta charset>), sinon UTF-8 si valide, sinon Windows-1252"""
+    content, bom_encoding = EncodingDetector.strip_byte_order_mark(content)
+    declared = bom_encoding or EncodingDetector.find_declared_encoding(content, is_html=True)
+    if declared:
+        return content, declared
+    try:
+        content.decode('utf-8')
+        return content, 'utf-8'
+    except UnicodeDecodeError:
+        return content, 'windows-1252'
+
+
+def _text_lines(element):
+    """Texte d'un élément, une ligne par nœud texte non vide"""
+    return [text.strip() for text in element.itertext() if text.strip()]
+
+
+def _find_main_content(body):
+    """
+    Détecte le bloc de contenu principal en un seul parcours des paragraphes :
+    chaque paragraphe crédite son parent (et à moitié son grand-parent)
+    de sa longueur hors liens.
+    """
+    scores = {}
+    for element in body.iter(*PARAGRAPH_TAGS):
+        text_length = len(element.text_content().strip())
+        if text_length < MIN_PARAGRAPH_CHARS:
+            continue
+
+        link_length = sum(len(link.text_content()) for link in element.iter('a'))
+        score = text_length - link_length + text_length // 100
+
+        parent = element.getparent()
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0) + score
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+    if not scores:
+        return None
+    return max(scores.items(), key=lambda item: item[1])[0]
+
+
+def extract_with_lxml(content, base_url=None):
+    """Moteur rapide : parseur C, suppression du superflu et contenu principal"""
+    if isinstance(content, bytes):
+        content, encoding = _detect_encoding(content)
+        parser = lxml_html.HTMLParser(encoding=encoding)
+        tree = lxml_html.document_fromstring(content, parser=parser)
+    else:
+        tree = lxml_html.document_fromstring(content)
+
+    links = None
+    if base_url is not None:
+        # Les liens de navigation sont relevés avant le nettoyage
+        base_href = tree.xpath('string(//base/@href)')
+        base_url = urljoin(base_url, base_href) if base_href else base_url
+        links = _absolute_links(tree.xpath('//a/@href'), base_url)
+
+    etree.strip_elements(tree, etree.Comment, *BOILERPLATE_TAGS, with_tail=False)
+
+    title_element = tree.find('.//title')
+    title = title_element.text_content() if title_element is not None else None
+
+    body = tree.find('body')
+    if body is None:
+        body = tree
+
+    lines = _text_lines(body)
+    total_chars = sum(len(line) for line in lines)
+
+    # Préférer les balises sémantiques, sinon le bloc le mieux noté
+    main = body.find('.//main')
+    if main is None:
+        main = body.find('.//article')
+    if main is None:
+        main = _find_main_content(body)
+
+    if main is not None and main is not body:
+        main_lines = _text_lines(main)
+        if sum(len(line) for line in main_lines) >= total_chars * MAIN_CONTENT_MIN_RATIO:
+            lines = main_lines
+
+    return _clean_title(title), '\n'.join(lines), links
+
+
+def _extract(content, backend, base_url):
+    backend = backend or HTML_EXTRACTOR
+    if backend != 'bs4' and lxml_html is not None:
+        try:
+            return extract_with_lxml(content, base_url)
+        except (etree.ParserError, ValueError, LookupError):
+            pass
+    return extract_with_bs4(content, base_url)
+
+
+def extract_html(content, backend=None):
+    """
+    Retourne (titre, texte) d'une page HTML avec le moteur demandé,
+    en repliant sur BeautifulSoup si lxml est absent ou échoue.
+    """
+    title, text, _ = _extract(content, backend, None)
+    return title, text
+
+
+def extract_page(content, base_url, backend=None):
+    """Comme extract_html, avec en plus les liens absolus de la page (une seule analyse)"""
+    return _extract(content, backend, base_url)
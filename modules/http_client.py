@@ -0,0 +1,176 @@
+"""
+Client HTTP partagé : pool de connexions persistantes et cache disque
+respectant ETag / Last-Modified / Cache-Control
+"""
+import os
+import time
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+
+from utils.cache import hash_bytes, get_cache_path, read_json_cache, write_json_cache, write_bytes_cache, evict_lru
+
+HTTP_CACHE_NAMESPACE = 'http'
+HTTP_POOL_CONNECTIONS = 20  # Nombre d'hôtes gardés en pool
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 4))  # Connexions simultanées par hôte
+HTTP_CACHE_MAX_ENTRY_BYTES = 10 * 1024 * 1024
+HTTP_CACHE_MAX_BYTES = int(os.getenv('HTTP_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Retourne la session HTTP partagée (keep-alive, ré-essais, limite par hôte)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=('HEAD', 'GET'),
+                respect_retry_after_header=True
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                pool_block=True,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+class CachedResponse:
+    """Réponse HTTP servie par le réseau ou par le cache disque"""
+
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self):
+        return get_encoding_from_headers(self.headers)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} pour l'URL : {self.url}")
+
+
+def _freshness_deadline(headers, now):
+    """Calcule la date jusqu'à laquelle la réponse peut être servie sans revalidation"""
+    directives = {}
+    for directive in headers.get('cache-control', '').lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        if name:
+            directives[name] = value.strip('"')
+
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+
+    if 'max-age' in directives:
+        try:
+            age = int(headers.get('age', 0) or 0)
+            return now + int(directives['max-age']) - age
+        except ValueError:
+            return 0
+
+    if headers.get('expires'):
+        try:
+            return parsedate_to_datetime(headers['expires']).timestamp()
+        except (TypeError, ValueError):
+            return 0
+
+    return 0
+
+
+def _store(key, url, status_code, headers, content, now, write_body=True):
+    """Enregistre une réponse dans le cache si elle est réutilisable"""
+    fresh_until = _freshness_deadline(headers, now)
+    has_validators = 'etag' in headers or 'last-modified' in headers
+    if (fresh_until is None or headers.get('vary') == '*' or len(content) > HTTP_CACHE_MAX_ENTRY_BYTES
+            or not (has_validators or fresh_until > now)):
+        return
+
+    if write_body:
+        write_bytes_cache(HTTP_CACHE_NAMESPACE, key, '.body', content)
+    write_json_cache(HTTP_CACHE_NAMESPACE, key, {
+        'url': url,
+        'status_code': status_code,
+        'headers': headers,
+        'fresh_until': fresh_until,
+        'stored_at': now
+    })
+    evict_lru(HTTP_CACHE_NAMESPACE, HTTP_CACHE_MAX_BYTES)
+
+
+def cached_get(url, timeout=30, headers=None):
+    """
+    GET avec cache disque : sert la réponse locale tant qu'elle est fraîche,
+    sinon envoie une requête conditionnelle (If-None-Match / If-Modified-Since).
+    """
+    key = hash_bytes(url.encode('utf-8'))
+    now = time.time()
+    meta = read_json_cache(HTTP_CACHE_NAMESPACE, key)
+    body_path = get_cache_path(HTTP_CACHE_NAMESPACE, key, '.body')
+    request_headers = dict(headers or {})
+
+    cached_body = None
+    if meta and os.path.exists(body_path):
+        with open(body_path, 'rb') as f:
+            cached_body = f.read()
+        # La date de modification sert d'horodatage d'utilisation pour l'éviction
+        os.utime(body_path, None)
+
+        if now < meta['fresh_until']:
+            return CachedResponse(url, meta['status_code'], meta['headers'], cached_body, from_cache=True)
+
+        if meta['headers'].get('etag'):
+            request_headers['If-None-Match'] = meta['headers']['etag']
+        if meta['headers'].get('last-modified'):
+            request_headers['If-Modified-Since'] = meta['headers']['last-modified']
+
+    response = get_session().get(url, headers=request_headers, timeout=timeout)
+    # Le contenu est stocké décodé : les en-têtes de transport ne s'appliquent plus
+    response_headers = {name.lower(): value for name, value in response.headers.items()
+                        if name.lower() not in ('content-length', 'content-encoding', 'transfer-encoding')}
+
+    if response.status_code == 304 and cached_body is not None:
+        # Contenu inchangé : on rafraîchit les métadonnées et on sert la copie locale
+        merged_headers = dict(meta['headers'], **response_headers)
+        _store(key, url, meta['status_code'], merged_headers, cached_body, now, write_body=False)
+        return CachedResponse(url, meta['status_code'], merged_headers, cached_body, from_cache=True)
+
+    if response.status_code == 200:
+        try:
+            _store(key, url, response.status_code, response_headers, response.content, now)
+        except OSError:
+            pass
+
+    return CachedResponse(url, response.status_code, response_headers, response.content)
@@ -1,19 +1,36 @@
 import os
+import time
+import shutil
 import tempfile
 import mimetypes
 import requests
+from contextlib import nullcontext
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
 import yt_dlp
 import streamlit as st
 
-
+from modules.http_client import cached_get
+from modules.downloader import Downloader, DownloadError
+from modules.audio_pipeline import AudioPipeline, AUDIO_BITRATE, AUDIO_SEGMENT_SECONDS
+from modules.crawler import SiteCrawler, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES
+from modules.html_extraction import extract_html
+from modules.progress import report
+from modules.url_classifier import UrlClassifier
+from modules.subtitles import SUBTITLE_FORMATS, TRANSCRIPT_MAX_CHARS, parse_subtitles
+from modules.youtube_cache import YouTubeMetadataCache
+from utils.cache import hash_bytes
+from utils.metrics import timed_methods, MEDIA_CALL_SECONDS, CALL_ERRORS
+from utils.tracing import traced_methods
+
+
+@traced_methods('media')
+@timed_methods(MEDIA_CALL_SECONDS, CALL_ERRORS, component='media')
 class MediaExtractor:
     @staticmethod
-    def extract_youtube_transcript(url):
+    def extract_youtube_transcript(url, progress=None):
         """Extrait la transcription/sous-titres d'une vidéo YouTube"""
         try:
-            st.toast("Extraction des sous-titres YouTube...", icon="📝")
+            report(progress, "📝 Extraction des sous-titres YouTube...", 'toast')
 
             ydl_opts = {
                 'skip_download': True,
@@ -24,81 +41,112 @@ class MediaExtractor:
                 'no_warnings': True,
             }
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            video_id = YouTubeMetadataCache.video_id(url)
+            cached = YouTubeMetadataCache.get_transcript(video_id)
 
-                if not info:
-                    st.error("Impossible de récupérer les informations de la vidéo")
-                    return None, None, None
+            if cached:
+                info, transcript_text = cached
+            else:
+                # Pistes de sous-titres encore valides en cache : pas d'appel à yt-dlp
+                info = YouTubeMetadataCache.get_info(video_id)
+                transcript_text = MediaExtractor._fetch_transcript(info) if info else ""
 
-                title = info.get('title', 'YouTube_Video')
-                subtitles = info.get('subtitles', {}) or info.get('automatic_captions', {})
-
-                transcript_text = ""
-
-                # Priorité: Français -> Anglais -> Première langue disponible
-                for lang in ['fr', 'en', 'auto']:
-                    if lang in subtitles:
-                        for sub in subtitles[lang]:
-                            if sub.get('ext') in ['vtt', 'srt']:
-                                try:
-                                    sub_url = sub.get('url')
-                                    if sub_url:
-                                        response = requests.get(sub_url, timeout=10)
-                                        if response.status_code == 200:
-                                            lines = response.text.split('\n')
-                                            for line in lines:
-                                                if '-->' not in line and line.strip() and not line.strip().isdigit():
-                                                    transcript_text += line.strip() + ' '
-                                            break
-                                except:
-                                    continue
-
-                # Si pas de sous-titres, extraire la description
                 if not transcript_text:
-                    transcript_text = info.get('description', '')
-                    if not transcript_text:
-                        transcript_text = f"Vidéo YouTube: {title}\n\nPas de transcription disponible."
+                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                        info = ydl.extract_info(url, download=False)
+
+                    if not info:
+                        report(progress, "Impossible de récupérer les informations de la vidéo", 'error')
+                        return None, None, None
+
+                    info = YouTubeMetadataCache.store_info(video_id, info)
+                    transcript_text = MediaExtractor._fetch_transcript(info)
+
+                YouTubeMetadataCache.store_transcript(video_id, info, transcript_text)
 
-                # Créer un fichier texte
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.txt', mode='w', encoding='utf-8') as tmp_file:
-                    tmp_file.write(f"Titre: {title}\n")
-                    tmp_file.write(f"URL: {url}\n")
-                    tmp_file.write(f"Durée: {info.get('duration', 0)} secondes\n")
-                    tmp_file.write(f"Chaîne: {info.get('channel', 'Inconnue')}\n")
-                    tmp_file.write(f"Vues: {info.get('view_count', 0)}\n")
-                    tmp_file.write("\n" + "=" * 50 + "\n\n")
-                    tmp_file.write("TRANSCRIPTION/SOUS-TITRES:\n\n")
-                    tmp_file.write(transcript_text[:50000])
+            title = info.get('title') or 'YouTube_Video'
 
-                    tmp_file_path = tmp_file.name
+            # Si pas de sous-titres, extraire la description
+            if not transcript_text:
+                transcript_text = info.get('description') or ''
+                if not transcript_text:
+                    transcript_text = f"Vidéo YouTube: {title}\n\nPas de transcription disponible."
+
+            # Créer un fichier texte
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.txt', mode='w', encoding='utf-8') as tmp_file:
+                tmp_file.write(f"Titre: {title}\n")
+                tmp_file.write(f"URL: {url}\n")
+                tmp_file.write(f"Durée: {info.get('duration') or 0} secondes\n")
+                tmp_file.write(f"Chaîne: {info.get('channel') or 'Inconnue'}\n")
+                tmp_file.write(f"Vues: {info.get('view_count') or 0}\n")
+                tmp_file.write("\n" + "=" * 50 + "\n\n")
+                tmp_file.write("TRANSCRIPTION/SOUS-TITRES:\n\n")
+                tmp_file.write(transcript_text[:TRANSCRIPT_MAX_CHARS])
+
+                tmp_file_path = tmp_file.name
 
-                return tmp_file_path, f"{title}_transcription.txt", 'text/plain'
+            return tmp_file_path, f"{title}_transcription.txt", 'text/plain'
 
         except Exception as e:
-            st.error(f"Erreur d'extraction YouTube: {str(e)[:200]}")
+            report(progress, f"Erreur d'extraction YouTube: {str(e)[:200]}", 'error')
             return None, None, None
 
     @staticmethod
-    def download_youtube_audio(url):
-        """Télécharge seulement l'audio YouTube"""
+    def _fetch_transcript(info):
+        """Télécharge et nettoie les meilleurs sous-titres disponibles (manuels puis automatiques)"""
+        # Priorité: Français -> Anglais -> Première langue disponible
+        for tracks in (info.get('subtitles') or {}, info.get('automatic_captions') or {}):
+            for lang in ['fr', 'en', 'auto']:
+                formats = {sub.get('ext'): sub.get('url') for sub in tracks.get(lang, []) if sub.get('url')}
+                for ext in SUBTITLE_FORMATS:
+                    if ext not in formats:
+                        continue
+                    try:
+                        response = cached_get(formats[ext], timeout=10)
+                        if response.status_code == 200:
+                            transcript_text = parse_subtitles(response.text, ext)
+                            if transcript_text:
+                                return transcript_text
+                    except Exception:
+                        continue
+        return ""
+
+    @staticmethod
+    def download_youtube_audio(url, budget=None, progress=None):
+        """
+        Télécharge l'audio YouTube en Opus mono compact. Au-delà d'un segment,
+        l'audio est découpé et transcrit par segments (document texte horodaté)
+        dans les limites du budget (TranscriptionBudget) ; sans lui, l'audio est envoyé tel quel.
+        """
         try:
-            st.toast("Téléchargement audio YouTube...", icon="🔊")
+            video_id = YouTubeMetadataCache.video_id(url)
+            source_key = video_id or hash_bytes(url.encode('utf-8'))
+            cached = YouTubeMetadataCache.get(video_id)
+            title = (cached or {}).get('info', {}).get('title') or 'YouTube_Audio'
+
+            # Tous les segments déjà transcrits : aucun téléchargement
+            transcript = AudioPipeline.get_cached_transcript(source_key)
+            if transcript:
+                return MediaExtractor._write_audio_transcript(url, title, transcript)
+
+            report(progress, "🔊 Téléchargement audio YouTube...", 'toast')
 
             temp_dir = tempfile.mkdtemp()
             output_path = os.path.join(temp_dir, 'audio')
 
             ydl_opts = {
-                'format': 'bestaudio/best',
+                # Flux Opus natif de préférence : pas de ré-encodage coûteux
+                'format': 'bestaudio[acodec=opus]/bestaudio/best',
                 'outtmpl': output_path,
                 'quiet': True,
                 'no_warnings': True,
                 'ignoreerrors': True,
                 'postprocessors': [{
                     'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
+                    'preferredcodec': 'opus',
+                    'preferredquality': AUDIO_BITRATE.rstrip('k'),
                 }],
+                'postprocessor_args': {'extractaudio': ['-ac', '1']},
                 'extractor_args': {
                     'youtube': {
                         'player_client': ['ios'],
@@ -113,11 +161,30 @@ class MediaExtractor:
                 if info:
                     title = info.get('title', 'YouTube_Audio')
 
-                    # Chercher le fichier MP3
+                    # Chercher le fichier Opus
                     for file in os.listdir(temp_dir):
-                        if file.endswith('.mp3'):
+                        if file.endswith('.opus'):
                             final_path = os.path.join(temp_dir, file)
-                            return final_path, f"{title}.mp3", 'audio/mpeg'
+                            break
+                    else:
+                        return None, None, None
+
+                    # Audio court : envoyé tel quel
+                    if ((info.get('duration') or 0) <= AUDIO_SEGMENT_SECONDS or budget is None
+                            or not AudioPipeline.is_available()):
+                        return final_path, f"{title}.opus", 'audio/ogg'
+
+                    report(progress, "🎧 Transcription de l'audio par segments...", 'toast')
+                    transcript, failed, segment_count = AudioPipeline.transcribe(final_path, source_key, budget)
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+
+                    if failed == segment_count:
+                        report(progress, "Impossible de transcrire l'audio.", 'error')
+                        return None, None, None
+                    if failed:
+                        report(progress, f"⚠️ {failed} segment(s) non transcrit(s) : réessayez pour les compléter.",
+                               'warning')
+                    return MediaExtractor._write_audio_transcript(url, title, transcript, info.get('duration'))
 
             return None, None, None
 
@@ -125,87 +192,110 @@ class MediaExtractor:
             error_msg = str(e)
             if "Sign in" in error_msg or "bot" in error_msg:
                 # Essayer l'extraction de transcription à la place
-                st.info("YouTube bloque le téléchargement. Extraction de la transcription à la place...")
-                return MediaExtractor.extract_youtube_transcript(url)
+                report(progress, "YouTube bloque le téléchargement. Extraction de la transcription à la place...",
+                       'info')
+                return MediaExtractor.extract_youtube_transcript(url, progress)
             else:
-                st.error(f"Erreur YouTube: {error_msg[:200]}")
+                report(progress, f"Erreur YouTube: {error_msg[:200]}", 'error')
                 return None, None, None
 
     @staticmethod
-    def download_file_from_url(url):
+    def _write_audio_transcript(url, title, transcript, duration=None):
+        """Écrit la transcription assemblée d'un audio découpé dans un fichier texte"""
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.txt', mode='w', encoding='utf-8') as tmp_file:
+            tmp_file.write(f"Titre: {title}\n")
+            tmp_file.write(f"URL: {url}\n")
+            if duration:
+                tmp_file.write(f"Durée: {duration} secondes\n")
+            tmp_file.write("\n" + "=" * 50 + "\n\n")
+            tmp_file.write("TRANSCRIPTION AUDIO:\n\n")
+            tmp_file.write(transcript)
+            tmp_file_path = tmp_file.name
+
+        return tmp_file_path, f"{title}_transcription_audio.txt", 'text/plain'
+
+    @staticmethod
+    def download_file_from_url(url, progress=None):
         """Télécharge un fichier depuis une URL directe"""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-            }
+            progress_bar = None
+            last_update = [0.0]
+
+            def _on_progress(downloaded, total):
+                # Limiter les mises à jour de l'interface
+                now = time.monotonic()
+                if progress_bar is None or (now - last_update[0] < 0.25 and downloaded != total):
+                    return
+                last_update[0] = now
+                if total:
+                    progress_bar.progress(min(downloaded / total, 1.0),
+                                          text=f"Téléchargement : {downloaded // (1024 * 1024)} / "
+                                               f"{total // (1024 * 1024)} Mo")
+                else:
+                    progress_bar.progress(0.0, text=f"Téléchargement : {downloaded // (1024 * 1024)} Mo")
 
-            with st.spinner(f"Téléchargement depuis {url[:50]}..."):
-                response = requests.get(url, stream=True, headers=headers, timeout=30)
-                response.raise_for_status()
+            # Thread de travail (progress) : ni indicateur ni barre de progression dans la page
+            connecting = st.spinner(f"Connexion à {url[:50]}...") if progress is None else nullcontext()
+            with connecting:
+                downloader = Downloader(url, progress_callback=_on_progress).start()
 
-            content_type = response.headers.get('content-type', '').lower()
+            # Fermer le téléchargeur rend la connexion au pool partagé
+            with downloader:
+                content_type = downloader.content_type
 
-            if 'text/html' in content_type:
-                st.error("🚫 Lien non direct (c'est une page web). Utilisez l'onglet 'Page Web'.")
-                return None, None, None
+                if 'text/html' in content_type:
+                    report(progress, "🚫 Lien non direct (c'est une page web). Utilisez l'onglet 'Page Web'.",
+                           'error')
+                    return None, None, None
 
-            parsed_url = urlparse(url)
-            filename = os.path.basename(parsed_url.path) or "downloaded_file"
+                parsed_url = urlparse(url)
+                filename = os.path.basename(parsed_url.path) or "downloaded_file"
+
+                if not os.path.splitext(filename)[1] and content_type:
+                    ext = mimetypes.guess_extension(content_type.split(';')[0].strip())
+                    if ext:
+                        filename += ext
 
-            if not os.path.splitext(filename)[1] and content_type:
-                ext = mimetypes.guess_extension(content_type)
-                if ext:
-                    filename += ext
+                with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename.replace('.', '_')}") as tmp_file:
+                    tmp_path = tmp_file.name
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{filename.replace('.', '_')}") as tmp_file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        tmp_file.write(chunk)
-                return tmp_file.name, filename, content_type
+                if progress is None:
+                    progress_bar = st.progress(0.0, text="Téléchargement...")
+                downloader.save(tmp_path)
+                if progress_bar is not None:
+                    progress_bar.empty()
+                return tmp_path, filename, content_type
 
+        except DownloadError as e:
+            report(progress, f"❌ {e}", 'error')
+            return None, None, None
         except requests.exceptions.Timeout:
-            st.error("⏱️ Délai d'attente dépassé. Le serveur met trop de temps à répondre.")
+            report(progress, "⏱️ Délai d'attente dépassé. Le serveur met trop de temps à répondre.", 'error')
             return None, None, None
         except requests.exceptions.RequestException as e:
-            st.error(f"❌ Erreur réseau : {str(e)[:100]}")
+            report(progress, f"❌ Erreur réseau : {str(e)[:100]}", 'error')
             return None, None, None
         except Exception as e:
-            st.toast(f"❌ Erreur URL : {e}", icon="⚠️")
+            report(progress, f"❌ Erreur URL : {e}", 'toast')
             return None, None, None
 
     @staticmethod
-    def analyze_webpage_content(url):
+    def analyze_webpage_content(url, progress=None):
         """Extrait le contenu textuel d'une page web"""
         try:
-            st.toast("Téléchargement du contenu textuel de la page...", icon="📄")
-
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
-            }
+            report(progress, "📄 Téléchargement du contenu textuel de la page...", 'toast')
 
-            response = requests.get(url, headers=headers, timeout=30)
+            response = cached_get(url, timeout=30)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Supprimer les éléments non pertinents
-            for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav', 'aside', 'iframe', 'form']):
-                script_or_style.decompose()
-
-            content = soup.get_text(separator='\n', strip=True)
+            page_title, content = extract_html(response.content)
 
             if not content or len(content) < 100:
-                st.warning("⚠️ Contenu de la page trop court ou non extractible.")
+                report(progress, "⚠️ Contenu de la page trop court ou non extractible.", 'warning')
                 return None, None, None
 
             parsed_url = urlparse(url)
-            title = soup.title.string if soup.title else "Page Web"
+            title = page_title or "Page Web"
 
             # Nettoyer le titre pour le nom de fichier
             filename = "".join(c for c in title[:50] if c.isalnum() or c in (' ', '-', '_')).rstrip()
@@ -223,13 +313,50 @@ class MediaExtractor:
             return tmp_file_path, filename, 'text/plain'
 
         except requests.exceptions.Timeout:
-            st.error("⏱️ Délai d'attente dépassé lors du chargement de la page.")
+            report(progress, "⏱️ Délai d'attente dépassé lors du chargement de la page.", 'error')
             return None, None, None
         except requests.exceptions.RequestException as e:
-            st.error(f"❌ Erreur réseau : {str(e)[:100]}")
+            report(progress, f"❌ Erreur réseau : {str(e)[:100]}", 'error')
+            return None, None, None
+        except Exception as e:
+            report(progress, f"Erreur d'analyse de la page web : {e}", 'error')
             return None, None, None
+
+    @staticmethod
+    def crawl_website(url, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES, progress=None):
+        """Explore les pages d'un même site et les réunit en un seul document texte"""
+        try:
+            report(progress, f"🕸️ Exploration du site (profondeur {max_depth}, {max_pages} pages max)...", 'toast')
+
+            crawler = SiteCrawler(url, max_depth=max_depth, max_pages=max_pages)
+            pages = crawler.crawl()
+            content = crawler.build_document()
+
+            if not pages or len(content) < 100:
+                report(progress, "⚠️ Aucune page exploitable trouvée sur ce site.", 'warning')
+                return None, None, None
+
+            stats = crawler.stats
+            report(progress, f"🕸️ {len(pages)} page(s) retenue(s), {stats['duplicates']} doublon(s) ignoré(s)",
+                   'toast')
+
+            title = pages[0]['title'] or crawler.site
+            filename = "".join(c for c in title[:50] if c.isalnum() or c in (' ', '-', '_')).rstrip()
+            filename = f"{filename}_site.txt".replace(' ', '_')
+
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".txt", mode='w', encoding='utf-8') as tmp_file:
+                tmp_file.write(f"Source URL: {url}\n")
+                tmp_file.write(f"Site: {crawler.site}\n")
+                tmp_file.write(f"Pages: {len(pages)}\n")
+                tmp_file.write("\n" + "=" * 50 + "\n\n")
+                tmp_file.write("CONTENU DU SITE:\n\n")
+                tmp_file.write(content)
+                tmp_file_path = tmp_file.name
+
+            return tmp_file_path, filename, 'text/plain'
+
         except Exception as e:
-            st.error(f"Erreur d'analyse de la page web : {e}")
+            report(progress, f"Erreur d'exploration du site : {str(e)[:200]}", 'error')
             return None, None, None
 
     @staticmethod
@@ -243,33 +370,5 @@ class MediaExtractor:
 
     @staticmethod
     def get_url_type(url):
-        """Détermine le type d'URL"""
-        if 'youtube.com' in url or 'youtu.be' in url:
-            return 'youtube'
-        elif url.endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm')):
-            return 'video'
-        elif url.endswith(('.mp3', '.wav', '.ogg', '.flac')):
-            return 'audio'
-        elif url.endswith(('.pdf', '.doc', '.docx', '.txt', '.rtf')):
-            return 'document'
-        elif url.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')):
-            return 'image'
-        else:
-            # Analyse le content-type
-            try:
-                response = requests.head(url, timeout=5)
-                content_type = response.headers.get('content-type', '')
-                if 'text/html' in content_type:
-                    return 'webpage'
-                elif 'image/' in content_type:
-                    return 'image'
-                elif 'video/' in content_type:
-                    return 'video'
-                elif 'audio/' in content_type:
-                    return 'audio'
-                elif 'application/pdf' in content_type:
-                    return 'pdf'
-                else:
-                    return 'unknown'
-            except:
-                return 'webpage'  # Par défaut, considère comme page web
\ No newline at end of file
+        """Détermine le type d'URL (mémorisé, HEAD puis lecture des premiers octets)"""
+        return UrlClassifier.classify(url)
\ No newline at end of file
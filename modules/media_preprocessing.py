@@ -0,0 +1,131 @@
+"""
+Pré-traitement des images et vidéos avant l'envoi à Gemini
+(réduction de résolution, suppression des métadonnées, proxy vidéo basse définition)
+"""
+import os
+import shutil
+import subprocess
+
+from utils import process_pool
+from utils.cache import hash_file, get_cache_path, write_atomically, write_bytes_file
+
+# Pillow est optionnel : sans lui, les images sont envoyées telles quelles
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+MEDIA_CACHE_NAMESPACE = 'media'
+MEDIA_PREPROCESSOR_VERSION = 1
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 1536))  # Au-delà, Gemini redécoupe sans gain utile
+IMAGE_JPEG_QUALITY = 85
+VIDEO_MAX_WIDTH = 854  # 480p
+VIDEO_FPS = 1  # Gemini échantillonne les vidéos à 1 image/seconde
+VIDEO_TIMEOUT = 1800
+MEDIA_MAX_WORKERS = max(1, min(2, os.cpu_count() or 1))
+MEDIA_POOL = 'media_preprocessing'  # Pool de processus partagé (utils.process_pool)
+SKIP_MARKER = '.skip'  # Version optimisée pas plus légère que l'original : rien à refaire
+
+
+def _preprocess_image(source_path, output_base):
+    """Réduit et ré-encode une image sans métadonnées (exécuté dans un processus séparé)"""
+    with Image.open(source_path) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if has_alpha:
+            output_path, mime_type = f"{output_base}.png", 'image/png'
+            image = image.convert('RGBA')
+            # Sans `info`, aucune métadonnée (EXIF, ICC, texte) n'est réécrite
+            image.info = {}
+            write_atomically(output_path, lambda path: image.save(path, format='PNG', optimize=True))
+        else:
+            output_path, mime_type = f"{output_base}.jpg", 'image/jpeg'
+            image = image.convert('RGB')
+            write_atomically(output_path, lambda path: image.save(path, format='JPEG', quality=IMAGE_JPEG_QUALITY,
+                                                                  optimize=True, exif=b''))
+    return output_path, mime_type
+
+
+def _preprocess_video(source_path, output_base, ffmpeg_path):
+    """Transcode une vidéo en proxy basse définition (exécuté dans un processus séparé)"""
+    output_path = f"{output_base}.mp4"
+
+    def _transcode(path):
+        command = [
+            ffmpeg_path, '-y', '-loglevel', 'error', '-i', source_path,
+            '-map_metadata', '-1',
+            '-vf', f"fps={VIDEO_FPS},scale='min({VIDEO_MAX_WIDTH},iw)':-2",
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '30', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '48k', '-ac', '1',
+            '-movflags', '+faststart',
+            path
+        ]
+        subprocess.run(command, check=True, capture_output=True, timeout=VIDEO_TIMEOUT)
+
+    write_atomically(output_path, _transcode)
+    return output_path, 'video/mp4'
+
+
+class MediaPreprocessor:
+    @staticmethod
+    def can_preprocess(mime_type):
+        """Indique si le type de média peut être optimisé localement"""
+        if mime_type.startswith('image/'):
+            return Image is not None and mime_type != 'image/gif'
+        if mime_type.startswith('video/'):
+            return shutil.which('ffmpeg') is not None
+        return False
+
+    @staticmethod
+    def preprocess(file_path, mime_type):
+        """
+        Retourne (chemin, type MIME) de la version optimisée du média, mise en cache
+        selon l'empreinte du contenu, ou None si l'original doit être envoyé.
+        """
+        if not MediaPreprocessor.can_preprocess(mime_type):
+            return None
+
+        try:
+            cache_key = f"{hash_file(file_path)}_v{MEDIA_PREPROCESSOR_VERSION}"
+            output_base = get_cache_path(MEDIA_CACHE_NAMESPACE, cache_key)
+
+            if os.path.exists(output_base + SKIP_MARKER):
+                return None
+            for extension, cached_mime in (('.jpg', 'image/jpeg'), ('.png', 'image/png'), ('.mp4', 'video/mp4')):
+                if os.path.exists(output_base + extension):
+                    return output_base + extension, cached_mime
+
+            if mime_type.startswith('image/'):
+                future = process_pool.submit(MEDIA_POOL, MEDIA_MAX_WORKERS, _preprocess_image, file_path, output_base)
+            else:
+                future = process_pool.submit(MEDIA_POOL, MEDIA_MAX_WORKERS, _preprocess_video, file_path, output_base,
+                                             shutil.which('ffmpeg'))
+
+            result = future.result()
+            # Inutile d'envoyer une version plus lourde que l'original
+            if result and os.path.getsize(result[0]) < os.path.getsize(file_path):
+                return result
+
+            if result:
+                os.unlink(result[0])
+            # Marqueur en cache : les envois suivants du même contenu ne relancent pas l'encodage
+            write_bytes_file(output_base + SKIP_MARKER, b'')
+            return None
+
+        except Exception:
+            # En cas d'échec, l'original est envoyé
+            return None
+
+    @staticmethod
+    def format_size(size):
+        """Formate une taille en octets pour l'affichage"""
+        for unit in ('o', 'Ko', 'Mo'):
+            if size < 1024:
+                return f"{size:.0f} {unit}"
+            size /= 1024
+        return f"{size:.1f} Go"
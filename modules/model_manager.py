@@ -7,9 +7,18 @@ import google.generativeai as genai
 
 from datetime import datetime
 import re
+import threading
+
+from utils.metrics import MODEL_SELECTIONS
 
 
 class ModelManager:
+    # Limites RPM
+    RPM_LIMITS = {
+        'default': 15,  # gemini-2.5-flash
+        'advanced': 3  # gemini-robotics-er-1.5-preview
+    }
+
     def __init__(self, api_key):
         genai.configure(api_key=api_key)
 
@@ -23,7 +32,8 @@ class ModelManager:
         self.loaded_models = {}
         self._preload_models()
 
-        # Compteurs d'utilisation (transparents)
+        # Compteurs d'utilisation (transparents), partagés avec les threads de transcription
+        self._counters_lock = threading.Lock()
         self.usage_counters = {
             'default': {'minute_count': 0, 'minute_start': datetime.now()},
             'advanced': {'minute_count': 0, 'minute_start': datetime.now()}
@@ -50,25 +60,30 @@ class ModelManager:
         Sélectionne automatiquement le meilleur modèle
         L'utilisateur n'est pas informé de la décision
         """
-        # Limites RPM
-        default_limit = 15  # gemini-2.5-flash
-        advanced_limit = 3  # gemini-robotics-er-1.5-preview
+        default_limit = self.RPM_LIMITS['default']
+        advanced_limit = self.RPM_LIMITS['advanced']
 
         # Vérifier la disponibilité du modèle par défaut
         if self._check_availability('default', default_limit):
             # Vérifier si on a besoin du modèle avancé
             if self._requires_advanced_model(query, file_type):
                 if self._check_availability('advanced', advanced_limit):
+                    MODEL_SELECTIONS.labels(model='advanced', reason='advanced_query').inc()
                     return self.loaded_models['advanced'], 'advanced'
+                MODEL_SELECTIONS.labels(model='default', reason='advanced_rate_limited').inc()
+                return self.loaded_models['default'], 'default'
 
             # Sinon utiliser le modèle par défaut
+            MODEL_SELECTIONS.labels(model='default', reason='default').inc()
             return self.loaded_models['default'], 'default'
 
         # Si modèle par défaut indisponible, essayer l'avancé
         if self._check_availability('advanced', advanced_limit):
+            MODEL_SELECTIONS.labels(model='advanced', reason='default_rate_limited').inc()
             return self.loaded_models['advanced'], 'advanced'
 
         # Dernier recours: forcer l'utilisation du modèle par défaut
+        MODEL_SELECTIONS.labels(model='default', reason='all_rate_limited').inc()
         return self.loaded_models['default'], 'default'
 
     def _requires_advanced_model(self, query, file_type):
@@ -133,7 +148,26 @@ class ModelManager:
     def update_counter(self, model_type):
         """Met à jour le compteur d'utilisation"""
         if model_type in self.usage_counters:
+            with self._counters_lock:
+                self.usage_counters[model_type]['minute_count'] += 1
+
+    def reserve(self, model_type):
+        """
+        Compte une requête si le modèle est sous sa limite RPM (vérification et
+        comptage atomiques, pour les appels concurrents) ; False sinon
+        """
+        with self._counters_lock:
+            if not self._check_availability(model_type, self.RPM_LIMITS.get(model_type, 0)):
+                return False
             self.usage_counters[model_type]['minute_count'] += 1
+            return True
+
+    def seconds_until_reset(self, model_type):
+        """Secondes avant la fin de la fenêtre d'une minute du compteur RPM"""
+        counter = self.usage_counters.get(model_type)
+        if not counter:
+            return 0
+        return max(0.0, 60 - (datetime.now() - counter['minute_start']).total_seconds())
 
     def reset_daily_counters(self):
         """Réinitialise les compteurs"""
@@ -0,0 +1,339 @@
+"""
+Export PDF des archives en mémoire (BytesIO) avec mise en page Platypus :
+retour à la ligne selon la largeur réelle des glyphes, pagination automatique,
+titres, listes et blocs de code markdown
+"""
+import io
+import os
+import re
+import threading
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Preformatted, Spacer, HRFlowable
+
+from modules.archive_index import archive_fingerprint
+from utils import process_pool
+from utils.cache import hash_bytes, get_cache_path, evict_lru, write_bytes_file
+
+PDF_TEMPLATE_VERSION = 1  # À incrémenter à chaque changement de mise en page
+PDF_FONT_DIR = os.getenv('PDF_FONT_DIR', '')
+PDF_MARGIN = 1.8 * cm
+BODY_FONT_SIZE = 10
+CODE_FONT_SIZE = 8
+
+PDF_CACHE_NAMESPACE = 'archive_pdf'
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+PDF_MAX_WORKERS = max(1, min(2, os.cpu_count() or 1))
+PDF_POOL = 'pdf_export'  # Pool de processus partagé (utils.process_pool)
+
+# Polices Unicode (accents, alphabets non latins) ; Helvetica/Courier sinon
+FONT_DIRS = ('/usr/share/fonts/truetype/dejavu', '/usr/share/fonts/dejavu', '/usr/share/fonts/TTF',
+             '/Library/Fonts', 'C:\\Windows\\Fonts')
+UNICODE_FONTS = {
+    'SimandouSans': 'DejaVuSans.ttf',
+    'SimandouSans-Bold': 'DejaVuSans-Bold.ttf',
+    'SimandouSans-Oblique': 'DejaVuSans-Oblique.ttf',
+    'SimandouSans-BoldOblique': 'DejaVuSans-BoldOblique.ttf',
+    'SimandouMono': 'DejaVuSansMono.ttf',
+}
+
+_FENCE_RE = re.compile(r'^\s*(```|~~~)')
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*)$')
+_BULLET_RE = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+_NUMBERED_RE = re.compile(r'^(\s*)(\d+)[.)]\s+(.*)$')
+_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*|__(.+?)__')
+_ITALIC_RE = re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?!\w)|(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)')
+_HR_RE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+_CONTROL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_fonts = None
+_jobs_lock = threading.Lock()
+_jobs = {}  # clé de cache -> Future du rendu en cours (ou terminé en échec)
+
+
+def _find_font(file_name):
+    for directory in ((PDF_FONT_DIR,) if PDF_FONT_DIR else ()) + FONT_DIRS:
+        path = os.path.join(directory, file_name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def get_fonts():
+    """Enregistre les polices (une seule fois) et retourne {'regular', 'bold', 'italic', 'bold_italic', 'mono'}"""
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+
+    registered = {}
+    for name, file_name in UNICODE_FONTS.items():
+        path = _find_font(file_name)
+        if path:
+            try:
+                pdfmetrics.registerFont(TTFont(name, path))
+                registered[name] = True
+            except Exception:
+                pass
+
+    if 'SimandouSans' in registered:
+        fonts = {
+            'regular': 'SimandouSans',
+            'bold': 'SimandouSans-Bold' if 'SimandouSans-Bold' in registered else 'SimandouSans',
+            'italic': 'SimandouSans-Oblique' if 'SimandouSans-Oblique' in registered else 'SimandouSans',
+            'mono': 'SimandouMono' if 'SimandouMono' in registered else 'Courier',
+        }
+        fonts['bold_italic'] = ('SimandouSans-BoldOblique' if 'SimandouSans-BoldOblique' in registered
+                                else fonts['bold'])
+        pdfmetrics.registerFontFamily('SimandouSans', normal=fonts['regular'], bold=fonts['bold'],
+                                      italic=fonts['italic'], boldItalic=fonts['bold_italic'])
+    else:
+        fonts = {'regular': 'Helvetica', 'bold': 'Helvetica-Bold', 'italic': 'Helvetica-Oblique',
+                 'bold_italic': 'Helvetica-BoldOblique', 'mono': 'Courier'}
+    _fonts = fonts
+    return fonts
+
+
+def _styles(fonts):
+    base = ParagraphStyle('body', fontName=fonts['regular'], fontSize=BODY_FONT_SIZE, leading=13,
+                          alignment=TA_LEFT, spaceAfter=4)
+    return {
+        'title': ParagraphStyle('title', parent=base, fontName=fonts['bold'], fontSize=16, leading=20, spaceAfter=8),
+        'meta': ParagraphStyle('meta', parent=base, fontSize=11, leading=14, spaceAfter=2),
+        'role': ParagraphStyle('role', parent=base, fontName=fonts['bold'], spaceBefore=8, spaceAfter=2),
+        'timestamp': ParagraphStyle('timestamp', parent=base, fontName=fonts['italic'], fontSize=8,
+                                    textColor=colors.grey, spaceAfter=2),
+        'body': ParagraphStyle('message', parent=base, leftIndent=20),
+        'bullet': ParagraphStyle('bullet', parent=base, leftIndent=34, bulletIndent=22),
+        'heading': ParagraphStyle('heading', parent=base, fontName=fonts['bold'], fontSize=11.5, leading=15,
+                                  leftIndent=20, spaceBefore=4),
+        'code': ParagraphStyle('code', parent=base, fontName=fonts['mono'], fontSize=CODE_FONT_SIZE, leading=10,
+                               leftIndent=20, backColor=colors.HexColor('#f3f3f3'), borderPadding=4,
+                               spaceBefore=4, spaceAfter=8),
+    }
+
+
+def inline_markup(text, mono_font):
+    """Markdown en ligne (`code`, **gras**, *italique*) vers le balisage des paragraphes reportlab"""
+    codes = []
+
+    def _keep_code(match):
+        codes.append(match.group(1))
+        return f"\x00{len(codes) - 1}\x00"
+
+    text = _INLINE_CODE_RE.sub(_keep_code, text)
+    text = escape(text)
+    text = _BOLD_RE.sub(lambda m: f"<b>{m.group(1) or m.group(2)}</b>", text)
+    text = _ITALIC_RE.sub(lambda m: f"<i>{m.group(1) or m.group(2)}</i>", text)
+    return re.sub('\x00(\\d+)\x00',
+                  lambda m: f'<font face="{mono_font}">{escape(codes[int(m.group(1))])}</font>', text)
+
+
+def markdown_paragraph(lines, style, mono_font, **kwargs):
+    """
+    Paragraphe reportlab à partir de lignes markdown ; si le balisage obtenu est
+    invalide (emphases croisées : **a *b** c*), repli sur le texte brut échappé
+    """
+    try:
+        return Paragraph("<br/>".join(inline_markup(line, mono_font) for line in lines), style, **kwargs)
+    except ValueError:
+        return Paragraph("<br/>".join(escape(line) for line in lines), style, **kwargs)
+
+
+def wrap_code_line(line, font_name, font_size, max_width):
+    """Coupe une ligne de code trop large (police à chasse fixe : largeur d'un caractère × nombre)"""
+    line = line.expandtabs(4)
+    char_width = stringWidth('M', font_name, font_size) or font_size * 0.6
+    per_line = max(1, int(max_width // char_width))
+    if len(line) <= per_line:
+        return [line]
+    return [line[start:start + per_line] for start in range(0, len(line), per_line)]
+
+
+def markdown_flowables(text, styles, fonts, max_width):
+    """Convertit le texte d'un message (markdown courant) en éléments Platypus"""
+    flowables = []
+    paragraph = []
+    code = None
+
+    def _flush_paragraph():
+        if paragraph:
+            flowables.append(markdown_paragraph(paragraph, styles['body'], fonts['mono']))
+            paragraph.clear()
+
+    text = _CONTROL_RE.sub('', text)
+    code_width = max_width - styles['code'].leftIndent - 2 * styles['code'].borderPadding
+    for line in text.splitlines():
+        if code is not None:
+            if _FENCE_RE.match(line):
+                flowables.append(Preformatted("\n".join(code) or " ", styles['code']))
+                code = None
+            else:
+                code.extend(wrap_code_line(line, fonts['mono'], CODE_FONT_SIZE, code_width))
+            continue
+
+        if _FENCE_RE.match(line):
+            _flush_paragraph()
+            code = []
+            continue
+
+        stripped = line.strip()
+        if not stripped:
+            _flush_paragraph()
+            continue
+
+        heading = _HEADING_RE.match(stripped)
+        bullet = _BULLET_RE.match(line)
+        numbered = _NUMBERED_RE.match(line)
+        if heading:
+            _flush_paragraph()
+            flowables.append(markdown_paragraph([heading.group(2)], styles['heading'], fonts['mono']))
+        elif _HR_RE.match(line):
+            _flush_paragraph()
+            flowables.append(HRFlowable(width='100%', thickness=0.5, color=colors.lightgrey,
+                                        spaceBefore=4, spaceAfter=4))
+        elif bullet:
+            _flush_paragraph()
+            flowables.append(markdown_paragraph([bullet.group(2)], styles['bullet'], fonts['mono'],
+                                                bulletText='•'))
+        elif numbered:
+            _flush_paragraph()
+            flowables.append(markdown_paragraph([numbered.group(3)], styles['bullet'], fonts['mono'],
+                                                bulletText=f"{numbered.group(2)}."))
+        else:
+            paragraph.append(stripped)
+
+    _flush_paragraph()
+    if code is not None:
+        # Bloc de code non refermé
+        flowables.append(Preformatted("\n".join(code) or " ", styles['code']))
+    return flowables
+
+
+def _draw_footer(canvas, document):
+    fonts = get_fonts()
+    canvas.saveState()
+    canvas.setFont(fonts['italic'], 8)
+    canvas.drawString(PDF_MARGIN, 30, f"Généré le {document.generated_at}")
+    canvas.drawString(PDF_MARGIN, 20, "Simandou-GN-IA - L'excellence IA made in Africa")
+    canvas.drawRightString(document.pagesize[0] - PDF_MARGIN, 20, f"Page {document.page}")
+    canvas.restoreState()
+
+
+def render_archive_pdf(archive, username):
+    """Génère le PDF d'une archive et retourne son contenu (bytes), sans fichier temporaire"""
+    fonts = get_fonts()
+    styles = _styles(fonts)
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=PDF_MARGIN, rightMargin=PDF_MARGIN,
+                                 topMargin=PDF_MARGIN, bottomMargin=PDF_MARGIN + 20,
+                                 title=archive['title'], author=username, creator="Simandou-GN-IA")
+    document.generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    story = [
+        Paragraph("Archive Simandou-GN-IA", styles['title']),
+        Paragraph(f"Titre: {escape(archive['title'])}", styles['meta']),
+        Paragraph(f"Date: {escape(archive['timestamp'][:19])}", styles['meta']),
+        Paragraph(f"Utilisateur: {escape(username)}", styles['meta']),
+        HRFlowable(width='100%', thickness=1, color=colors.black, spaceBefore=6, spaceAfter=10),
+        Paragraph("Historique de la conversation:", styles['role']),
+    ]
+
+    for msg in archive['history']:
+        role = "UTILISATEUR" if msg['role'] == 'user' else "ASSISTANT"
+        story.append(Paragraph(f"{role}:", styles['role']))
+        if msg.get('timestamp'):
+            story.append(Paragraph(escape(msg['timestamp'][:19]), styles['timestamp']))
+        story.extend(markdown_flowables(msg.get('text') or '', styles, fonts, document.width))
+        story.append(Spacer(1, 4))
+
+    document.build(story, onFirstPage=_draw_footer, onLaterPages=_draw_footer)
+    return buffer.getvalue()
+
+
+def _render_to_cache(archive, username, output_path):
+    """Rendu écrit de manière atomique dans le cache (exécuté dans un processus séparé)"""
+    return write_bytes_file(output_path, render_archive_pdf(archive, username))
+
+
+class PdfExportJobs:
+    """Rendus PDF en arrière-plan, mis en cache par (archive, contenu, utilisateur, modèle de page)"""
+
+    @staticmethod
+    def cache_key(archive, username):
+        payload = f"{archive['id']}|{archive_fingerprint(archive)}|{username}|v{PDF_TEMPLATE_VERSION}"
+        return hash_bytes(payload.encode('utf-8'))
+
+    @staticmethod
+    def get_cached(archive, username):
+        """Chemin du PDF déjà rendu pour cette version de l'archive, None sinon"""
+        path = get_cache_path(PDF_CACHE_NAMESPACE, PdfExportJobs.cache_key(archive, username), '.pdf')
+        if not os.path.exists(path):
+            return None
+        # La date de modification sert d'horodatage d'utilisation pour l'éviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    @staticmethod
+    def submit(archive, username):
+        """Lance le rendu en arrière-plan (sans effet si un rendu de cette version est en cours)"""
+        key = PdfExportJobs.cache_key(archive, username)
+        with _jobs_lock:
+            future = _jobs.get(key)
+            if future is not None and not future.done():
+                return key
+
+        output_path = get_cache_path(PDF_CACHE_NAMESPACE, key, '.pdf')
+        future = process_pool.submit(PDF_POOL, PDF_MAX_WORKERS, _render_to_cache, archive, username, output_path)
+        future.add_done_callback(lambda _: PdfExportJobs._evict())
+        with _jobs_lock:
+            _jobs[key] = future
+        return key
+
+    @staticmethod
+    def _evict():
+        try:
+            evict_lru(PDF_CACHE_NAMESPACE, PDF_CACHE_MAX_BYTES)
+        except OSError:
+            pass
+
+    @staticmethod
+    def status(archive, username):
+        """
+        ('ready', chemin), ('running', None), ('failed', message) ou ('idle', None)
+
+        Un rendu en échec reste 'failed' jusqu'à la prochaine demande (submit) :
+        l'erreur reste affichée après le réaffichage complet de la page.
+        """
+        path = PdfExportJobs.get_cached(archive, username)
+        key = PdfExportJobs.cache_key(archive, username)
+        with _jobs_lock:
+            future = _jobs.get(key)
+            if path:
+                _jobs.pop(key, None)
+                return 'ready', path
+            if future is None:
+                return 'idle', None
+            if not future.done():
+                return 'running', None
+
+        error = future.exception()
+        if error is None:
+            # Terminé, mais déjà évincé du cache
+            with _jobs_lock:
+                if _jobs.get(key) is future:
+                    _jobs.pop(key)
+            return 'idle', None
+        return 'failed', str(error)
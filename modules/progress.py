@@ -0,0 +1,28 @@
+"""
+Messages d'avancement des traitements : affichés dans la page depuis le thread
+du script, ou transmis à un rappel depuis les threads du pool d'ingestion
+(qui ne doivent pas écrire dans la page)
+"""
+import streamlit as st
+
+# Niveau -> fonction d'affichage Streamlit
+LEVELS = {
+    'write': st.write,
+    'info': st.info,
+    'warning': st.warning,
+    'error': st.error,
+    'toast': st.toast,
+}
+
+
+def show(message, level='write'):
+    """Affiche un message d'avancement (thread du script)"""
+    LEVELS[level](message)
+
+
+def report(progress, message, level='write'):
+    """Transmet message à progress(message, level), ou l'affiche directement sans rappel"""
+    if progress is not None:
+        progress(message, level)
+    else:
+        show(message, level)
@@ -1,6 +1,8 @@
 # modules/request_counter.py
 import streamlit as st
-from datetime import datetime, time, timedelta
+from datetime import datetime, date, time, timedelta
+
+from modules.session_events import SessionEvents, QUOTA_CHANGED
 
 
 class RequestCounter:
@@ -13,7 +15,12 @@ class RequestCounter:
         if not hasattr(self.db, 'get_daily_request_count'):
             return
 
-        count_today = self.db.get_daily_request_count(username)
+        # Relu en base uniquement après un changement de quota (ou un changement de jour)
+        count_today = SessionEvents.cached(
+            'daily_request_count', (QUOTA_CHANGED,),
+            lambda: self.db.get_daily_request_count(username),
+            scope=(username, date.today())
+        )
 
         # Calculer le temps jusqu'à la réinitialisation
         now = datetime.now()
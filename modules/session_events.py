@@ -0,0 +1,50 @@
+"""
+Données de l'interface mises en cache dans la session et invalidées par événements
+(quota modifié, document rattaché, archive créée, compte modifié)
+"""
+import streamlit as st
+
+from utils.metrics import cache_lookup
+
+QUOTA_CHANGED = 'quota'
+DOCUMENTS_CHANGED = 'documents'
+ARCHIVES_CHANGED = 'archives'
+ACCOUNT_CHANGED = 'account'
+
+
+class SessionEvents:
+    @staticmethod
+    def _versions():
+        if '_event_versions' not in st.session_state:
+            st.session_state._event_versions = {}
+        return st.session_state._event_versions
+
+    @staticmethod
+    def version(event):
+        return SessionEvents._versions().get(event, 0)
+
+    @staticmethod
+    def emit(*events):
+        """Signale un changement : les données qui dépendent de ces événements seront relues"""
+        versions = SessionEvents._versions()
+        for event in events:
+            versions[event] = versions.get(event, 0) + 1
+
+    @staticmethod
+    def cached(name, events, loader, scope=None):
+        """
+        Valeur de loader() conservée en session tant qu'aucun des événements n'a été émis.
+        scope (utilisateur, date...) fait partie de la clé : un changement force la relecture.
+        """
+        if '_event_cache' not in st.session_state:
+            st.session_state._event_cache = {}
+        cache = st.session_state._event_cache
+
+        stamp = (scope, tuple(SessionEvents.version(event) for event in events))
+        entry = cache.get(name)
+        if cache_lookup('session', entry is not None and entry[0] == stamp):
+            return entry[1]
+
+        value = loader()
+        cache[name] = (stamp, value)
+        return value
@@ -0,0 +1,162 @@
+"""
+Analyse en flux des sous-titres (VTT, SRT, json3) : nettoyage des balises,
+suppression des répétitions des sous-titres automatiques et horodatage optionnel
+"""
+import io
+import os
+import re
+import html
+import json
+
+TRANSCRIPT_MAX_CHARS = 500000  # Les longues transcriptions passent par la recherche d'extraits
+TRANSCRIPT_TIMESTAMPS = os.getenv('TRANSCRIPT_TIMESTAMPS', 'true').lower() in ('1', 'true', 'yes')
+PARAGRAPH_SECONDS = 60  # Durée couverte par un paragraphe (et intervalle des ancres)
+MIN_OVERLAP_WORDS = 3  # Recouvrement minimal pour couper le début d'une ligne
+RECENT_WORDS = 64  # Mots récents comparés aux nouvelles lignes
+
+# Préférence des formats proposés par yt-dlp
+SUBTITLE_FORMATS = ('json3', 'vtt', 'srt')
+
+_TIMESTAMP_RE = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})')
+_TAG_RE = re.compile(r'<[^>]*>')
+
+
+def _parse_timestamp(value):
+    """'01:02:03.450' ou '02:03,450' -> secondes"""
+    match = _TIMESTAMP_RE.search(value)
+    if not match:
+        return None
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, '0')) / 1000
+
+
+def _clean_line(line):
+    """Retire les balises de style et de minutage mot à mot (<00:00:01.000><c>...)"""
+    if '<' in line:
+        line = _TAG_RE.sub('', line)
+    if '&' in line:
+        line = html.unescape(line)
+    return ' '.join(line.split())
+
+
+def parse_vtt(lines):
+    """Génère (début, fin en secondes, [lignes]) pour chaque réplique d'un flux WebVTT ou SRT"""
+    start = end = None
+    text_lines = []
+    skip_block = False
+
+    for raw_line in lines:
+        # Seule une ligne vide termine une réplique : les sous-titres automatiques
+        # utilisent une ligne d'espaces comme première ligne de texte
+        if not raw_line.rstrip('\r\n'):
+            if start is not None and text_lines:
+                yield start, end, text_lines
+            start, text_lines, skip_block = None, [], False
+            continue
+
+        line = raw_line.strip()
+        if not line or skip_block:
+            continue
+
+        if '-->' in line:
+            start_part, end_part = line.split('-->', 1)
+            start, end = _parse_timestamp(start_part), _parse_timestamp(end_part)
+            text_lines = []
+        elif start is None:
+            # En-tête WEBVTT, blocs NOTE/STYLE/REGION et numéros de réplique SRT
+            if line.startswith(('NOTE', 'STYLE', 'REGION')):
+                skip_block = True
+        else:
+            cleaned = _clean_line(line)
+            if cleaned:
+                text_lines.append(cleaned)
+
+    if start is not None and text_lines:
+        yield start, end, text_lines
+
+
+# Le format SRT partage la structure « minutage puis texte » de WebVTT
+parse_srt = parse_vtt
+
+
+def parse_json3(data):
+    """Génère (début, fin en secondes, [lignes]) à partir du format json3 de YouTube"""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+
+    for event in data.get('events', []):
+        segments = event.get('segs')
+        if not segments:
+            continue
+        text = ''.join(segment.get('utf8', '') for segment in segments)
+        lines = [cleaned for cleaned in (_clean_line(line) for line in text.split('\n')) if cleaned]
+        if lines:
+            start = event.get('tStartMs', 0) / 1000
+            duration = event.get('dDurationMs')
+            yield start, (start + duration / 1000 if duration is not None else None), lines
+
+
+def deduplicate_cues(cues):
+    """
+    Supprime les répétitions des sous-titres automatiques : chaque réplique reprend
+    la ligne précédente, puis la complète. Seuls les mots nouveaux sont conservés.
+    Seule une réplique qui commence avant la fin de la précédente (sous-titres
+    glissants) est comparée : une réplique répétée plus tard (« Oui. ») est gardée.
+    """
+    recent = []
+    previous_end = None
+    for start, end, lines in cues:
+        rolling = previous_end is not None and start <= previous_end
+        previous_end = end
+        for line in lines:
+            words = line.split()
+            overlap = 0
+            for size in range(min(len(words), len(recent)) if rolling else 0, 0, -1):
+                if recent[-size:] == words[:size]:
+                    overlap = size
+                    break
+
+            # Un recouvrement court n'est retiré que s'il couvre toute la ligne
+            if overlap < MIN_OVERLAP_WORDS and overlap != len(words):
+                overlap = 0
+
+            new_words = words[overlap:]
+            if new_words:
+                recent = (recent + new_words)[-RECENT_WORDS:]
+                yield start, ' '.join(new_words)
+
+
+def format_transcript(cues, with_timestamps=TRANSCRIPT_TIMESTAMPS, max_chars=TRANSCRIPT_MAX_CHARS):
+    """
+    Assemble la transcription dans un tampon : un paragraphe par tranche de
+    PARAGRAPH_SECONDS, précédé de son horodatage [HH:MM:SS] si demandé.
+    """
+    buffer = io.StringIO()
+    paragraph_start = None
+    length = 0
+
+    for start, text in deduplicate_cues(cues):
+        if paragraph_start is None or start - paragraph_start >= PARAGRAPH_SECONDS:
+            if paragraph_start is not None:
+                length += buffer.write('\n\n')
+            paragraph_start = start
+            if with_timestamps:
+                seconds = int(start)
+                length += buffer.write(f"[{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}] ")
+        else:
+            length += buffer.write(' ')
+
+        length += buffer.write(text)
+        if length >= max_chars:
+            break
+
+    return buffer.getvalue()[:max_chars]
+
+
+def parse_subtitles(content, ext, with_timestamps=TRANSCRIPT_TIMESTAMPS, max_chars=TRANSCRIPT_MAX_CHARS):
+    """Convertit un fichier de sous-titres (texte brut) en transcription lisible"""
+    if ext == 'json3':
+        cues = parse_json3(content)
+    else:
+        cues = parse_vtt(io.StringIO(content))
+    return format_transcript(cues, with_timestamps=with_timestamps, max_chars=max_chars)
@@ -0,0 +1,98 @@
+"""
+Panneau de débogage réservé aux administrateurs : cascade des spans des
+dernières requêtes tracées et durée cumulée par étape
+"""
+import os
+import html
+
+import streamlit as st
+
+from utils.tracing import recent_traces, trace_log_path, TRACE_ENABLED, TRACE_FORMAT
+
+# Administrateurs : noms d'utilisateur séparés par des virgules
+TRACE_ADMINS = {name.strip() for name in os.getenv('SIMANDOU_ADMINS', '').split(',') if name.strip()}
+TRACE_PANEL_LIMIT = int(os.getenv('TRACE_PANEL_LIMIT', 10))
+
+
+def _ordered_spans(record):
+    """Spans dans l'ordre de la cascade (parcours en profondeur, enfants par date de début) avec leur profondeur"""
+    children = {}
+    for item in record['spans']:
+        children.setdefault(item['parent_id'], []).append(item)
+
+    ordered = []
+    stack = [(item, 0) for item in sorted(children.get(None, []), key=lambda item: -item['start_ns'])]
+    while stack:
+        item, depth = stack.pop()
+        ordered.append((item, depth))
+        stack.extend((child, depth + 1)
+                     for child in sorted(children.get(item['span_id'], []), key=lambda child: -child['start_ns']))
+    return ordered
+
+
+class TracePanel:
+    @staticmethod
+    def is_admin(username):
+        return bool(username) and username in TRACE_ADMINS
+
+    @staticmethod
+    def _waterfall_html(record):
+        total = max(record['duration_ns'], 1)
+        rows = []
+        for item, depth in _ordered_spans(record):
+            duration = item.get('duration_ns', 0)
+            left = 100 * item['start_ns'] / total
+            width = max(100 * duration / total, 0.3)
+            color = '#CE1126' if item['status'] == 'error' else ('#009460' if depth == 0 else '#4c9be8')
+            title = html.escape(", ".join(f"{key}={value}" for key, value in item.get('attributes', {}).items()))
+            rows.append(
+                f'<div style="display:flex;align-items:center;font-size:0.78rem;line-height:1.5" title="{title}">'
+                f'<div style="width:34%;padding-left:{depth * 12}px;white-space:nowrap;overflow:hidden;'
+                f'text-overflow:ellipsis">{html.escape(item["name"])}</div>'
+                f'<div style="flex:1;position:relative;height:10px;background:#f0f0f0">'
+                f'<div style="position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:100%;'
+                f'background:{color}"></div></div>'
+                f'<div style="width:80px;text-align:right">{duration / 1e6:.1f} ms</div></div>'
+            )
+        return "".join(rows)
+
+    @staticmethod
+    def _stage_totals(traces):
+        """Durée moyenne et maximale de chaque étape sur les requêtes affichées"""
+        totals = {}
+        for record in traces:
+            for item in record['spans'][1:]:
+                durations = totals.setdefault(item['name'], [])
+                durations.append(item.get('duration_ns', 0) / 1e6)
+        return sorted(
+            ({'étape': name, 'appels': len(durations), 'moyenne (ms)': round(sum(durations) / len(durations), 2),
+              'max (ms)': round(max(durations), 2), 'total (ms)': round(sum(durations), 1)}
+             for name, durations in totals.items()),
+            key=lambda row: -row['total (ms)']
+        )
+
+    @staticmethod
+    def render(limit=TRACE_PANEL_LIMIT):
+        """Affiche la cascade des dernières requêtes tracées"""
+        st.subheader("🛠️ Traces des requêtes")
+        if not TRACE_ENABLED:
+            st.info("Traces désactivées (TRACE_ENABLED=false).")
+            return
+
+        st.caption(f"Journal : `{trace_log_path()}` (format {TRACE_FORMAT})")
+        traces = recent_traces(limit)
+        if not traces:
+            st.info("Aucune requête tracée depuis le démarrage du serveur.")
+            return
+
+        with st.expander("Durée par étape", expanded=False):
+            st.dataframe(TracePanel._stage_totals(traces), use_container_width=True, hide_index=True)
+
+        for record in traces:
+            failed = any(item['status'] == 'error' for item in record['spans'])
+            user = record['attributes'].get('user')
+            label = (f"{'❌' if failed else '✅'} {record['name']} · {record['duration_ns'] / 1e6:.0f} ms · "
+                     f"{record['start'][11:19]}" + (f" · {user}" if user else ""))
+            with st.expander(label):
+                st.markdown(TracePanel._waterfall_html(record), unsafe_allow_html=True)
+                st.caption(f"trace_id : `{record['trace_id']}` · {len(record['spans'])} spans")
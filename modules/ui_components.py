@@ -1,8 +1,9 @@
 import streamlit as st
 from datetime import datetime
-from modules.file_processing import FileProcessor
-from modules.media_extraction import MediaExtractor
-import google.generativeai as genai
+from streamlit.errors import StreamlitAPIException
+from modules.crawler import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES
+from modules.workspace import STATUS_LABELS
+from modules.session_events import SessionEvents, DOCUMENTS_CHANGED, ACCOUNT_CHANGED, QUOTA_CHANGED
 
 
 def render_sidebar(auth_manager, chat_handler=None, request_counter=None):
@@ -100,7 +101,7 @@ def _render_logged_in_sidebar(auth_manager, chat_handler, request_counter):
 
     # Afficher le compteur de requêtes
     if request_counter:
-        request_counter.display_counter(st.session_state.username, position="sidebar")
+        _render_request_counter(request_counter)
 
     # Bouton nouvelle discussion
     if st.button("➕ Nouvelle conversation", use_container_width=True):
@@ -110,10 +111,7 @@ def _render_logged_in_sidebar(auth_manager, chat_handler, request_counter):
 
     # Importation de données
     st.subheader("📂 Importer des données")
-    _render_data_import_section()
-
-    # Document actif
-    _render_active_document()
+    _render_workspace_section(chat_handler.workspace)
 
     # Section Premium
     _render_premium_section(auth_manager.db)
@@ -123,6 +121,35 @@ def _render_logged_in_sidebar(auth_manager, chat_handler, request_counter):
         auth_manager.logout()
 
 
+# Chaque section est un fragment : une interaction ne réexécute que sa section,
+# et les données lues en base sont conservées jusqu'à l'événement qui les invalide
+
+@st.fragment
+def _render_request_counter(request_counter):
+    """Compteur de requêtes (relu après QUOTA_CHANGED)"""
+    request_counter.display_counter(st.session_state.username, position="inline")
+
+
+@st.fragment
+def _render_workspace_section(workspace):
+    """Import de données et documents actifs"""
+    workspace.load(st.session_state.username)
+    _render_data_import_section(workspace)
+
+    # Documents actifs
+    _render_active_documents(workspace)
+
+
+def _documents_changed():
+    """Un document a été rattaché ou détaché : seule la section de l'espace de travail est redessinée"""
+    SessionEvents.emit(DOCUMENTS_CHANGED)
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # Section exécutée dans une réexécution complète de la page
+        st.rerun()
+
+
 def _render_chat_archives(chat_handler):
     """Affiche les archives de chat"""
     if st.session_state.username:
@@ -149,26 +176,24 @@ def _render_chat_archives(chat_handler):
         st.info("Chargement des archives...")
 
 
-def _render_data_import_section():
+def _render_data_import_section(workspace):
     """Affiche la section d'importation de données"""
     tab_local, tab_media_link, tab_webpage = st.tabs(["📤 Fichier", "🎬 Sources", "📄 Page Web"])
+    username = st.session_state.username
 
     with tab_local:
-        uploaded_file = st.file_uploader(
-            "Choisir un fichier",
+        uploaded_files = st.file_uploader(
+            "Choisir des fichiers",
             type=['pdf', 'jpg', 'jpeg', 'png', 'gif', 'bmp', 'mp4', 'avi', 'mov', 'mkv',
                   'mp3', 'wav', 'ogg', 'txt', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx'],
+            accept_multiple_files=True,
             label_visibility="collapsed"
         )
-        if uploaded_file:
-            if st.button("🧠 Analyser le fichier", use_container_width=True, key="btn_analyze_file"):
-                with st.spinner("Traitement du fichier..."):
-                    processor = FileProcessor()
-                    result = processor.process_uploaded_file(uploaded_file)
-                    if result:
-                        st.session_state.current_file = result
-                        st.toast(f"✅ Fichier analysé: {uploaded_file.name}", icon="✅")
-                        st.rerun()
+        if uploaded_files:
+            if st.button("🧠 Analyser les fichiers", use_container_width=True, key="btn_analyze_file"):
+                sources = [workspace.file_source(uploaded_file) for uploaded_file in uploaded_files]
+                if workspace.ingest(username, sources):
+                    _documents_changed()
 
     with tab_media_link:
         st.info("Importez du contenu depuis YouTube ou des liens directs")
@@ -180,41 +205,63 @@ def _render_data_import_section():
         )
 
         if url_input:
-            col1, col2 = st.columns(2)
-            extractor = MediaExtractor()
+            col1, col2, col3 = st.columns(3)
 
             with col1:
                 if st.button("🎬 Analyser YouTube", use_container_width=True, key="btn_youtube"):
-                    with st.spinner("Traitement..."):
-                        if 'youtube.com' in url_input or 'youtu.be' in url_input:
-                            path, name, mime_type = extractor.extract_youtube_transcript(url_input)
-
-                            if path:
-                                processor = FileProcessor()
-                                ref = processor.upload_to_gemini(path, name, mime_type_hint=mime_type)
-                                if ref:
-                                    st.session_state.current_file = ref
-                                    st.toast(f"✅ YouTube analysé: {name}", icon="✅")
-                                    st.rerun()
-                            else:
-                                st.error("Impossible d'analyser cette vidéo.")
-                        else:
-                            st.error("URL YouTube invalide.")
+                    if 'youtube.com' in url_input or 'youtu.be' in url_input:
+                        processed = workspace.ingest(username, [workspace.url_source(url_input, 'youtube')])
+                        if any(document['status'] == 'ready' for document in processed):
+                            _documents_changed()
+                        elif processed:
+                            st.error("Impossible d'analyser cette vidéo.")
+                    else:
+                        st.error("URL YouTube invalide.")
 
             with col2:
                 if st.button("🔗 Analyser lien", use_container_width=True, key="btn_direct"):
-                    with st.spinner("Téléchargement..."):
-                        path, name, mime_type = extractor.download_file_from_url(url_input)
-
-                        if path:
-                            processor = FileProcessor()
-                            ref = processor.upload_to_gemini(path, name, mime_type_hint=mime_type)
-                            if ref:
-                                st.session_state.current_file = ref
-                                st.toast(f"✅ Fichier analysé: {name}", icon="✅")
-                                st.rerun()
-                        else:
-                            st.error("Impossible de télécharger.")
+                    processed = workspace.ingest(username, [workspace.url_source(url_input, 'url')])
+                    if any(document['status'] == 'ready' for document in processed):
+                        _documents_changed()
+                    elif processed:
+                        st.error("Impossible de télécharger.")
+
+            with col3:
+                if st.button("🎧 Audio YouTube", use_container_width=True, key="btn_youtube_audio",
+                             help="Transcrit l'audio lorsque la vidéo n'a pas de sous-titres"):
+                    if 'youtube.com' in url_input or 'youtu.be' in url_input:
+                        processed = workspace.ingest(username, [workspace.url_source(url_input, 'youtube_audio')])
+                        if any(document['status'] == 'ready' for document in processed):
+                            _documents_changed()
+                        elif processed:
+                            st.error("Impossible de récupérer l'audio.")
+                    else:
+                        st.error("URL YouTube invalide.")
+
+        with st.expander("📋 Import par lot"):
+            batch_text = st.text_area(
+                "Une URL par ligne",
+                placeholder="https://www.youtube.com/...\nhttps://exemple.com/rapport.pdf\nhttps://exemple.com/article",
+                key="input_batch_urls"
+            )
+            batch_file = st.file_uploader("Ou une liste d'URL (.txt, .csv)", type=['txt', 'csv'],
+                                          key="input_batch_file")
+
+            if st.button("📥 Importer les liens", use_container_width=True, key="btn_batch_urls"):
+                text = batch_text or ''
+                if batch_file is not None:
+                    text += "\n" + batch_file.getvalue().decode('utf-8', errors='replace')
+                urls = workspace.parse_url_list(text)
+
+                if not urls:
+                    st.error("Aucune URL valide.")
+                else:
+                    processed = workspace.ingest_urls(username, urls)
+                    failed = [document for document in processed if document['status'] == 'failed']
+                    for document in failed:
+                        st.warning(f"{document['display_name']} : {document.get('error') or 'échec'}")
+                    if processed and not failed:
+                        _documents_changed()
 
     with tab_webpage:
         st.info("Analysez le contenu d'une page web")
@@ -225,51 +272,68 @@ def _render_data_import_section():
             key="input_web"
         )
 
+        crawl_site = st.toggle("🕸️ Explorer tout le site", key="toggle_crawl_site",
+                               help="Suit les liens du même site (robots.txt et sitemap respectés)")
+        if crawl_site:
+            col1, col2 = st.columns(2)
+            with col1:
+                max_depth = st.number_input("Profondeur", min_value=1, max_value=5,
+                                            value=min(max(CRAWL_MAX_DEPTH, 1), 5), key="crawl_depth")
+            with col2:
+                max_pages = st.number_input("Pages max", min_value=2, max_value=200,
+                                            value=min(max(CRAWL_MAX_PAGES, 2), 200), key="crawl_pages")
+
         if url_input_web:
             if st.button("🔎 Analyser la page", use_container_width=True, key="btn_analyze_webpage"):
-                with st.spinner("Extraction..."):
-                    extractor = MediaExtractor()
-                    path, name, mime_type = extractor.analyze_webpage_content(url_input_web)
-
-                    if path:
-                        processor = FileProcessor()
-                        ref = processor.upload_to_gemini(path, name, mime_type_hint=mime_type)
-
-                        if ref:
-                            st.session_state.current_file = ref
-                            st.toast(f"✅ Contenu extrait: {name}", icon="✅")
-                            st.rerun()
-                    else:
-                        st.error("Impossible d'analyser cette page.")
-
-
-def _render_active_document():
-    """Affiche le document actif"""
-    if st.session_state.current_file:
+                if crawl_site:
+                    source = workspace.url_source(url_input_web, 'site')
+                    source.update({'max_depth': int(max_depth), 'max_pages': int(max_pages)})
+                else:
+                    source = workspace.url_source(url_input_web, 'webpage')
+                processed = workspace.ingest(username, [source])
+                if any(document['status'] == 'ready' for document in processed):
+                    _documents_changed()
+                elif processed:
+                    st.error("Impossible d'analyser cette page.")
+
+
+def _render_active_documents(workspace):
+    """Affiche les documents de l'espace de travail"""
+    documents = workspace.get_documents()
+    if not documents:
+        return
+
+    st.caption(f"📚 **Documents actifs** ({len(documents)})")
+    for document in documents:
         col1, col2 = st.columns([3, 1])
 
         with col1:
-            st.success(f"📄 **Document Actif :** {st.session_state.current_file.display_name}")
+            label = f"{STATUS_LABELS.get(document['status'], document['status'])} · {document['display_name']}"
+            if document['status'] == 'ready':
+                st.success(label)
+            else:
+                st.warning(label)
 
         with col2:
-            if st.button("❌", key="detach_file", use_container_width=True, help="Détacher le fichier"):
-                try:
-                    genai.delete_file(name=st.session_state.current_file.name)
-                except Exception:
-                    pass
-                finally:
-                    st.session_state.current_file = None
-                    st.rerun()
+            if st.button("❌", key=f"detach_{document['key']}", use_container_width=True,
+                         help="Détacher le document"):
+                workspace.remove(st.session_state.username, document['key'])
+                _documents_changed()
 
 
+@st.fragment
 def _render_premium_section(database):
     """Affiche la section premium"""
     st.subheader("🚀 Compte Premium")
 
     if st.session_state.username:
-        user_data = database.get_user(st.session_state.username)
-        account_type = user_data.get('account_type', 'free') if user_data else 'free'
+        username = st.session_state.username
+
+        def _load_account_type():
+            user_data = database.get_user(username)
+            return user_data.get('account_type', 'free') if user_data else 'free'
 
+        account_type = SessionEvents.cached('account_type', (ACCOUNT_CHANGED,), _load_account_type, scope=username)
 
         if account_type == 'free':
             # can_request, max_requests, current_count = database.check_and_update_requests(
@@ -286,6 +350,7 @@ def _render_premium_section(database):
             if st.button("Passer au Premium", key="btn_premium", use_container_width=True):
                 database.update_account_type(st.session_state.username, 'premium')
                 st.session_state.user_stats = database.get_user_stats(st.session_state.username)
+                SessionEvents.emit(ACCOUNT_CHANGED, QUOTA_CHANGED)
                 st.success("✅ Compte mis à jour !")
                 st.rerun()
         else:
@@ -0,0 +1,200 @@
+"""
+Classification des URL (youtube, vidéo, audio, document, image, page web...)
+avec cache borné à durée de vie et reconnaissance du contenu par signature
+"""
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, unquote, parse_qs
+
+from modules.http_client import get_session
+from modules.youtube_cache import YouTubeMetadataCache
+from utils.concurrency import run_with_host_limits
+from utils.metrics import cache_lookup
+
+URL_TYPE_CACHE_SIZE = 1024
+URL_TYPE_TTL = int(os.getenv('URL_TYPE_TTL', 3600))
+URL_TYPE_FAILURE_TTL = 60  # Serveur injoignable : nouvel essai après une minute
+PATTERN_MIN_HITS = 3  # Résultats identiques requis avant de généraliser à un motif d'URL
+SNIFF_BYTES = 2048
+HEAD_TIMEOUT = 5
+YOUTUBE_DOMAINS = ('youtube.com', 'youtu.be')
+
+EXTENSION_TYPES = {
+    'video': ('.mp4', '.avi', '.mov', '.mkv', '.webm'),
+    'audio': ('.mp3', '.wav', '.ogg', '.flac'),
+    'document': ('.pdf', '.doc', '.docx', '.txt', '.rtf'),
+    'image': ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'),
+}
+
+# (décalage, signature, type) des premiers octets d'un fichier
+MAGIC_SIGNATURES = (
+    (0, b'%PDF', 'document'),
+    (0, b'\x89PNG', 'image'),
+    (0, b'\xff\xd8\xff', 'image'),
+    (0, b'GIF8', 'image'),
+    (0, b'BM', 'image'),
+    (8, b'WEBP', 'image'),
+    (8, b'WAVE', 'audio'),
+    (8, b'AVI ', 'video'),
+    (0, b'ID3', 'audio'),
+    (0, b'\xff\xfb', 'audio'),
+    (0, b'\xff\xf3', 'audio'),
+    (0, b'OggS', 'audio'),
+    (0, b'fLaC', 'audio'),
+    (8, b'M4A', 'audio'),
+    (4, b'ftyp', 'video'),
+    (0, b'\x1aE\xdf\xa3', 'video'),
+    (0, b'{\\rtf', 'document'),
+    (0, b'\xd0\xcf\x11\xe0', 'document'),  # Office 97-2003
+    (0, b'PK\x03\x04', 'document'),  # Office Open XML (docx, xlsx, pptx)
+)
+
+_HTML_RE = re.compile(rb'^\s*(<!doctype html|<html|<head|<body)', re.IGNORECASE)
+_DIGITS_RE = re.compile(r'\d+')
+
+_cache = OrderedDict()  # URL ou motif d'URL -> (résultat, expiration)
+_no_head_hosts = set()
+_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        url_type, expires_at = entry
+        if time.time() > expires_at:
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return url_type
+
+
+def _cache_put(key, url_type, ttl=URL_TYPE_TTL):
+    with _lock:
+        _cache[key] = (url_type, time.time() + ttl)
+        _cache.move_to_end(key)
+        while len(_cache) > URL_TYPE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _url_pattern(parsed):
+    """Motif d'URL d'un site : chemin aux nombres masqués et noms des paramètres (ex. /media/#?id)"""
+    keys = ','.join(sorted(parse_qs(parsed.query, keep_blank_values=True)))
+    return f"{parsed.netloc.lower()}{_DIGITS_RE.sub('#', parsed.path)}?{keys}"
+
+
+def _type_from_content_type(content_type):
+    """Type déduit de l'en-tête Content-Type, None s'il n'est pas concluant"""
+    content_type = content_type.split(';')[0].strip().lower()
+    if content_type in ('text/html', 'application/xhtml+xml'):
+        return 'webpage'
+    if content_type.startswith('image/'):
+        return 'image'
+    if content_type.startswith('video/'):
+        return 'video'
+    if content_type.startswith('audio/'):
+        return 'audio'
+    if content_type == 'application/pdf':
+        return 'document'
+    return None
+
+
+def sniff_content(data):
+    """Type reconnu à partir des premiers octets (signatures de fichiers), None sinon"""
+    for offset, signature, url_type in MAGIC_SIGNATURES:
+        if data[offset:offset + len(signature)] == signature:
+            return url_type
+    if _HTML_RE.match(data):
+        return 'webpage'
+    return None
+
+
+class UrlClassifier:
+    @staticmethod
+    def classify_static(url):
+        """Classement sans réseau (hôte YouTube, extension du chemin), None si indéterminé"""
+        parsed = urlparse(url.strip())
+        host = (parsed.hostname or '').lower()
+        if YouTubeMetadataCache.video_id(url) or any(
+                host == domain or host.endswith('.' + domain) for domain in YOUTUBE_DOMAINS):
+            return 'youtube'
+
+        # L'extension est lue sur le chemin seul (la requête et le fragment sont ignorés)
+        path = unquote(parsed.path).lower()
+        for url_type, extensions in EXTENSION_TYPES.items():
+            if path.endswith(extensions):
+                return url_type
+        return None
+
+    @staticmethod
+    def _probe(url, host):
+        """Interroge le serveur : HEAD, puis GET partiel avec lecture des premiers octets"""
+        session = get_session()
+
+        if host not in _no_head_hosts:
+            try:
+                response = session.head(url, timeout=HEAD_TIMEOUT, allow_redirects=True)
+                if response.status_code in (405, 501):
+                    # Serveur sans HEAD : on passe directement au GET partiel la prochaine fois
+                    with _lock:
+                        _no_head_hosts.add(host)
+                elif response.status_code < 400:
+                    url_type = _type_from_content_type(response.headers.get('content-type', ''))
+                    if url_type:
+                        return url_type
+            except Exception:
+                pass
+
+        try:
+            with session.get(url, timeout=HEAD_TIMEOUT, stream=True, allow_redirects=True,
+                             headers={'Range': f"bytes=0-{SNIFF_BYTES - 1}"}) as response:
+                if response.status_code >= 400:
+                    return None
+                head = response.raw.read(SNIFF_BYTES, decode_content=True)
+                return (sniff_content(head)
+                        or _type_from_content_type(response.headers.get('content-type', ''))
+                        or 'unknown')
+        except Exception:
+            return None
+
+    @staticmethod
+    def classify(url):
+        """Détermine le type d'une URL (résultats mémorisés par URL et par motif d'URL)"""
+        static_type = UrlClassifier.classify_static(url)
+        if static_type:
+            return static_type
+
+        cached = _cache_get(url)
+        if cache_lookup('url_type', bool(cached)):
+            return cached
+
+        parsed = urlparse(url.strip())
+        pattern_key = f"pattern:{_url_pattern(parsed)}"
+        pattern_type, hits = _cache_get(pattern_key) or (None, 0)
+        if cache_lookup('url_pattern', hits >= PATTERN_MIN_HITS):
+            return pattern_type
+
+        url_type = UrlClassifier._probe(url, parsed.netloc.lower())
+        if url_type is None:
+            # Par défaut, considère comme page web
+            _cache_put(url, 'webpage', ttl=URL_TYPE_FAILURE_TTL)
+            return 'webpage'
+
+        _cache_put(url, url_type)
+        previous_type, hits = _cache_get(pattern_key) or (None, 0)
+        _cache_put(pattern_key, (url_type, hits + 1 if previous_type == url_type else 1))
+        return url_type
+
+    @staticmethod
+    def classify_many(urls, max_workers=8, per_host=2):
+        """Classe plusieurs URL en parallèle (limite par site) ; retourne {url: type}"""
+        types = {}
+        for url, url_type, error in run_with_host_limits(
+                urls, UrlClassifier.classify, lambda url: urlparse(url).netloc.lower(),
+                max_workers=max_workers, per_host=per_host):
+            types[url] = url_type if error is None else 'webpage'
+        return types
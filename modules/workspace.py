@@ -0,0 +1,365 @@
+"""
+Espace de travail multi-documents d'une conversation (ingestion parallèle)
+"""
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+import google.generativeai as genai
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from modules.file_processing import FileProcessor
+from modules.audio_pipeline import TranscriptionBudget
+from modules.file_state import FileStateCache
+from modules.progress import show
+from modules.session_events import SessionEvents, QUOTA_CHANGED
+from modules.crawler import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES
+from modules.media_extraction import MediaExtractor
+from modules.url_classifier import UrlClassifier
+from utils.concurrency import run_with_host_limits
+from utils.tracing import trace, span, bind_current_span
+
+INGESTION_MAX_WORKERS = int(os.getenv('INGESTION_MAX_WORKERS', 4))
+INGESTION_PER_HOST = int(os.getenv('INGESTION_PER_HOST', 2))  # Requêtes simultanées par site
+BATCH_MAX_URLS = 100
+
+# Type détecté par MediaExtractor.get_url_type -> type de source d'ingestion
+URL_SOURCE_TYPES = {'youtube': 'youtube', 'webpage': 'webpage'}
+
+STATUS_LABELS = {
+    'pending': '⏳ En attente',
+    'processing': '⚙️ Traitement',
+    'ready': '✅ Prêt',
+    'failed': '❌ Échec',
+    'expired': '⌛ Expiré'
+}
+
+
+def _discard_progress(message, level='write'):
+    """Rappel d'avancement sans affichage (ingestion hors de la page)"""
+
+
+def _source_host(source):
+    """Site d'origine d'une source (les fichiers locaux partagent une même file)"""
+    if source['source_type'] == 'file':
+        return 'local'
+    return urlparse(source['source']).netloc.lower()
+
+
+class DocumentWorkspace:
+    def __init__(self, database, model_manager=None):
+        self.db = database
+        self.model_manager = model_manager
+
+    # === ÉTAT DE SESSION ===
+
+    def _documents(self):
+        """Documents de la conversation active (clé de déduplication -> document)"""
+        if 'workspace_documents' not in st.session_state:
+            st.session_state.workspace_documents = {}
+        return st.session_state.workspace_documents
+
+    def _files(self):
+        """Références des fichiers distants (nom distant -> fichier Gemini)"""
+        if 'workspace_files' not in st.session_state:
+            st.session_state.workspace_files = {}
+        return st.session_state.workspace_files
+
+    def get_documents(self):
+        """Retourne la liste des documents de la conversation active"""
+        return list(self._documents().values())
+
+    def get_ready_files(self):
+        """Retourne les fichiers distants prêts à être envoyés au modèle"""
+        files = self._files()
+        ready = []
+        for document in self._documents().values():
+            if document['status'] == 'ready' and document.get('remote_name') in files:
+                ready.append(files[document['remote_name']])
+        return ready
+
+    @staticmethod
+    def _conversation_key():
+        """Conversation affichée : l'archive consultée, sinon la conversation active"""
+        archive_id = st.session_state.get('viewing_archive_id')
+        return f"archive:{archive_id}" if archive_id is not None else 'active'
+
+    def load(self, username):
+        """Restaure les documents persistés de la conversation affichée (une fois par conversation)"""
+        conversation_key = self._conversation_key()
+        if st.session_state.get('workspace_loaded_for') == (username, conversation_key):
+            return
+
+        documents = self._documents()
+        files = self._files()
+        documents.clear()
+        files.clear()
+
+        if hasattr(self.db, 'get_conversation_documents'):
+            for document in self.db.get_conversation_documents(username, conversation_key):
+                documents[document['key']] = document
+                if document['status'] in ('ready', 'expired') and document.get('remote_name'):
+                    try:
+                        gemini_file = genai.get_file(document['remote_name'])
+                        FileStateCache.record(gemini_file)
+                        files[gemini_file.name] = gemini_file
+                        document['status'] = 'ready'
+                    except Exception:
+                        # Fichier distant expiré : ré-envoi depuis la copie locale si possible
+                        self.refresh_file(username, document['remote_name'])
+
+        st.session_state.workspace_loaded_for = (username, conversation_key)
+        self._sync_current_file()
+
+    def reset(self):
+        """Vide l'espace de travail de la session (sans supprimer les fichiers distants)"""
+        self._documents().clear()
+        self._files().clear()
+        st.session_state.pop('workspace_loaded_for', None)
+        st.session_state.current_file = None
+
+    def remove(self, username, key):
+        """Détache un document de la conversation active"""
+        document = self._documents().pop(key, None)
+        if not document:
+            return
+
+        remote_name = document.get('remote_name')
+        if remote_name:
+            self._files().pop(remote_name, None)
+            st.session_state.get('document_indexes', {}).pop(remote_name, None)
+            FileStateCache.forget(remote_name)
+            try:
+                genai.delete_file(name=remote_name)
+            except Exception:
+                pass
+
+        if hasattr(self.db, 'delete_conversation_document'):
+            self.db.delete_conversation_document(username, key, self._conversation_key())
+        self._sync_current_file()
+
+    def refresh_file(self, username, remote_name):
+        """
+        Remplace un fichier distant expiré par un nouvel envoi de sa copie locale.
+        Retourne le nouveau fichier, ou None si aucune copie n'est disponible.
+        """
+        document = next((item for item in self._documents().values()
+                         if item.get('remote_name') == remote_name), None)
+        local_copy = FileStateCache.get_local_copy(remote_name)
+        gemini_file = FileProcessor.reupload(*local_copy) if local_copy else None
+
+        self._files().pop(remote_name, None)
+
+        if gemini_file:
+            FileStateCache.forget(remote_name)
+            self._files()[gemini_file.name] = gemini_file
+            indexes = st.session_state.get('document_indexes', {})
+            document_index = indexes.pop(remote_name, None)
+            if document_index is not None:
+                indexes[gemini_file.name] = document_index
+        else:
+            # Échec du ré-envoi : l'état (et le lien vers la copie locale) est conservé pour réessayer
+            FileStateCache.mark_for_check(remote_name)
+
+        if document:
+            document['remote_name'] = gemini_file.name if gemini_file else remote_name
+            document['status'] = 'ready' if gemini_file else 'expired'
+            self._persist(username, document)
+
+        self._sync_current_file()
+        return gemini_file
+
+    def _sync_current_file(self):
+        """Le dernier document prêt reste exposé comme document courant"""
+        ready_files = self.get_ready_files()
+        st.session_state.current_file = ready_files[-1] if ready_files else None
+
+    def _persist(self, username, document):
+        if hasattr(self.db, 'save_conversation_document'):
+            self.db.save_conversation_document(username, document, self._conversation_key())
+
+    # === INGESTION ===
+
+    @staticmethod
+    def file_source(uploaded_file):
+        """Décrit un fichier local uploadé comme source d'ingestion"""
+        data = uploaded_file.getvalue()
+        return {
+            'key': f"file:{hashlib.sha256(data).hexdigest()}",
+            'source_type': 'file',
+            'source': uploaded_file.name,
+            'display_name': uploaded_file.name,
+            'mime_type': uploaded_file.type,
+            'data': data
+        }
+
+    @staticmethod
+    def url_source(url, source_type):
+        """Décrit une URL (youtube, youtube_audio, url, webpage, site) comme source d'ingestion"""
+        url = url.strip()
+        return {
+            'key': f"{source_type}:{url}",
+            'source_type': source_type,
+            'source': url,
+            'display_name': url
+        }
+
+    def ingest(self, username, sources):
+        """
+        Ingère plusieurs sources en parallèle (limite globale et par site).
+        Retourne les documents traités (les doublons sont ignorés).
+        """
+        documents = self._documents()
+        pending = []
+
+        for source in sources:
+            existing = documents.get(source['key'])
+            if existing and existing['status'] in ('ready', 'processing'):
+                st.toast(f"Déjà présent : {existing['display_name']}", icon="ℹ️")
+                continue
+            if any(item['key'] == source['key'] for item in pending):
+                continue
+
+            document = {
+                'key': source['key'],
+                'display_name': source['display_name'],
+                'source_type': source['source_type'],
+                'source': source['source'],
+                'remote_name': None,
+                'mime_type': source.get('mime_type'),
+                'status': 'processing',
+                'error': None
+            }
+            documents[source['key']] = document
+            pending.append(source)
+
+        if not pending:
+            return []
+
+        # Les threads du pool partagent le contexte Streamlit de la session
+        ctx = get_script_run_ctx()
+
+        def _attach_context():
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+        # Transcriptions audio par segments : limite RPM du modèle et quota de l'utilisateur
+        budget = TranscriptionBudget(self.model_manager, self.db, username) if self.model_manager else None
+
+        # Les threads du pool n'écrivent pas dans la page : leurs messages sont affichés
+        # avec le résultat de chaque source, depuis le thread du script
+        messages = {source['key']: [] for source in pending}
+
+        processed = []
+        with st.status(f"Ingestion de {len(pending)} document(s)...", expanded=True) as status:
+
+            def _on_result(source, result, error):
+                document = documents[source['key']]
+                gemini_file, display_name, mime_type = result or (None, None, None)
+                if error is not None:
+                    document['error'] = str(error)[:200]
+
+                if gemini_file:
+                    document.update({
+                        'display_name': display_name or document['display_name'],
+                        'remote_name': gemini_file.name,
+                        'mime_type': mime_type,
+                        'status': 'ready',
+                        'error': None
+                    })
+                    self._files()[gemini_file.name] = gemini_file
+                else:
+                    document['status'] = 'failed'
+
+                self._persist(username, document)
+                processed.append(document)
+                st.write(f"{STATUS_LABELS[document['status']]} : {document['display_name']}")
+                for message, level in messages[source['key']]:
+                    show(message, level)
+
+            def _ingest_one(source):
+                def _progress(message, level='write'):
+                    messages[source['key']].append((message, level))
+
+                with span('workspace.source', source_type=source['source_type']):
+                    return self._ingest_source(source, budget, _progress)
+
+            with trace('workspace.ingest', user=username or '', sources=len(pending)):
+                # Les spans des threads du pool sont rattachés à la trace d'ingestion
+                run_with_host_limits(pending, bind_current_span(_ingest_one), _source_host, on_result=_on_result,
+                                     max_workers=INGESTION_MAX_WORKERS, per_host=INGESTION_PER_HOST,
+                                     initializer=_attach_context)
+
+            failed = sum(1 for document in processed if document['status'] == 'failed')
+            status.update(
+                label=f"{len(processed) - failed}/{len(processed)} document(s) prêt(s)",
+                state="error" if failed == len(processed) else "complete",
+                expanded=False
+            )
+
+        if budget is not None and budget.charged:
+            SessionEvents.emit(QUOTA_CHANGED)
+        self._sync_current_file()
+        return processed
+
+    @staticmethod
+    def parse_url_list(text):
+        """Extrait les URL valides d'une liste collée ou d'un fichier (sans doublons, dans l'ordre)"""
+        urls = []
+        for candidate in re.split(r'[\s,;]+', text or ''):
+            candidate = candidate.strip('<>"\'')
+            if MediaExtractor.is_valid_url(candidate) and candidate not in urls:
+                urls.append(candidate)
+        return urls[:BATCH_MAX_URLS]
+
+    @staticmethod
+    def classify_urls(urls):
+        """Détermine en parallèle le type de chaque URL, dans l'ordre donné"""
+        types = UrlClassifier.classify_many(urls, max_workers=INGESTION_MAX_WORKERS, per_host=INGESTION_PER_HOST)
+        return [(url, types[url]) for url in urls]
+
+    def ingest_urls(self, username, urls):
+        """Mode lot : classe les URL puis les ingère ensemble (un statut par URL)"""
+        with st.spinner(f"Analyse de {len(urls)} lien(s)..."):
+            classified = self.classify_urls(urls)
+        sources = [self.url_source(url, URL_SOURCE_TYPES.get(url_type, 'url')) for url, url_type in classified]
+        return self.ingest(username, sources)
+
+    @staticmethod
+    def _ingest_source(source, budget=None, progress=None):
+        """
+        Prépare puis envoie une source (exécuté dans un thread du pool) ; les messages
+        d'avancement sont transmis à progress(message, niveau) au lieu d'être affichés
+        """
+        progress = progress or _discard_progress
+        source_type = source['source_type']
+
+        if source_type == 'file':
+            extension = source['display_name'].split('.')[-1]
+            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{extension}") as tmp_file:
+                tmp_file.write(source['data'])
+                path, name, mime_type = tmp_file.name, source['display_name'], source.get('mime_type')
+        elif source_type == 'youtube':
+            path, name, mime_type = MediaExtractor.extract_youtube_transcript(source['source'], progress)
+        elif source_type == 'youtube_audio':
+            path, name, mime_type = MediaExtractor.download_youtube_audio(source['source'], budget, progress)
+        elif source_type == 'webpage':
+            path, name, mime_type = MediaExtractor.analyze_webpage_content(source['source'], progress)
+        elif source_type == 'site':
+            path, name, mime_type = MediaExtractor.crawl_website(
+                source['source'],
+                max_depth=source.get('max_depth', CRAWL_MAX_DEPTH),
+                max_pages=source.get('max_pages', CRAWL_MAX_PAGES),
+                progress=progress
+            )
+        else:
+            path, name, mime_type = MediaExtractor.download_file_from_url(source['source'], progress)
+
+        if not path:
+            return None, None, None
+
+        gemini_file = FileProcessor.upload_to_gemini(path, name, mime_type_hint=mime_type, progress=progress)
+        return gemini_file, name, mime_type
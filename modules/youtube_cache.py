@@ -0,0 +1,125 @@
+"""
+Cache persistant des métadonnées YouTube (yt-dlp) par identifiant de vidéo :
+informations utiles, pistes de sous-titres et transcription finale
+"""
+import os
+import re
+import time
+from urllib.parse import urlparse, parse_qs
+
+from modules.subtitles import SUBTITLE_FORMATS
+from utils.cache import get_cache_path, read_json_cache, write_json_cache, evict_lru
+
+YOUTUBE_CACHE_NAMESPACE = 'youtube'
+YOUTUBE_CACHE_TTL = int(os.getenv('YOUTUBE_CACHE_TTL', 7 * 24 * 3600))
+YOUTUBE_CACHE_MAX_BYTES = int(os.getenv('YOUTUBE_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+SUBTITLE_URL_TTL = 3 * 3600  # Les URL signées des sous-titres expirent après quelques heures
+EMPTY_TRANSCRIPT_TTL = int(os.getenv('YOUTUBE_EMPTY_TRANSCRIPT_TTL', 3600))  # Sous-titres parfois ajoutés plus tard
+
+INFO_FIELDS = ('id', 'title', 'duration', 'channel', 'view_count', 'description', 'upload_date')
+SUBTITLE_LANGS = ('fr', 'en', 'auto')
+
+_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+                  'youtube-nocookie.com', 'www.youtube-nocookie.com')
+
+
+class YouTubeMetadataCache:
+    @staticmethod
+    def video_id(url):
+        """Identifiant canonique d'une vidéo (watch, youtu.be, shorts, embed, live), None sinon"""
+        try:
+            parsed = urlparse(url.strip())
+        except (AttributeError, ValueError):
+            return None
+
+        host = (parsed.hostname or '').lower()
+        path_parts = [part for part in parsed.path.split('/') if part]
+        candidate = None
+
+        if host in ('youtu.be', 'www.youtu.be') and path_parts:
+            candidate = path_parts[0]
+        elif host in _YOUTUBE_HOSTS:
+            if path_parts[:1] == ['watch']:
+                candidate = parse_qs(parsed.query).get('v', [None])[0]
+            elif len(path_parts) >= 2 and path_parts[0] in ('shorts', 'embed', 'live', 'v'):
+                candidate = path_parts[1]
+
+        return candidate if candidate and _VIDEO_ID_RE.match(candidate) else None
+
+    @staticmethod
+    def get(video_id):
+        """Retourne l'entrée en cache si elle n'a pas expiré"""
+        if not video_id:
+            return None
+        entry = read_json_cache(YOUTUBE_CACHE_NAMESPACE, video_id)
+        if not entry or time.time() - entry.get('stored_at', 0) > YOUTUBE_CACHE_TTL:
+            return None
+        # La date de modification sert d'horodatage d'utilisation pour l'éviction
+        try:
+            os.utime(get_cache_path(YOUTUBE_CACHE_NAMESPACE, video_id, '.json'), None)
+        except OSError:
+            pass
+        return entry
+
+    @staticmethod
+    def get_info(video_id):
+        """Informations en cache utilisables pour extraire les sous-titres (URL encore valides)"""
+        entry = YouTubeMetadataCache.get(video_id)
+        if entry and time.time() - entry.get('info_stored_at', 0) < SUBTITLE_URL_TTL:
+            return entry['info']
+        return None
+
+    @staticmethod
+    def get_transcript(video_id):
+        """
+        (info, transcription) en cache, None sinon ; une transcription vide (aucune
+        piste exploitable) n'est réutilisée que pendant EMPTY_TRANSCRIPT_TTL
+        """
+        entry = YouTubeMetadataCache.get(video_id)
+        if not entry or 'transcript' not in entry:
+            return None
+        if not entry['transcript'] and time.time() - entry.get('transcript_stored_at', 0) > EMPTY_TRANSCRIPT_TTL:
+            return None
+        return entry['info'], entry['transcript']
+
+    @staticmethod
+    def _save(video_id, entry):
+        if not video_id:
+            return
+        try:
+            write_json_cache(YOUTUBE_CACHE_NAMESPACE, video_id, entry)
+            evict_lru(YOUTUBE_CACHE_NAMESPACE, YOUTUBE_CACHE_MAX_BYTES)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _subtitle_tracks(tracks):
+        """Ne garde que les langues et formats exploités par l'extraction"""
+        return {
+            lang: [{'ext': sub['ext'], 'url': sub['url']} for sub in tracks.get(lang, [])
+                   if sub.get('ext') in SUBTITLE_FORMATS and sub.get('url')]
+            for lang in SUBTITLE_LANGS if lang in tracks
+        }
+
+    @staticmethod
+    def store_info(video_id, info):
+        """Enregistre le sous-ensemble utile d'un résultat yt-dlp et le retourne"""
+        subset = {field: info.get(field) for field in INFO_FIELDS}
+        subset['subtitles'] = YouTubeMetadataCache._subtitle_tracks(info.get('subtitles') or {})
+        subset['automatic_captions'] = YouTubeMetadataCache._subtitle_tracks(info.get('automatic_captions') or {})
+
+        now = time.time()
+        entry = YouTubeMetadataCache.get(video_id) or {'video_id': video_id}
+        entry.update({'info': subset, 'info_stored_at': now, 'stored_at': now})
+        YouTubeMetadataCache._save(video_id, entry)
+        return subset
+
+    @staticmethod
+    def store_transcript(video_id, info, transcript):
+        """Enregistre la transcription finale (chaîne vide : aucune piste exploitable)"""
+        entry = YouTubeMetadataCache.get(video_id) or {
+            'video_id': video_id, 'info': info, 'info_stored_at': 0, 'stored_at': time.time()
+        }
+        entry.update({'transcript': transcript, 'transcript_stored_at': time.time()})
+        YouTubeMetadataCache._save(video_id, entry)
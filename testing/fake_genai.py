@@ -0,0 +1,355 @@
+"""
+Faux module google.generativeai, local et déterministe, pour les tests et les benchmarks de bout en bout
+
+Reproduit la partie de l'API utilisée par l'application (configure,
+GenerativeModel, start_chat/send_message, generate_content, upload_file,
+get_file, delete_file, protos) avec :
+- une latence configurable (fixe, gigue déterministe, délai par morceau en flux,
+  débit montant des envois de fichiers) ;
+- des réponses en flux (stream=True : itération par morceaux puis resolve()) ;
+- des erreurs injectées (quota, sécurité, serveur) selon un taux et une graine ;
+- des états de traitement des fichiers (PROCESSING pendant N lectures, puis
+  ACTIVE ou FAILED).
+Les réponses ne dépendent que du prompt : deux exécutions identiques produisent
+les mêmes textes, les mêmes erreurs et les mêmes noms de fichiers.
+
+Usage : from testing import fake_genai ; fake_genai.install(latency_ms=20)
+        avant l'import des modules de l'application
+"""
+import os
+import sys
+import time
+import types
+import random
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+FAKE_GENAI_SETTINGS = {
+    'latency_ms': float(os.getenv('FAKE_GENAI_LATENCY_MS', 20)),  # Délai avant la réponse (ou le 1er morceau)
+    'jitter_ms': float(os.getenv('FAKE_GENAI_JITTER_MS', 5)),  # Gigue ajoutée, déterminée par le prompt
+    'stream_chunks': int(os.getenv('FAKE_GENAI_STREAM_CHUNKS', 4)),
+    'stream_chunk_ms': float(os.getenv('FAKE_GENAI_STREAM_CHUNK_MS', 5)),
+    'response_words': int(os.getenv('FAKE_GENAI_RESPONSE_WORDS', 120)),
+    'error_rate': float(os.getenv('FAKE_GENAI_ERROR_RATE', 0)),
+    'error_kinds': ('quota', 'safety', 'server'),
+    'upload_ms': float(os.getenv('FAKE_GENAI_UPLOAD_MS', 10)),
+    'upload_mbps': float(os.getenv('FAKE_GENAI_UPLOAD_MBPS', 0)),  # Débit montant simulé (0 : illimité)
+    'processing_polls': int(os.getenv('FAKE_GENAI_PROCESSING_POLLS', 0)),  # Lectures en PROCESSING
+    'upload_failure_rate': float(os.getenv('FAKE_GENAI_UPLOAD_FAILURE_RATE', 0)),
+    'seed': int(os.getenv('FAKE_GENAI_SEED', 7)),
+}
+FILE_TTL = timedelta(hours=48)
+
+WORDS = ("Simandou gisement minerai fer bauxite transport port rail concession état investissement "
+         "communauté emploi environnement rapport production tonnes capacité étude Guinée analyse "
+         "document synthèse contrat partenaire infrastructure calendrier").split()
+
+_settings = dict(FAKE_GENAI_SETTINGS)
+_rng = random.Random(_settings['seed'])
+_files = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+class FakeAPIError(Exception):
+    """Erreur simulée de l'API (le message reprend celui de l'API réelle)"""
+    MESSAGES = {
+        'quota': "429 Resource has been exhausted (e.g. check quota).",
+        'safety': "Response was blocked: finish_reason SAFETY",
+        'server': "500 An internal error has occurred.",
+        'not_found': "404 File not found.",
+    }
+
+    def __init__(self, kind):
+        super().__init__(self.MESSAGES.get(kind, kind))
+        self.kind = kind
+
+
+def configure_fake(**settings):
+    """Modifie les réglages du faux backend (latence, erreurs, états de traitement...)"""
+    unknown = set(settings) - set(FAKE_GENAI_SETTINGS)
+    if unknown:
+        raise ValueError(f"Réglages inconnus : {', '.join(sorted(unknown))}")
+    with _lock:
+        _settings.update(settings)
+        if 'seed' in settings:
+            _rng.seed(settings['seed'])
+
+
+def reset():
+    """Réglages par défaut, fichiers et compteurs vidés"""
+    with _lock:
+        _settings.clear()
+        _settings.update(FAKE_GENAI_SETTINGS)
+        _rng.seed(_settings['seed'])
+        _files.clear()
+        _stats.clear()
+
+
+def stats():
+    """Compteurs d'appels (generate, stream, upload, errors...)"""
+    with _lock:
+        return dict(_stats)
+
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] = _stats.get(name, 0) + amount
+
+
+def _draw(rate):
+    """Tirage déterministe (séquence fixée par la graine)"""
+    if rate <= 0:
+        return False
+    with _lock:
+        return _rng.random() < rate
+
+
+def _digest(text):
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8', errors='replace')).digest()[:8], 'big')
+
+
+# === CONTENUS ===
+
+class FileData:
+    def __init__(self, file_uri='', mime_type=''):
+        self.file_uri = file_uri
+        self.mime_type = mime_type
+
+
+class Part:
+    def __init__(self, text=None, file_data=None):
+        self.text = text
+        self.file_data = file_data or FileData()
+
+
+class Content:
+    def __init__(self, role='user', parts=None):
+        self.role = role
+        self.parts = list(parts or [])
+
+
+protos = types.SimpleNamespace(Content=Content, Part=Part, FileData=FileData)
+
+
+def _to_part(item):
+    if isinstance(item, Part):
+        return item
+    if isinstance(item, File):
+        return Part(file_data=FileData(item.uri, item.mime_type))
+    return Part(text=str(item))
+
+
+def _to_content(contents, role='user'):
+    if isinstance(contents, Content):
+        return contents
+    items = contents if isinstance(contents, (list, tuple)) else [contents]
+    return Content(role, [_to_part(item) for item in items])
+
+
+def _text_of(item):
+    """Texte d'un message, quelle que soit sa forme (chaîne, dict, objet à parts)"""
+    if item is None:
+        return ''
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        return " ".join(_text_of(part) for part in item.get('parts', [])) or str(item.get('text', ''))
+    if isinstance(item, (list, tuple)):
+        return " ".join(_text_of(part) for part in item)
+    parts = getattr(item, 'parts', None)
+    if parts is not None:
+        return " ".join(_text_of(part) for part in parts)
+    text = getattr(item, 'text', None)
+    return text if isinstance(text, str) else ''
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# === RÉPONSES ===
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+        self.parts = [Part(text=text)]
+
+
+class GenerateContentResponse:
+    """Réponse complète, ou en flux : itérer sur les morceaux (ou appeler resolve()) avant .text"""
+
+    def __init__(self, chunks, prompt_tokens, stream=False):
+        self._chunks = chunks
+        self._stream = stream
+        self._done = not stream
+        text = "".join(chunks)
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=_estimate_tokens(text),
+            total_token_count=prompt_tokens + _estimate_tokens(text)
+        )
+        self.candidates = [types.SimpleNamespace(content=Content('model', [Part(text=text)]), finish_reason='STOP')]
+        self.prompt_feedback = None
+
+    def __iter__(self):
+        for position, chunk in enumerate(self._chunks):
+            if self._stream and position:
+                time.sleep(_settings['stream_chunk_ms'] / 1000)
+            yield _Chunk(chunk)
+        self._done = True
+
+    def resolve(self):
+        for _ in self:
+            pass
+
+    @property
+    def text(self):
+        if not self._done:
+            raise ValueError("Réponse en flux non terminée : itérer ou appeler resolve() avant .text")
+        return "".join(self._chunks)
+
+    @property
+    def parts(self):
+        return self.candidates[0].content.parts
+
+
+def _generate(model_name, prompt_text, stream):
+    """Réponse déterministe au prompt, après la latence configurée ; erreur injectée selon le taux"""
+    _count('stream' if stream else 'generate')
+    digest = _digest(f"{model_name}\n{prompt_text}")
+    time.sleep((_settings['latency_ms'] + _settings['jitter_ms'] * (digest % 1000) / 1000) / 1000)
+
+    if _draw(_settings['error_rate']):
+        kinds = _settings['error_kinds']
+        kind = kinds[digest % len(kinds)]
+        _count('errors')
+        _count(f"errors_{kind}")
+        raise FakeAPIError(kind)
+
+    words = random.Random(digest)
+    text = " ".join(words.choice(WORDS) for _ in range(_settings['response_words']))
+    answer = f"Réponse simulée ({model_name}) : {text}."
+    chunk_count = max(1, _settings['stream_chunks']) if stream else 1
+    size = -(-len(answer) // chunk_count)
+    chunks = [answer[start:start + size] for start in range(0, len(answer), size)]
+    return GenerateContentResponse(chunks, _estimate_tokens(prompt_text), stream)
+
+
+class ChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        """Envoie un message : l'historique n'est complété qu'en cas de succès"""
+        message = _to_content(content)
+        prompt_text = "\n".join(_text_of(item) for item in self.history + [message])
+        response = _generate(self.model.model_name, prompt_text, stream)
+        self.history.extend([message, Content('model', [Part(text="".join(response._chunks))])])
+        return response
+
+
+class GenerativeModel:
+    def __init__(self, model_name='gemini-2.5-flash', **kwargs):
+        self.model_name = model_name
+        self._kwargs = kwargs
+
+    def start_chat(self, history=None, **kwargs):
+        return ChatSession(self, history)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        return _generate(self.model_name, _text_of(contents), stream)
+
+    def count_tokens(self, contents):
+        return types.SimpleNamespace(total_tokens=_estimate_tokens(_text_of(contents)))
+
+
+def configure(api_key=None, **kwargs):
+    _count('configure')
+
+
+# === FICHIERS ===
+
+class File:
+    def __init__(self, name, display_name, mime_type, size_bytes, state, create_time):
+        self.name = name
+        self.display_name = display_name
+        self.mime_type = mime_type
+        self.size_bytes = size_bytes
+        self.uri = f"https://generativelanguage.googleapis.com/v1beta/{name}"
+        self.state = types.SimpleNamespace(name=state)
+        self.create_time = create_time
+        self.update_time = create_time
+        self.expiration_time = create_time + FILE_TTL
+
+
+def _snapshot(name):
+    entry = _files[name]
+    if entry['polls_left'] > 0:
+        state = 'PROCESSING'
+    else:
+        state = entry['final_state']
+    return File(name, entry['display_name'], entry['mime_type'], entry['size_bytes'], state, entry['create_time'])
+
+
+def upload_file(path, display_name=None, mime_type=None, **kwargs):
+    """Envoi simulé : PROCESSING pendant processing_polls lectures, puis ACTIVE ou FAILED"""
+    size_bytes = os.path.getsize(path)
+    transfer_s = size_bytes * 8 / (_settings['upload_mbps'] * 1e6) if _settings['upload_mbps'] else 0
+    time.sleep(_settings['upload_ms'] / 1000 + transfer_s)
+    final_state = 'FAILED' if _draw(_settings['upload_failure_rate']) else 'ACTIVE'
+    with _lock:
+        _stats['upload'] = _stats.get('upload', 0) + 1
+        name = f"files/fake-{_stats['upload']:06d}"
+        _files[name] = {
+            'display_name': display_name or os.path.basename(path),
+            'mime_type': mime_type or 'application/octet-stream',
+            'size_bytes': size_bytes,
+            'polls_left': _settings['processing_polls'],
+            'final_state': final_state,
+            'create_time': datetime.now()
+        }
+        return _snapshot(name)
+
+
+def get_file(name, **kwargs):
+    _count('get_file')
+    with _lock:
+        if name not in _files:
+            raise FakeAPIError('not_found')
+        entry = _files[name]
+        entry['polls_left'] = max(0, entry['polls_left'] - 1)
+        return _snapshot(name)
+
+
+def delete_file(name, **kwargs):
+    _count('delete_file')
+    with _lock:
+        if _files.pop(name, None) is None:
+            raise FakeAPIError('not_found')
+
+
+def list_files(**kwargs):
+    with _lock:
+        return [_snapshot(name) for name in list(_files)]
+
+
+def install(**settings):
+    """
+    Remplace google.generativeai par ce module (à appeler avant l'import des
+    modules de l'application) et applique les réglages donnés
+    """
+    configure_fake(**settings)
+    module = sys.modules[__name__]
+    try:
+        import google
+    except ImportError:
+        google = types.ModuleType('google')
+        google.__path__ = []
+        sys.modules['google'] = google
+    sys.modules['google.generativeai'] = module
+    # « import google.generativeai as genai » lit d'abord l'attribut du paquet google
+    google.generativeai = module
+    return module
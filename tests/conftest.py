@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Cache local propre à chaque test (SIMANDOU_CACHE_DIR)"""
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setenv('SIMANDOU_CACHE_DIR', str(cache_dir))
+    return cache_dir
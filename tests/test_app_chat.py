@@ -0,0 +1,78 @@
+"""
+Tests de l'interface de chat de app.py exécutée par AppTest, avec le faux
+backend Gemini des benchmarks (aucun accès réseau)
+
+Usage : python -m pytest -q tests/test_app_chat.py
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from testing import fake_genai
+from modules.database_sqlite import SQLiteDatabase
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    fake_genai.reset()
+    fake_genai.configure_fake(latency_ms=0, jitter_ms=0, stream_chunk_ms=0, upload_ms=0)
+    # Les modules déjà importés gardent leur référence à google.generativeai
+    monkeypatch.setitem(sys.modules, 'google.generativeai', fake_genai)
+    for name, module in list(sys.modules.items()):
+        if name.startswith(('modules.', 'utils.')) and getattr(module, 'genai', None) is not None:
+            monkeypatch.setattr(module, 'genai', fake_genai)
+
+    # Base SQLite de app.py créée dans le répertoire courant
+    monkeypatch.chdir(tmp_path)
+    SQLiteDatabase('simandou_data.db')
+    with sqlite3.connect('simandou_data.db') as conn:
+        conn.execute("INSERT INTO users (username, password_hash) VALUES ('alice', ?)",
+                     (hashlib.sha256(b"secret").hexdigest(),))
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets['GOOGLE_API_KEY'] = 'fake-api-key'
+    at.run()
+    at.text_input[0].input('alice')
+    at.text_input[1].input('secret')
+    at.button[0].click().run()
+    yield at
+    fake_genai.reset()
+
+
+def _welcome_shown(at):
+    return any('welcome-card' in element.value for element in at.markdown)
+
+
+def test_welcome_card_hidden_after_first_message(app):
+    assert not app.exception
+    assert _welcome_shown(app)
+
+    app.chat_input[0].set_value("Bonjour Simandou").run()
+    assert not app.exception and not app.error
+    assert fake_genai.stats().get('stream', 0) + fake_genai.stats().get('generate', 0) == 1
+    assert not _welcome_shown(app)
+
+    app.run()
+    assert not _welcome_shown(app)
+
+
+def _sidebar_count(at):
+    return next(element.value for element in at.sidebar.markdown if 'requêtes utilisées' in element.value)
+
+
+def test_quota_counter_refreshed_after_each_message(app):
+    database = SQLiteDatabase('simandou_data.db')
+    assert _sidebar_count(app) == "**0/15** requêtes utilisées"
+
+    for turn in range(2):
+        app.chat_input[0].set_value(f"Question {turn}").run()
+        assert not app.exception
+        count = database.get_daily_request_count('alice')
+        assert count > 0
+        assert _sidebar_count(app) == f"**{count}/15** requêtes utilisées"
@@ -0,0 +1,76 @@
+"""
+Tests de l'export groupé des archives (modules.archive_export)
+
+Usage : python -m pytest -q tests/test_archive_export.py
+"""
+import io
+import json
+import zipfile
+
+import pytest
+
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+from modules import archive_export
+from modules.archive_export import ArchiveExporter, EXPORT_FORMATS, ExportTooLargeError
+
+ARCHIVES = [
+    {'id': index, 'title': f"Archive {index}", 'timestamp': "2026-01-01T10:00:00",
+     'history': [{'role': 'user', 'text': f"Question {index}"},
+                 {'role': 'model', 'text': f"Réponse {index}"}]}
+    for index in range(1, 4)
+]
+
+
+class FakeDatabase:
+    def iter_user_archives(self, username, batch_size=200):
+        yield from ARCHIVES
+
+
+def _download(export_format, formats=('json', 'txt')):
+    """Passe par le chemin réel de st.download_button(data=callable) : exécution différée au clic"""
+    exporter = ArchiveExporter(FakeDatabase(), 'alice')
+    storage = MemoryMediaFileStorage('/media')
+    manager = MediaFileManager(storage)
+    file_id = manager.add_deferred(
+        lambda: exporter.download_data(export_format, formats),
+        EXPORT_FORMATS[export_format][0],
+        'export-coordinates',
+        exporter.export_file_name(export_format)
+    )
+    url = manager.execute_deferred(file_id)
+    media_file = storage.get_file(url.rsplit('/', 1)[-1].split('.', 1)[0])
+    return media_file
+
+
+def test_ndjson_download_through_deferred_callable():
+    media_file = _download('ndjson')
+    lines = media_file.content.decode('utf-8').splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [1, 2, 3]
+    assert media_file.mimetype == EXPORT_FORMATS['ndjson'][0]
+
+
+def test_zip_download_through_deferred_callable():
+    media_file = _download('zip')
+    with zipfile.ZipFile(io.BytesIO(media_file.content)) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+    assert len(names) == 6
+    assert sum(name.startswith('txt/') for name in names) == 3
+
+
+def test_download_data_leaves_no_temporary_file(tmp_path, monkeypatch):
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    with ArchiveExporter(FakeDatabase(), 'alice').download_data('ndjson') as f:
+        # Fichier servi ouvert en lecture, déjà retiré du disque
+        assert list(tmp_path.iterdir()) == []
+        assert f.read().count(b"\n") == 3
+
+
+def test_download_data_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    monkeypatch.setattr(archive_export, 'EXPORT_MAX_BYTES', 100)
+    with pytest.raises(ExportTooLargeError):
+        ArchiveExporter(FakeDatabase(), 'alice').download_data('ndjson')
+    assert list(tmp_path.iterdir()) == []
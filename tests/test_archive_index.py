@@ -0,0 +1,35 @@
+"""
+Tests de la recherche dans les archives (modules.archive_index) et de
+DocumentIndex.has_terms
+
+Usage : python -m pytest -q tests/test_archive_index.py
+"""
+from modules.archive_index import ArchiveIndex
+from modules.document_index import DocumentIndex
+
+HISTORY = [
+    {'role': 'user' if index % 2 == 0 else 'model',
+     'text': f"Message {index} sur le minerai de fer de Simandou. " + "Détails du chantier. " * 40}
+    for index in range(20)
+]
+HISTORY[6]['text'] = "Quel est le calendrier du chemin de fer transguinéen ?"
+HISTORY[7]['text'] = "Le transguinéen doit relier Simandou au port de Morebaya."
+
+
+def test_has_terms():
+    index = DocumentIndex.from_text("Le port de Morebaya accueillera le minerai.")
+    assert index.has_terms("Où est Morebaya ?")
+    assert not index.has_terms("Quel budget pour Conakry ?")
+    assert not index.has_terms("")
+
+
+def test_context_keeps_relevant_question_and_answer():
+    context, count = ArchiveIndex(HISTORY).build_context("transguinéen", max_tokens=300)
+    assert "[message 7]" in context and "[message 8]" in context
+    assert 0 < count < len(HISTORY)
+
+
+def test_context_without_matching_terms_keeps_the_end():
+    context, _ = ArchiveIndex(HISTORY).build_context("Conakry", max_tokens=1000)
+    assert f"[message {len(HISTORY)}]" in context
+    assert "[message 1]" not in context
@@ -0,0 +1,126 @@
+"""
+Tests du pipeline audio par segments (modules.audio_pipeline), avec le faux
+backend Gemini (testing.fake_genai), un ModelManager réel et une base SQLite
+
+Usage : python -m pytest -q tests/test_audio_pipeline.py
+"""
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from testing import fake_genai
+from modules import audio_pipeline, model_manager
+from modules.audio_pipeline import AudioPipeline, TranscriptionBudget, TranscriptionLimitError
+from modules.database_sqlite import SQLiteDatabase
+from modules.model_manager import ModelManager
+
+SEGMENTS = 3
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    fake_genai.reset()
+    fake_genai.configure_fake(latency_ms=0, jitter_ms=0, upload_ms=0)
+    monkeypatch.setattr(model_manager, 'genai', fake_genai)
+    monkeypatch.setattr(audio_pipeline, 'genai', fake_genai)
+    yield ModelManager('fake-api-key')
+    fake_genai.reset()
+
+
+@pytest.fixture
+def database(tmp_path):
+    db_path = str(tmp_path / 'audio.db')
+    database = SQLiteDatabase(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO users (username, password_hash) VALUES ('alice', 'x')")
+    # Premier appel du jour : initialise le compteur journalier
+    database.check_and_update_requests('alice')
+    return database
+
+
+@pytest.fixture
+def audio(tmp_path, monkeypatch):
+    audio_path = tmp_path / 'audio.opus'
+    audio_path.write_bytes(b"opus")
+
+    def _split(path, output_dir):
+        segments = []
+        for index in range(SEGMENTS):
+            segment = f"{output_dir}/segment_{index:04d}.ogg"
+            with open(segment, 'wb') as f:
+                f.write(f"segment {index}".encode('utf-8'))
+            segments.append(segment)
+        return segments
+
+    monkeypatch.setattr(AudioPipeline, 'split', staticmethod(_split))
+    return str(audio_path)
+
+
+def test_segments_use_model_manager_and_user_quota(manager, database, audio):
+    budget = TranscriptionBudget(manager, database, 'alice')
+    transcript, failed, segment_count = AudioPipeline.transcribe(audio, 'video-1', budget)
+
+    assert (failed, segment_count) == (0, SEGMENTS)
+    assert transcript.count("Réponse simulée (gemini-2.5-flash)") == SEGMENTS
+    assert [line[:10] for line in transcript.split("\n\n")] == ["[00:00:00]", "[00:10:00]", "[00:20:00]"]
+    assert manager.usage_counters['default']['minute_count'] == SEGMENTS
+    assert database.get_daily_request_count('alice') == budget.charged == SEGMENTS
+    stats = fake_genai.stats()
+    assert stats['generate'] == stats['upload'] == stats['delete_file'] == SEGMENTS
+
+
+def test_cached_segments_are_not_charged_again(manager, database, audio):
+    AudioPipeline.transcribe(audio, 'video-2', TranscriptionBudget(manager, database, 'alice'))
+    budget = TranscriptionBudget(manager, database, 'alice')
+    transcript, failed, _ = AudioPipeline.transcribe(audio, 'video-2', budget)
+
+    assert failed == 0 and budget.charged == 0
+    assert transcript == AudioPipeline.get_cached_transcript('video-2')
+    assert manager.usage_counters['default']['minute_count'] == SEGMENTS
+    assert database.get_daily_request_count('alice') == SEGMENTS
+
+
+def test_daily_quota_stops_transcription(manager, database, audio):
+    for _ in range(database.MAX_FREE_REQUESTS - 1):
+        database.increment_request_count('alice')
+
+    budget = TranscriptionBudget(manager, database, 'alice')
+    _, failed, segment_count = AudioPipeline.transcribe(audio, 'video-3', budget)
+
+    assert (segment_count - failed, budget.charged) == (1, 1)
+    assert database.get_daily_request_count('alice') == database.MAX_FREE_REQUESTS
+    assert fake_genai.stats()['generate'] == 1
+
+
+def test_rate_limit_is_enforced(manager, monkeypatch):
+    manager.usage_counters['default'].update(minute_count=ModelManager.RPM_LIMITS['default'],
+                                             minute_start=datetime.now())
+    sleeps = []
+    monkeypatch.setattr(audio_pipeline.time, 'sleep', sleeps.append)
+
+    # Fenêtre de la minute presque terminée : attente, puis place libérée
+    monkeypatch.setattr(manager, 'seconds_until_reset', lambda model_type: 0.5)
+    calls = iter([False, False, True])
+    monkeypatch.setattr(manager, 'reserve', lambda model_type: next(calls))
+    TranscriptionBudget(manager, max_wait=10).acquire()
+    assert sleeps == [0.5, 0.5]
+
+
+def test_rate_limit_gives_up_after_max_wait(manager):
+    manager.usage_counters['default'].update(minute_count=ModelManager.RPM_LIMITS['default'],
+                                             minute_start=datetime.now())
+    with pytest.raises(TranscriptionLimitError):
+        TranscriptionBudget(manager, max_wait=0).acquire()
+    assert manager.usage_counters['default']['minute_count'] == ModelManager.RPM_LIMITS['default']
+
+
+def test_failed_segments_are_reported(manager, database, audio):
+    fake_genai.configure_fake(error_rate=1.0)
+    budget = TranscriptionBudget(manager, database, 'alice')
+    transcript, failed, segment_count = AudioPipeline.transcribe(audio, 'video-4', budget)
+
+    assert failed == segment_count == SEGMENTS
+    assert budget.charged == 0 and database.get_daily_request_count('alice') == 0
+    assert transcript.count("(transcription indisponible pour cet extrait)") == SEGMENTS
+    assert fake_genai.stats()['delete_file'] == SEGMENTS
@@ -0,0 +1,40 @@
+"""
+Tests de la base SQLite locale (modules.database_sqlite)
+
+Usage : python -m pytest -q tests/test_database_sqlite.py
+"""
+import json
+import sqlite3
+
+import pytest
+
+from modules.database_sqlite import SQLiteDatabase
+
+
+@pytest.fixture
+def database(tmp_path):
+    db_path = str(tmp_path / 'simandou_test.db')
+    database = SQLiteDatabase(db_path)
+    with sqlite3.connect(db_path) as conn:
+        user_id = conn.execute("INSERT INTO users (username, password_hash) VALUES ('alice', 'x')").lastrowid
+        rows = [
+            ("Première", json.dumps([{'role': 'user', 'text': "Bonjour"}])),
+            ("Corrompue", '[{"role": "user", "text": "tronqu'),
+            ("Vide", ''),
+            ("Dernière", json.dumps([{'role': 'model', 'text': "Au revoir"}])),
+        ]
+        conn.executemany("INSERT INTO chat_archives (user_id, title, chat_data) VALUES (?, ?, ?)",
+                         [(user_id, title, data) for title, data in rows])
+    return database
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 200])
+def test_iter_user_archives_skips_corrupt_rows(database, batch_size):
+    archives = list(database.iter_user_archives('alice', batch_size=batch_size))
+    assert [archive['title'] for archive in archives] == ["Première", "Vide", "Dernière"]
+    assert archives[1]['history'] == []
+    assert archives[2]['history'] == [{'role': 'model', 'text': "Au revoir"}]
+
+
+def test_iter_user_archives_unknown_user(database):
+    assert list(database.iter_user_archives('bob')) == []
@@ -0,0 +1,26 @@
+"""
+Tests du moteur de téléchargement (modules.downloader) : erreur remontée par
+les segments parallèles
+
+Usage : python -m pytest -q tests/test_downloader.py
+"""
+import pytest
+
+from modules.downloader import Downloader, DownloadError, DownloadTooLargeError
+
+
+def test_parallel_save_raises_the_first_segment_error(tmp_path, monkeypatch):
+    downloader = Downloader('http://localhost/fichier', segments=4)
+    downloader.total_size = 4096
+
+    def _stream_range(self, f, start, end, response=None):
+        if end == self.total_size:
+            raise DownloadTooLargeError("Fichier trop volumineux")
+        # Les autres segments s'arrêtent sur l'annulation provoquée par le dernier
+        assert self._cancelled.wait(5)
+        raise DownloadError("Téléchargement annulé")
+
+    monkeypatch.setattr(Downloader, '_stream_range', _stream_range)
+
+    with pytest.raises(DownloadTooLargeError):
+        downloader._save_parallel(str(tmp_path / 'fichier.bin'))
@@ -0,0 +1,125 @@
+"""
+Tests du client HTTP à cache disque (modules.http_client) contre un serveur local
+
+Usage : python -m pytest -q tests/test_http_client.py
+"""
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from modules import http_client
+from modules.http_client import cached_get, HTTP_CACHE_NAMESPACE
+from utils.config import get_cache_dir
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Ressources versionnées : /etag (revalidation), /fresh (max-age), /nostore"""
+    protocol_version = 'HTTP/1.1'
+    version = 'v1'
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        _Handler.requests.append((self.path, self.headers.get('If-None-Match')))
+        etag = f'"{_Handler.version}"'
+        cache_control = {'/etag': 'no-cache', '/fresh': 'max-age=60', '/nostore': 'no-store'}.get(self.path)
+        if cache_control is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.end_headers()
+            return
+
+        body = f"contenu {_Handler.version} de {self.path}".encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    _Handler.version = 'v1'
+    _Handler.requests = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_etag_revalidation_serves_cached_body_on_304(server):
+    first = cached_get(f"{server}/etag")
+    assert (first.status_code, first.text, first.from_cache) == (200, "contenu v1 de /etag", False)
+
+    second = cached_get(f"{server}/etag")
+    assert (second.status_code, second.text, second.from_cache) == (200, "contenu v1 de /etag", True)
+    assert _Handler.requests == [('/etag', None), ('/etag', '"v1"')]
+
+
+def test_etag_change_replaces_cached_body(server):
+    cached_get(f"{server}/etag")
+    _Handler.version = 'v2'
+
+    response = cached_get(f"{server}/etag")
+    assert (response.text, response.from_cache) == ("contenu v2 de /etag", False)
+    assert cached_get(f"{server}/etag").text == "contenu v2 de /etag"
+    assert _Handler.requests[-1] == ('/etag', '"v2"')
+
+
+def test_max_age_serves_from_cache_without_request(server, monkeypatch):
+    now = time.time()
+    assert cached_get(f"{server}/fresh").from_cache is False
+    assert cached_get(f"{server}/fresh").from_cache is True
+    assert len(_Handler.requests) == 1
+
+    # Au-delà de max-age : requête conditionnelle, contenu inchangé (304)
+    monkeypatch.setattr(http_client.time, 'time', lambda: now + 61)
+    response = cached_get(f"{server}/fresh")
+    assert (response.text, response.from_cache) == ("contenu v1 de /fresh", True)
+    assert _Handler.requests[-1] == ('/fresh', '"v1"')
+
+
+def test_no_store_is_never_cached(server):
+    cached_get(f"{server}/nostore")
+    assert cached_get(f"{server}/nostore").from_cache is False
+    assert len(_Handler.requests) == 2
+
+
+def test_cache_directory_holds_only_complete_entries(server):
+    for path in ('/etag', '/fresh', '/nostore'):
+        cached_get(f"{server}{path}")
+    names = sorted(os.listdir(get_cache_dir(HTTP_CACHE_NAMESPACE)))
+    assert len(names) == 4
+    assert all(name.endswith(('.body', '.json')) for name in names)
+
+
+def test_interrupted_body_write_leaves_no_entry(server, monkeypatch):
+    from utils import cache
+
+    def _failing_replace(src, dst):
+        raise OSError("disque plein")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(cache.os, 'replace', _failing_replace)
+        assert cached_get(f"{server}/fresh").text == "contenu v1 de /fresh"
+    assert os.listdir(get_cache_dir(HTTP_CACHE_NAMESPACE)) == []
+
+    assert cached_get(f"{server}/fresh").from_cache is False
+    assert len(_Handler.requests) == 2
@@ -0,0 +1,90 @@
+"""
+Tests du pré-traitement local des médias (modules.media_preprocessing)
+
+Usage : python -m pytest -q tests/test_media_preprocessing.py
+"""
+import os
+import subprocess
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from modules import media_preprocessing
+from utils import process_pool
+
+
+@pytest.fixture
+def media_pool():
+    yield
+    process_pool.shutdown(media_preprocessing.MEDIA_POOL)
+
+
+def test_broken_pool_is_replaced(media_pool):
+    with pytest.raises(BrokenProcessPool):
+        process_pool.get_pool(media_preprocessing.MEDIA_POOL, 1).submit(os._exit, 1).result(timeout=60)
+
+    assert process_pool.submit(media_preprocessing.MEDIA_POOL, 1, pow, 2, 10).result(timeout=60) == 1024
+
+
+def _fake_ffmpeg(tmp_path, exit_code):
+    """Faux ffmpeg : écrit quelques octets dans le fichier de sortie (dernier argument), puis sort"""
+    script = tmp_path / f"ffmpeg_{exit_code}"
+    script.write_text(f'#!/bin/sh\nfor last; do :; done\nprintf "partial" > "$last"\nexit {exit_code}\n')
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_interrupted_transcode_leaves_no_cache_entry(tmp_path):
+    source = tmp_path / 'clip.mov'
+    source.write_bytes(b"video")
+    output_base = str(tmp_path / 'out' / 'key')
+    os.makedirs(os.path.dirname(output_base))
+
+    with pytest.raises(subprocess.CalledProcessError):
+        media_preprocessing._preprocess_video(str(source), output_base, _fake_ffmpeg(tmp_path, 1))
+    assert os.listdir(os.path.dirname(output_base)) == []
+
+
+def test_successful_transcode_is_renamed_into_place(tmp_path):
+    source = tmp_path / 'clip.mov'
+    source.write_bytes(b"video")
+    output_base = str(tmp_path / 'out' / 'key')
+    os.makedirs(os.path.dirname(output_base))
+
+    output_path, mime_type = media_preprocessing._preprocess_video(str(source), output_base, _fake_ffmpeg(tmp_path, 0))
+    assert (output_path, mime_type) == (output_base + '.mp4', 'video/mp4')
+    assert os.listdir(os.path.dirname(output_base)) == ['key.mp4']
+
+
+@pytest.mark.skipif(media_preprocessing.Image is None, reason="Pillow non installé")
+def test_failed_image_encode_leaves_no_cache_entry(tmp_path, monkeypatch):
+    source = tmp_path / 'photo.jpg'
+    media_preprocessing.Image.new('RGB', (64, 64), 'red').save(source)
+    output_base = str(tmp_path / 'out' / 'key')
+    os.makedirs(os.path.dirname(output_base))
+
+    def _failing_save(self, path, *args, **kwargs):
+        with open(path, 'wb') as f:
+            f.write(b"partial")
+        raise OSError("disque plein")
+
+    monkeypatch.setattr(media_preprocessing.Image.Image, 'save', _failing_save)
+    with pytest.raises(OSError):
+        media_preprocessing._preprocess_image(str(source), output_base)
+    assert os.listdir(os.path.dirname(output_base)) == []
+
+
+@pytest.mark.skipif(media_preprocessing.Image is None, reason="Pillow non installé")
+def test_larger_proxy_is_not_recomputed(tmp_path, media_pool, monkeypatch):
+    # Petite image déjà compressée : la version ré-encodée n'est pas plus légère
+    source = tmp_path / 'icon.png'
+    media_preprocessing.Image.new('RGB', (8, 8), 'red').save(source, optimize=True)
+    assert media_preprocessing.MediaPreprocessor.preprocess(str(source), 'image/png') is None
+
+    def _unexpected_submit(*args):
+        raise AssertionError("pré-traitement relancé")
+
+    monkeypatch.setattr(process_pool, 'submit', _unexpected_submit)
+    assert media_preprocessing.MediaPreprocessor.preprocess(str(source), 'image/png') is None
+    cache_dir = os.path.join(os.environ['SIMANDOU_CACHE_DIR'], media_preprocessing.MEDIA_CACHE_NAMESPACE)
+    assert [name.split('.', 1)[1] for name in os.listdir(cache_dir)] == ['skip']
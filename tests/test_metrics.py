@@ -0,0 +1,109 @@
+"""
+Tests des métriques : agrégation multiprocessus de prometheus_client (processus
+séparés écrivant dans le même METRICS_DIR) et décorateur timed_methods.
+
+Usage : python -m pytest -q tests/test_metrics.py
+"""
+import os
+import sys
+import subprocess
+
+import pytest
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from utils.metrics import timed_methods
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import sys
+from utils.metrics import CHAT_REQUESTS, mark_session_active
+CHAT_REQUESTS.labels(model='default', mode='text', status='ok').inc(int(sys.argv[1]))
+mark_session_active('session-' + sys.argv[1])
+print('ready', flush=True)
+sys.stdin.readline()
+"""
+
+
+@pytest.fixture
+def metrics_env(tmp_path):
+    env = dict(os.environ, METRICS_DIR=str(tmp_path / 'metrics'), METRICS_PORT='0',
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get('PYTHONPATH')])))
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    return env
+
+
+def _aggregate(env):
+    output = subprocess.run([sys.executable, '-m', 'utils.metrics', '--print'], env=env, cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    values = {}
+    for line in output.splitlines():
+        if line.startswith(('simandou_chat_requests_total{', 'simandou_active_sessions ')):
+            name, value = line.rsplit(' ', 1)
+            values[name.split('{', 1)[0]] = float(value)
+    return values
+
+
+def _start_worker(env, amount):
+    worker = subprocess.Popen([sys.executable, '-c', WORKER, str(amount)], env=env, cwd=ROOT_DIR,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    assert worker.stdout.readline().strip() == 'ready'
+    return worker
+
+
+def _stop_worker(worker):
+    worker.communicate('\n', timeout=30)
+    assert worker.returncode == 0
+
+
+def test_counters_are_summed_once_across_processes(metrics_env):
+    first = _start_worker(metrics_env, 2)
+    second = _start_worker(metrics_env, 3)
+    try:
+        assert _aggregate(metrics_env) == {'simandou_chat_requests_total': 5, 'simandou_active_sessions': 2}
+        _stop_worker(first)
+        # Processus arrêté : son compteur reste cumulé, sa jauge disparaît
+        assert _aggregate(metrics_env) == {'simandou_chat_requests_total': 5, 'simandou_active_sessions': 1}
+        # Collectes répétées : rien n'est déplacé ni compté deux fois
+        assert _aggregate(metrics_env)['simandou_chat_requests_total'] == 5
+    finally:
+        _stop_worker(second)
+    assert _aggregate(metrics_env) == {'simandou_chat_requests_total': 5, 'simandou_active_sessions': 0}
+
+
+def test_timed_methods_records_durations_and_errors():
+    registry = CollectorRegistry()
+    seconds = Histogram('test_call_seconds', "Durée", ('component', 'method'), registry=registry)
+    errors = Counter('test_call_errors_total', "Erreurs", ('component', 'method'), registry=registry)
+
+    @timed_methods(seconds, errors, component='test')
+    class Component:
+        @staticmethod
+        def ok():
+            return 'ok'
+
+        def fail(self):
+            raise ValueError("échec")
+
+        def _private(self):
+            return 'private'
+
+        def stream(self):
+            yield 'item'
+
+    assert Component.ok() == 'ok'
+    with pytest.raises(ValueError):
+        Component().fail()
+    Component()._private()
+    list(Component().stream())
+
+    def sample(name, method):
+        return registry.get_sample_value(name, {'component': 'test', 'method': method})
+
+    assert sample('test_call_seconds_count', 'ok') == 1
+    assert sample('test_call_seconds_count', 'fail') == 1
+    assert sample('test_call_errors_total', 'fail') == 1
+    assert sample('test_call_errors_total', 'ok') == 0
+    # Méthodes privées et générateurs : non chronométrés
+    assert sample('test_call_seconds_count', '_private') is None
+    assert sample('test_call_seconds_count', 'stream') is None
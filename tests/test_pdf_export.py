@@ -0,0 +1,99 @@
+"""
+Tests du rendu PDF des archives (modules.pdf_export)
+
+Usage : python -m pytest -q tests/test_pdf_export.py
+"""
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+import pytest
+from reportlab.lib.pagesizes import letter
+
+from modules import pdf_export
+from utils import process_pool
+from modules.pdf_export import (PdfExportJobs, render_archive_pdf, markdown_flowables, get_fonts, _styles,
+                                PDF_MARGIN)
+
+
+def _archive(text):
+    return {'id': 1, 'title': "Emphases", 'timestamp': "2026-01-01T10:00:00",
+            'history': [{'role': 'user', 'text': text}]}
+
+
+def _pdf_text(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype='pdf') as document:
+        return "".join(page.get_text() for page in document)
+
+
+@pytest.mark.parametrize('line, expected', [
+    ("**bold *italic** text*", "**bold *italic** text*"),
+    ("*a **b* c**", "*a **b* c**"),
+    ("- **x *y** z*", "**x *y** z*"),
+    ("## *titre **croisé* ici**", "*titre **croisé* ici**"),
+    ("1. **un *deux** trois*", "**un *deux** trois*"),
+])
+def test_crossed_emphasis_falls_back_to_plain_text(line, expected):
+    pdf = render_archive_pdf(_archive(line), 'alice')
+    assert pdf.startswith(b"%PDF")
+    assert expected in _pdf_text(pdf)
+
+
+def test_well_formed_emphasis_keeps_markup():
+    fonts = get_fonts()
+    flowables = markdown_flowables("du **gras** et de l'*italique*", _styles(fonts), fonts,
+                                   letter[0] - 2 * PDF_MARGIN)
+    assert "<b>gras</b>" in flowables[0].text
+    assert flowables[0].getPlainText() == "du gras et de l'italique"
+
+
+def test_crossed_emphasis_does_not_break_the_other_messages():
+    archive = _archive("*a **b* c**")
+    archive['history'].append({'role': 'model', 'text': "Réponse **correcte**"})
+    text = _pdf_text(render_archive_pdf(archive, 'alice'))
+    assert "*a **b* c**" in text
+    assert "Réponse correcte" in text
+
+
+@pytest.fixture
+def pdf_pool():
+    yield
+    with pdf_export._jobs_lock:
+        pdf_export._jobs.clear()
+    process_pool.shutdown(pdf_export.PDF_POOL)
+
+
+def _wait_status(archive, timeout=60):
+    deadline = time.monotonic() + timeout
+    status, detail = PdfExportJobs.status(archive, 'alice')
+    while status == 'running' and time.monotonic() < deadline:
+        time.sleep(0.05)
+        status, detail = PdfExportJobs.status(archive, 'alice')
+    return status, detail
+
+
+def test_failed_job_stays_failed_until_resubmitted(pdf_pool):
+    # Message sans rôle : le rendu échoue dans le processus de travail
+    archive = {'id': 7, 'title': "Invalide", 'timestamp': "2026-01-01T10:00:00", 'history': [{'text': "x"}]}
+    PdfExportJobs.submit(archive, 'alice')
+    status, detail = _wait_status(archive)
+    assert status == 'failed'
+    assert 'role' in detail
+    # Réaffichage complet de la page : l'échec est toujours visible
+    assert PdfExportJobs.status(archive, 'alice') == ('failed', detail)
+
+    failed = pdf_export._jobs[PdfExportJobs.cache_key(archive, 'alice')]
+    PdfExportJobs.submit(archive, 'alice')
+    assert pdf_export._jobs[PdfExportJobs.cache_key(archive, 'alice')] is not failed
+
+
+def test_broken_pool_is_replaced(pdf_pool):
+    with pytest.raises(BrokenProcessPool):
+        process_pool.get_pool(pdf_export.PDF_POOL, pdf_export.PDF_MAX_WORKERS).submit(os._exit, 1).result(timeout=60)
+
+    archive = _archive("Rendu après un processus tué")
+    PdfExportJobs.submit(archive, 'alice')
+    status, path = _wait_status(archive)
+    assert status == 'ready'
+    assert os.path.getsize(path) > 0
@@ -0,0 +1,73 @@
+"""
+Tests du journal des requêtes lentes : plan capturé pour execute, ni paramètres
+ni plan pour executemany, rotation du journal et statistiques par processus.
+
+Usage : python -m pytest -q tests/test_query_log.py
+"""
+import os
+import json
+import sqlite3
+
+import pytest
+
+from utils import query_log
+from utils.cache import append_log_line
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    # Toute instruction est lente : chacune est journalisée
+    monkeypatch.setattr(query_log, 'SLOW_QUERY_MS', 0)
+    monkeypatch.setattr(query_log, '_explained', set())
+    monkeypatch.setattr(query_log, '_stats', {})
+    conn = query_log.QueryLogConnection(sqlite3.connect(':memory:'), 'sqlite')
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    yield conn
+    conn.close()
+
+
+def _slow_log():
+    with open(os.path.join(query_log._log_dir(), query_log.SLOW_LOG_FILE), encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_execute_logs_redacted_parameters_and_plan(connection):
+    connection.execute("SELECT name FROM items WHERE id = ?", (1,))
+
+    entry = _slow_log()[-1]
+    assert entry['statement'] == "SELECT name FROM items WHERE id = ?"
+    assert entry['parameters'] == ['<int>']
+    assert entry['plan'] and 'items' in entry['plan'][0]
+
+
+def test_executemany_logs_neither_parameters_nor_plan(connection, monkeypatch):
+    explained = []
+    monkeypatch.setattr(query_log, '_explain', lambda *args: explained.append(args))
+
+    connection.executemany("INSERT INTO items (name) VALUES (?)", [('a',), ('b',)])
+    connection.cursor().executemany("INSERT INTO items (name) VALUES (?)", [('c',)])
+
+    entries = [entry for entry in _slow_log() if entry['statement'].startswith('INSERT')]
+    assert len(entries) == 2
+    assert all(entry['parameters'] is None and entry['plan'] is None for entry in entries)
+    assert explained == []
+
+
+def test_stats_are_flushed_atomically(connection):
+    connection.execute("SELECT COUNT(*) FROM items")
+    query_log.flush()
+
+    stats = query_log.load_stats()
+    assert stats[('sqlite', 'SELECT COUNT(*) FROM items')][0] == 1
+    assert not [name for name in os.listdir(query_log._log_dir()) if name.startswith('.tmp-')]
+
+
+def test_log_is_rotated_beyond_max_bytes(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    append_log_line(path, 'x' * 20, max_bytes=10)
+    append_log_line(path, 'y', max_bytes=10)
+
+    with open(path + '.1', encoding='utf-8') as f:
+        assert f.read() == 'x' * 20 + '\n'
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'y\n'
@@ -0,0 +1,89 @@
+"""
+Tests de l'analyse des sous-titres (modules.subtitles) : VTT, SRT, json3,
+répétitions des sous-titres glissants et ancres [HH:MM:SS]
+
+Usage : python -m pytest -q tests/test_subtitles.py
+"""
+import json
+
+from modules.subtitles import parse_subtitles
+
+# Sous-titres automatiques YouTube : chaque réplique reprend la ligne précédente,
+# avec une réplique de transition de 10 ms et un minutage mot à mot
+AUTO_VTT = """WEBVTT
+Kind: captions
+Language: fr
+
+NOTE généré automatiquement
+par YouTube
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+
+le<00:00:00.500><c> projet</c><00:00:01.000><c> Simandou</c>
+
+00:00:02.000 --> 00:00:02.010 align:start position:0%
+le projet Simandou
+
+
+00:00:02.010 --> 00:00:04.000 align:start position:0%
+le projet Simandou
+prévoit<00:00:02.500><c> une</c><00:00:03.000><c> ligne</c>
+
+"""
+
+SRT = """1
+00:00:01,000 --> 00:00:02,000
+Vous venez demain ?
+
+2
+00:00:03,500 --> 00:00:04,000
+Oui.
+
+3
+00:00:05,000 --> 00:00:05,500
+Oui.
+
+4
+00:00:07,000 --> 00:00:08,000
+<i>Et vous &amp; votre équipe ?</i>
+"""
+
+
+def test_auto_vtt_keeps_each_spoken_word_once():
+    transcript = parse_subtitles(AUTO_VTT, 'vtt', with_timestamps=False)
+    assert transcript == "le projet Simandou prévoit une ligne"
+
+
+def test_srt_cleans_tags_and_keeps_repeated_short_lines():
+    transcript = parse_subtitles(SRT, 'srt', with_timestamps=False)
+    assert transcript == "Vous venez demain ? Oui. Oui. Et vous & votre équipe ?"
+
+
+def test_json3_rolling_events_are_deduplicated():
+    events = [
+        {'tStartMs': 0, 'dDurationMs': 4000, 'segs': [{'utf8': "le projet"}, {'utf8': " Simandou"}]},
+        {'tStartMs': 2000, 'aAppend': 1, 'segs': [{'utf8': "\n"}]},
+        {'tStartMs': 2000, 'dDurationMs': 4000, 'segs': [{'utf8': "le projet Simandou\nprévoit une ligne"}]},
+        {'tStartMs': 9000, 'dDurationMs': 500, 'segs': [{'utf8': "Oui."}]},
+        {'tStartMs': 12000, 'dDurationMs': 500, 'segs': [{'utf8': "Oui."}]},
+    ]
+    transcript = parse_subtitles(json.dumps({'events': events}), 'json3', with_timestamps=False)
+    assert transcript == "le projet Simandou prévoit une ligne Oui. Oui."
+
+
+def test_timestamps_anchor_one_paragraph_per_minute():
+    cues = []
+    for index, seconds in enumerate((5, 30, 65, 3725)):
+        clock = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        cues.append(f"{index + 1}\n{clock},000 --> {clock},900\nRéplique {index + 1}\n")
+    transcript = parse_subtitles("\n".join(cues), 'srt', with_timestamps=True)
+    assert transcript.split("\n\n") == [
+        "[00:00:05] Réplique 1 Réplique 2",
+        "[00:01:05] Réplique 3",
+        "[01:02:05] Réplique 4",
+    ]
+
+
+def test_transcript_is_truncated_to_max_chars():
+    transcript = parse_subtitles(SRT, 'srt', with_timestamps=False, max_chars=10)
+    assert transcript == "Vous venez"
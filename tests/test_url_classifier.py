@@ -0,0 +1,32 @@
+"""
+Tests de la classification des URL (modules.url_classifier) sans réseau :
+hôtes YouTube, extensions, signatures et Content-Type
+
+Usage : python -m pytest -q tests/test_url_classifier.py
+"""
+import pytest
+
+from modules.url_classifier import UrlClassifier, sniff_content, _type_from_content_type
+
+
+@pytest.mark.parametrize('url', [
+    "https://youtube.com/@chaine",
+    "https://m.youtube.com/feed",
+    "https://youtu.be/",
+])
+def test_youtube_hosts(url):
+    assert UrlClassifier.classify_static(url) == 'youtube'
+
+
+@pytest.mark.parametrize('url', [
+    "https://notyoutube.com/page",
+    "https://fakeyoutu.be/page",
+])
+def test_lookalike_hosts_are_not_youtube(url):
+    assert UrlClassifier.classify_static(url) is None
+
+
+def test_pdf_has_one_label_for_extension_signature_and_content_type():
+    assert UrlClassifier.classify_static("https://exemple.org/rapport.pdf?v=2") == 'document'
+    assert sniff_content(b"%PDF-1.7\n") == 'document'
+    assert _type_from_content_type("application/pdf; charset=binary") == 'document'
@@ -0,0 +1,162 @@
+"""
+Tests de l'espace de travail multi-documents (modules.workspace)
+
+Usage : python -m pytest -q tests/test_workspace.py
+"""
+import types
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+import streamlit as st
+
+from testing import fake_genai
+from modules import file_state, file_processing, workspace as workspace_module
+from modules.file_processing import FileProcessor
+from modules.file_state import FileStateCache
+from modules.workspace import DocumentWorkspace
+
+
+class FakeDatabase:
+    def __init__(self, documents=None):
+        self.saved = []
+        self.documents = documents or {}
+
+    def save_conversation_document(self, username, document, conversation_key='active'):
+        self.saved.append((conversation_key, dict(document)))
+
+    def get_conversation_documents(self, username, conversation_key='active'):
+        return [dict(document) for document in self.documents.get(conversation_key, [])]
+
+
+def _gemini_file(name):
+    return types.SimpleNamespace(name=name, display_name='rapport.pdf', mime_type='application/pdf',
+                                 expiration_time=datetime.now() + timedelta(hours=48))
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_state, '_states', {})
+    for key in list(st.session_state):
+        del st.session_state[key]
+
+    local_path = tmp_path / 'rapport.pdf'
+    local_path.write_bytes(b"%PDF-1.4 contenu")
+    FileStateCache.record(_gemini_file('files/old'), str(local_path), 'application/pdf')
+
+    workspace = DocumentWorkspace(FakeDatabase())
+    workspace._documents()['file:abc'] = {'key': 'file:abc', 'remote_name': 'files/old', 'status': 'ready'}
+    workspace._files()['files/old'] = _gemini_file('files/old')
+    st.session_state.document_indexes = {'files/old': 'index'}
+    return workspace
+
+
+def test_failed_reupload_keeps_local_copy_pointer(workspace, monkeypatch):
+    monkeypatch.setattr(FileProcessor, 'reupload', staticmethod(lambda *args: None))
+
+    assert workspace.refresh_file('alice', 'files/old') is None
+
+    assert FileStateCache.get_local_copy('files/old') is not None
+    assert FileStateCache.get('files/old')['needs_check'] is True
+    assert workspace._documents()['file:abc']['status'] == 'expired'
+    assert st.session_state.document_indexes == {'files/old': 'index'}
+
+
+def test_failed_reupload_can_be_retried(workspace, monkeypatch):
+    monkeypatch.setattr(FileProcessor, 'reupload', staticmethod(lambda *args: None))
+    workspace.refresh_file('alice', 'files/old')
+
+    calls = []
+
+    def _reupload(local_path, display_name, mime_type):
+        calls.append(local_path)
+        return _gemini_file('files/new')
+
+    monkeypatch.setattr(FileProcessor, 'reupload', staticmethod(_reupload))
+    new_file = workspace.refresh_file('alice', 'files/old')
+
+    assert new_file.name == 'files/new' and len(calls) == 1
+    assert FileStateCache.get('files/old') is None
+    assert workspace._documents()['file:abc'] == {'key': 'file:abc', 'remote_name': 'files/new', 'status': 'ready'}
+    assert st.session_state.document_indexes == {'files/new': 'index'}
+    assert workspace.get_ready_files() == [new_file]
+
+
+def _stored_document(key, remote_name):
+    return {'key': key, 'display_name': key, 'source_type': 'file', 'source': key,
+            'remote_name': remote_name, 'mime_type': 'text/plain', 'status': 'ready', 'error': None}
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    fake_genai.reset()
+    fake_genai.configure_fake(latency_ms=0, jitter_ms=0, upload_ms=0)
+    monkeypatch.setattr(workspace_module, 'genai', fake_genai)
+    monkeypatch.setattr(file_processing, 'genai', fake_genai)
+    monkeypatch.setattr(file_state, '_states', {})
+    for key in list(st.session_state):
+        del st.session_state[key]
+    yield
+    fake_genai.reset()
+
+
+def test_viewed_archive_documents_are_loaded(fake_backend):
+    active_file = fake_genai.upload_file(__file__, display_name='actif.txt')
+    archived_file = fake_genai.upload_file(__file__, display_name='archive.txt')
+    database = FakeDatabase({'active': [_stored_document('file:actif', active_file.name)],
+                             'archive:7': [_stored_document('file:archive', archived_file.name)]})
+    workspace = DocumentWorkspace(database)
+
+    st.session_state.viewing_archive_id = 7
+    workspace.load('alice')
+    assert [document['key'] for document in workspace.get_documents()] == ['file:archive']
+    assert [item.name for item in workspace.get_ready_files()] == [archived_file.name]
+
+    # Retour à la conversation active : ses documents sont rechargés
+    st.session_state.viewing_archive_id = None
+    workspace.load('alice')
+    assert [document['key'] for document in workspace.get_documents()] == ['file:actif']
+
+
+def test_pool_threads_do_not_render(fake_backend, monkeypatch):
+    script_thread = threading.current_thread()
+    rendering_threads = []
+    shown = []
+
+    class _Status:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def update(self, **kwargs):
+            pass
+
+    def _render(*args, **kwargs):
+        rendering_threads.append(threading.current_thread())
+        return _Status()
+
+    def _show(message, level='write'):
+        rendering_threads.append(threading.current_thread())
+        shown.append(message)
+
+    monkeypatch.setattr(workspace_module, 'show', _show)
+    monkeypatch.setattr(st, 'status', _render)
+    monkeypatch.setattr(st, 'write', _render)
+
+    class _Upload:
+        name, type = 'note.txt', 'text/plain'
+
+        @staticmethod
+        def getvalue():
+            return "Note de synthèse".encode('utf-8')
+
+    database = FakeDatabase()
+    processed = DocumentWorkspace(database).ingest('alice', [DocumentWorkspace.file_source(_Upload)])
+
+    assert [document['status'] for document in processed] == ['ready']
+    # Étapes de l'envoi affichées avec le résultat, depuis le thread du script
+    assert any(message.startswith("📤 Envoi de **note.txt**") for message in shown)
+    assert rendering_threads and all(thread is script_thread for thread in rendering_threads)
+    assert [conversation_key for conversation_key, _ in database.saved] == ['active']
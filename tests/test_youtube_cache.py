@@ -0,0 +1,176 @@
+"""
+Tests du cache des métadonnées YouTube (modules.youtube_cache) et de son
+utilisation par MediaExtractor (yt-dlp et sous-titres remplacés, sans réseau)
+
+Usage : python -m pytest -q tests/test_youtube_cache.py
+"""
+import json
+import os
+import time
+import types
+
+import pytest
+
+from modules import media_extraction, youtube_cache
+from modules.media_extraction import MediaExtractor
+from modules.youtube_cache import YouTubeMetadataCache, YOUTUBE_CACHE_TTL, SUBTITLE_URL_TTL, EMPTY_TRANSCRIPT_TTL
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+JSON3 = json.dumps({'events': [{'tStartMs': 0, 'dDurationMs': 2000,
+                                'segs': [{'utf8': "Le projet"}, {'utf8': " Simandou"}]}]})
+
+
+def _info(video_id=VIDEO_ID):
+    return {
+        'id': video_id, 'title': "Conférence Simandou", 'duration': 3600, 'channel': 'Simandou TV',
+        'view_count': 12, 'description': "Présentation", 'formats': [{'format_id': '18'}],
+        'subtitles': {},
+        'automatic_captions': {'fr': [{'ext': 'json3', 'url': f"https://subs.example/{video_id}.json3"},
+                                      {'ext': 'mhtml', 'url': "https://subs.example/ignored"}],
+                               'de': [{'ext': 'json3', 'url': "https://subs.example/de.json3"}]},
+    }
+
+
+@pytest.mark.parametrize('url', [
+    f"https://www.youtube.com/watch?v={VIDEO_ID}",
+    f"https://www.youtube.com/watch?feature=share&v={VIDEO_ID}&t=42s",
+    f"https://m.youtube.com/watch?v={VIDEO_ID}",
+    f"https://music.youtube.com/watch?v={VIDEO_ID}&list=RD",
+    f"https://youtu.be/{VIDEO_ID}?si=abc",
+    f"https://www.youtube.com/shorts/{VIDEO_ID}",
+    f"https://www.youtube.com/embed/{VIDEO_ID}",
+    f"https://www.youtube-nocookie.com/embed/{VIDEO_ID}",
+    f"https://www.youtube.com/live/{VIDEO_ID}?feature=shared",
+    f"  HTTPS://WWW.YOUTUBE.COM/watch?v={VIDEO_ID}  ",
+])
+def test_video_id_from_url_forms(url):
+    assert YouTubeMetadataCache.video_id(url) == VIDEO_ID
+
+
+@pytest.mark.parametrize('url', [
+    "https://www.youtube.com/watch?v=tooshort",
+    f"https://www.youtube.com/watch?v={VIDEO_ID}extra",
+    f"https://example.com/watch?v={VIDEO_ID}",
+    f"https://youtube.com.evil.example/watch?v={VIDEO_ID}",
+    "https://www.youtube.com/channel/UCabcdefghijk",
+    "https://youtu.be/",
+    "pas une url",
+    None,
+])
+def test_video_id_rejects_other_urls(url):
+    assert YouTubeMetadataCache.video_id(url) is None
+
+
+def test_store_info_keeps_useful_subset():
+    subset = YouTubeMetadataCache.store_info(VIDEO_ID, _info())
+    assert 'formats' not in subset
+    assert subset['automatic_captions'] == {'fr': [{'ext': 'json3', 'url': f"https://subs.example/{VIDEO_ID}.json3"}]}
+    assert YouTubeMetadataCache.get(VIDEO_ID)['info'] == subset
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = time.time()
+    YouTubeMetadataCache.store_info(VIDEO_ID, _info())
+    YouTubeMetadataCache.store_transcript(VIDEO_ID, _info(), "Le projet Simandou")
+
+    # Après quelques heures, les URL signées des sous-titres ne sont plus réutilisées
+    monkeypatch.setattr(youtube_cache.time, 'time', lambda: now + SUBTITLE_URL_TTL + 1)
+    assert YouTubeMetadataCache.get(VIDEO_ID)['transcript'] == "Le projet Simandou"
+    assert YouTubeMetadataCache.get_info(VIDEO_ID) is None
+
+    monkeypatch.setattr(youtube_cache.time, 'time', lambda: now + YOUTUBE_CACHE_TTL + 1)
+    assert YouTubeMetadataCache.get(VIDEO_ID) is None
+
+
+def test_empty_transcript_expires_after_short_ttl(monkeypatch):
+    now = time.time()
+    YouTubeMetadataCache.store_transcript(VIDEO_ID, _info(), "")
+    assert YouTubeMetadataCache.get_transcript(VIDEO_ID)[1] == ""
+
+    # Aucune piste exploitable : nouvel essai bien avant l'expiration de l'entrée
+    monkeypatch.setattr(youtube_cache.time, 'time', lambda: now + EMPTY_TRANSCRIPT_TTL + 1)
+    assert YouTubeMetadataCache.get_transcript(VIDEO_ID) is None
+    assert YouTubeMetadataCache.get(VIDEO_ID) is not None
+
+
+class _StubYoutubeDL:
+    """Remplace yt_dlp.YoutubeDL et compte les extractions"""
+    calls = []
+
+    def __init__(self, options):
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url, download=False):
+        _StubYoutubeDL.calls.append(url)
+        return _info(YouTubeMetadataCache.video_id(url))
+
+
+@pytest.fixture
+def stub_youtube(monkeypatch):
+    _StubYoutubeDL.calls = []
+    subtitle_requests = []
+
+    def _cached_get(url, **kwargs):
+        subtitle_requests.append(url)
+        return types.SimpleNamespace(status_code=200, text=JSON3)
+
+    monkeypatch.setattr(media_extraction.yt_dlp, 'YoutubeDL', _StubYoutubeDL)
+    monkeypatch.setattr(media_extraction, 'cached_get', _cached_get)
+    return subtitle_requests
+
+
+def _transcript(url):
+    path, name, mime_type = MediaExtractor.extract_youtube_transcript(url)
+    assert mime_type == 'text/plain'
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    os.unlink(path)
+    return content
+
+
+def test_cache_hit_skips_extract_info(stub_youtube):
+    first = _transcript(f"https://www.youtube.com/watch?v={VIDEO_ID}")
+    assert "Le projet Simandou" in first
+    assert len(_StubYoutubeDL.calls) == 1 and len(stub_youtube) == 1
+
+    # Autre forme d'URL de la même vidéo : transcription servie par le cache
+    second = _transcript(f"https://youtu.be/{VIDEO_ID}")
+    assert len(_StubYoutubeDL.calls) == 1 and len(stub_youtube) == 1
+    assert second.split("\n", 2)[2] == first.split("\n", 2)[2]
+
+
+def test_expired_entry_calls_extract_info_again(stub_youtube, monkeypatch):
+    now = time.time()
+    _transcript(f"https://www.youtube.com/watch?v={VIDEO_ID}")
+
+    monkeypatch.setattr(youtube_cache.time, 'time', lambda: now + YOUTUBE_CACHE_TTL + 1)
+    _transcript(f"https://www.youtube.com/watch?v={VIDEO_ID}")
+    assert len(_StubYoutubeDL.calls) == 2
+
+
+def test_missing_subtitles_are_retried_after_short_ttl(stub_youtube, monkeypatch):
+    now = time.time()
+    responses = iter([types.SimpleNamespace(status_code=404, text=""),
+                      types.SimpleNamespace(status_code=200, text=JSON3)])
+    monkeypatch.setattr(media_extraction, 'cached_get', lambda url, **kwargs: next(responses))
+
+    # Sous-titres indisponibles : la description les remplace, résultat mémorisé peu de temps
+    assert "Le projet Simandou" not in _transcript(f"https://youtu.be/{VIDEO_ID}")
+    assert "Le projet Simandou" not in _transcript(f"https://youtu.be/{VIDEO_ID}")
+    assert len(_StubYoutubeDL.calls) == 1
+
+    monkeypatch.setattr(youtube_cache.time, 'time', lambda: now + EMPTY_TRANSCRIPT_TTL + 1)
+    assert "Le projet Simandou" in _transcript(f"https://youtu.be/{VIDEO_ID}")
+
+
+def test_audio_download_does_not_store_metadata(stub_youtube):
+    # Aucun fichier audio produit par le faux yt-dlp : téléchargement abandonné
+    assert MediaExtractor.download_youtube_audio(f"https://youtu.be/{VIDEO_ID}",
+                                                 progress=lambda *args: None) == (None, None, None)
+    assert _StubYoutubeDL.calls and YouTubeMetadataCache.get(VIDEO_ID) is None
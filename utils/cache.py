@@ -0,0 +1,134 @@
+"""
+Cache local adressé par contenu (hash SHA-256)
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+from utils.config import get_cache_dir
+from utils.metrics import cache_lookup
+
+TMP_PREFIX = '.tmp-'  # Fichiers en cours d'écriture, ignorés par l'éviction
+
+_log_lock = threading.Lock()
+
+
+def hash_bytes(data):
+    """Calcule l'empreinte SHA-256 d'un contenu binaire"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Calcule l'empreinte SHA-256 d'un fichier sans le charger entièrement"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_path(namespace, key, suffix=''):
+    """Retourne le chemin du fichier de cache pour une clé donnée"""
+    return os.path.join(get_cache_dir(namespace), f"{key}{suffix}")
+
+
+def read_json_cache(namespace, key):
+    """Lit une entrée JSON du cache, None si absente ou illisible (consultation comptée par espace de noms)"""
+    path = get_cache_path(namespace, key, '.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = None
+    cache_lookup(namespace, data is not None)
+    return data
+
+
+def write_atomically(path, write):
+    """
+    Écrit path via un fichier temporaire du même répertoire, renommé en cas de succès :
+    une écriture interrompue ne laisse jamais de fichier tronqué. write(chemin temporaire)
+    produit le contenu ; le fichier temporaire garde l'extension de path (outils qui en
+    déduisent le format, comme ffmpeg).
+    """
+    extension = os.path.splitext(path)[1]
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=TMP_PREFIX, suffix=extension)
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return path
+
+
+def write_json_file(path, data):
+    """Écrit un fichier JSON de manière atomique"""
+    def _dump(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    return write_atomically(path, _dump)
+
+
+def write_bytes_file(path, data):
+    """Écrit un contenu binaire de manière atomique"""
+    def _dump(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    return write_atomically(path, _dump)
+
+
+def write_json_cache(namespace, key, data):
+    """Écrit une entrée JSON du cache de manière atomique"""
+    return write_json_file(get_cache_path(namespace, key, '.json'), data)
+
+
+def write_bytes_cache(namespace, key, suffix, data):
+    """Écrit un contenu binaire dans le cache de manière atomique"""
+    return write_bytes_file(get_cache_path(namespace, key, suffix), data)
+
+
+def append_log_line(path, line, max_bytes):
+    """
+    Ajoute une ligne à un journal local, renommé en .1 au-delà de max_bytes.
+    Journal de diagnostic : une erreur d'écriture est ignorée et ne bloque pas la requête.
+    """
+    with _log_lock:
+        try:
+            if os.path.exists(path) and os.path.getsize(path) > max_bytes:
+                os.replace(path, path + '.1')
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError:
+            pass
+
+
+def evict_lru(namespace, max_bytes):
+    """
+    Supprime les entrées les moins récemment utilisées (date de modification)
+    jusqu'à repasser sous max_bytes. Les fichiers d'une même clé sont supprimés ensemble.
+    """
+    entries = {}
+    total = 0
+    for entry in os.scandir(get_cache_dir(namespace)):
+        if not entry.is_file() or entry.name.startswith(TMP_PREFIX):
+            continue
+        stat = entry.stat()
+        key = entry.name.split('.', 1)[0]
+        last_used, size, paths = entries.get(key, (0, 0, []))
+        entries[key] = (max(last_used, stat.st_mtime), size + stat.st_size, paths + [entry.path])
+        total += stat.st_size
+
+    for last_used, size, paths in sorted(entries.values()):
+        if total <= max_bytes:
+            break
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        total -= size
@@ -0,0 +1,42 @@
+"""
+Exécution concurrente bornée (limite globale et par site) pilotée par asyncio
+"""
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_with_host_limits(items, worker, host_of, on_result=None, max_workers=4, per_host=2,
+                         initializer=None):
+    """
+    Exécute worker(item) pour chaque élément via asyncio : au plus max_workers
+    en parallèle, et au plus per_host par site. on_result(item, result, error)
+    est appelé dans le thread appelant, dans l'ordre de fin des traitements.
+    Retourne la liste des (item, result, error) dans l'ordre d'arrivée.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    async def _run(executor):
+        loop = asyncio.get_running_loop()
+        global_limit = asyncio.Semaphore(max_workers)
+        host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+        async def _one(item):
+            async with host_limits[host_of(item)], global_limit:
+                try:
+                    return item, await loop.run_in_executor(executor, worker, item), None
+                except Exception as e:
+                    return item, None, e
+
+        results = []
+        for next_done in asyncio.as_completed([_one(item) for item in items]):
+            item, result, error = await next_done
+            if on_result:
+                on_result(item, result, error)
+            results.append((item, result, error))
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), initializer=initializer) as executor:
+        return asyncio.run(_run(executor))
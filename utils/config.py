@@ -1,4 +1,5 @@
 import os
+import tempfile
 import streamlit as st
 
 def setup_config():
@@ -26,4 +27,11 @@ def get_db_config():
 
 def get_max_free_requests():
     """Récupère le nombre maximum de requêtes gratuites"""
-    return int(os.getenv('MAX_FREE_REQUESTS', 15))
\ No newline at end of file
+    return int(os.getenv('MAX_FREE_REQUESTS', 15))
+
+def get_cache_dir(namespace=None):
+    """Récupère le répertoire de cache local (créé si nécessaire)"""
+    base_dir = os.getenv('SIMANDOU_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'simandou_cache'))
+    cache_dir = os.path.join(base_dir, namespace) if namespace else base_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,24 @@
+"""
+Décorateurs de classe communs aux traces et aux métriques
+"""
+import inspect
+
+
+def wrap_public_methods(wrap):
+    """
+    Décorateur de classe : remplace chaque méthode publique (méthodes statiques
+    comprises) par wrap(func, nom). Les générateurs ne sont pas enveloppés :
+    leur exécution s'étale sur les itérations de l'appelant.
+    """
+    def decorator(cls):
+        for attribute, value in list(vars(cls).items()):
+            if attribute.startswith('_'):
+                continue
+            is_static = isinstance(value, staticmethod)
+            func = value.__func__ if is_static else value
+            if not inspect.isfunction(func) or inspect.isgeneratorfunction(func):
+                continue
+            wrapped = wrap(func, attribute)
+            setattr(cls, attribute, staticmethod(wrapped) if is_static else wrapped)
+        return cls
+    return decorator
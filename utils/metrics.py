@@ -0,0 +1,187 @@
+"""
+Métriques de l'application (compteurs, jauges, histogrammes) avec prometheus_client
+en mode multiprocessus : chaque processus écrit ses valeurs dans des fichiers
+mmap de METRICS_DIR, le processus qui détient le port HTTP local les agrège et
+sert /metrics.
+
+Usage (serveur autonome, sans Streamlit) : python -m utils.metrics [--port 9464]
+"""
+import os
+import time
+import atexit
+import argparse
+import functools
+import threading
+
+from utils.config import get_cache_dir
+from utils.decorators import wrap_public_methods
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9464))  # 0 : pas de serveur HTTP
+METRICS_DIR = os.getenv('METRICS_DIR', '')  # Par défaut : <cache>/metrics
+ACTIVE_SESSION_SECONDS = int(os.getenv('ACTIVE_SESSION_SECONDS', 300))
+
+if METRICS_ENABLED and not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    # Lu par prometheus_client à l'import : les valeurs vont dans des fichiers par processus
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = METRICS_DIR or get_cache_dir('metrics')
+
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+                               start_http_server)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 5 * 10 ** 7, 10 ** 8, 5 * 10 ** 8, 2 * 10 ** 9)
+TOKEN_BUCKETS = (256, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000, 256000, 1000000)
+
+_server = None
+_server_lock = threading.Lock()
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def timed_methods(histogram, errors=None, **constant_labels):
+    """
+    Décorateur de classe : durée de chaque méthode publique dans histogram,
+    étiquette « method ». Les exceptions sont comptées dans errors.
+    """
+    def wrap(func, method):
+        timer = histogram.labels(method=method, **constant_labels)
+        error_counter = errors.labels(method=method, **constant_labels) if errors is not None else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if error_counter is not None:
+                    error_counter.inc()
+                raise
+            finally:
+                timer.observe(time.perf_counter() - start)
+        return wrapper
+    return wrap_public_methods(wrap)
+
+
+def mark_session_active(session_id):
+    """
+    Signale une session Streamlit active (réexécution du script). La jauge est
+    recalculée à chaque signalement : les sessions inactives en sortent au suivant.
+    """
+    if not session_id:
+        return
+    now = time.time()
+    threshold = now - ACTIVE_SESSION_SECONDS
+    with _sessions_lock:
+        _sessions[session_id] = now
+        for known_id, last_seen in list(_sessions.items()):
+            if last_seen < threshold:
+                del _sessions[known_id]
+        ACTIVE_SESSIONS.set(len(_sessions))
+
+
+def _registry():
+    """Registre de collecte : agrégat des fichiers de tous les processus en mode multiprocessus"""
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import REGISTRY
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_text():
+    """Agrégat au format texte Prometheus"""
+    return generate_latest(_registry()).decode('utf-8')
+
+
+@atexit.register
+def _mark_process_dead():
+    # Les jauges « live » de ce processus disparaissent ; compteurs et histogrammes restent cumulés
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Sert /metrics dans un thread, une seule fois par processus. Si le port est
+    déjà pris (autre processus de l'application), c'est ce processus qui sert l'agrégat.
+    """
+    global _server
+    if not METRICS_ENABLED or not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server, _ = start_http_server(port, addr=host, registry=_registry())
+            except OSError:
+                _server = False
+                return None
+    return _server or None
+
+
+# === MÉTRIQUES DE L'APPLICATION ===
+
+CHAT_REQUESTS = Counter('simandou_chat_requests_total', "Requêtes de chat traitées",
+                        ('model', 'mode', 'status'))
+QUOTA_REJECTIONS = Counter('simandou_quota_rejections_total', "Requêtes refusées (limite journalière atteinte)")
+MODEL_SELECTIONS = Counter('simandou_model_selections_total', "Modèles choisis par la sélection automatique",
+                           ('model', 'reason'))
+GEMINI_LATENCY = Histogram('simandou_gemini_latency_seconds',
+                           "Durée de l'appel Gemini jusqu'à la réponse complète (non diffusée : "
+                           "égale au délai du premier jeton)", ('model', 'mode'), buckets=LATENCY_BUCKETS)
+GEMINI_PROMPT_TOKENS = Histogram('simandou_gemini_prompt_tokens', "Jetons envoyés par requête de chat",
+                                 ('model', 'mode'), buckets=TOKEN_BUCKETS)
+UPLOAD_BYTES = Histogram('simandou_upload_bytes', "Taille des fichiers importés (source) et envoyés à Gemini",
+                         ('kind', 'stage'), buckets=SIZE_BUCKETS)
+UPLOAD_SECONDS = Histogram('simandou_upload_seconds', "Durée de préparation, d'envoi et d'analyse d'un fichier",
+                           ('kind', 'status'), buckets=LATENCY_BUCKETS)
+FILE_CALL_SECONDS = Histogram('simandou_file_call_seconds', "Durée des méthodes de FileProcessor",
+                              ('component', 'method'), buckets=LATENCY_BUCKETS)
+MEDIA_CALL_SECONDS = Histogram('simandou_media_call_seconds', "Durée des méthodes de MediaExtractor",
+                               ('component', 'method'), buckets=LATENCY_BUCKETS)
+CALL_ERRORS = Counter('simandou_call_errors_total', "Exceptions levées par les méthodes instrumentées",
+                      ('component', 'method'))
+DB_QUERY_SECONDS = Histogram('simandou_db_query_seconds', "Durée des méthodes de la base de données",
+                             ('backend', 'method'), buckets=DB_BUCKETS)
+DB_ERRORS = Counter('simandou_db_errors_total', "Exceptions levées par les méthodes de la base de données",
+                    ('backend', 'method'))
+CACHE_REQUESTS = Counter('simandou_cache_requests_total', "Consultations des caches (hit / miss)",
+                         ('cache', 'result'))
+ACTIVE_SESSIONS = Gauge('simandou_active_sessions',
+                        f"Sessions Streamlit actives ({ACTIVE_SESSION_SECONDS} dernières secondes)",
+                        multiprocess_mode='livesum')
+
+
+def cache_lookup(cache, hit):
+    """Compte une consultation de cache"""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+    return hit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sert les métriques agrégées de l'application")
+    parser.add_argument('--host', default=METRICS_HOST)
+    parser.add_argument('--port', type=int, default=METRICS_PORT)
+    parser.add_argument('--print', action='store_true', help="Affiche l'agrégat une fois et quitte")
+    args = parser.parse_args()
+
+    if args.print:
+        print(render_text(), end='')
+        return
+    if start_metrics_server(args.host, args.port) is None:
+        parser.error(f"port {args.port} indisponible")
+    print(f"Métriques servies sur http://{args.host}:{args.port}/metrics")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Pools de processus partagés par nom (rendu PDF, pré-traitement des médias...),
+créés à la demande et remplacés lorsqu'ils sont cassés
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(name, workers):
+    """Pool de processus partagé « name » (créé à la demande avec workers processus)"""
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+
+def submit(name, workers, fn, *args):
+    """
+    Soumet une tâche au pool partagé ; un pool cassé (processus de travail tué,
+    mémoire épuisée...) est abandonné et remplacé au lieu de refuser toute tâche
+    """
+    pool = get_pool(name, workers)
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        with _lock:
+            if _pools.get(name) is pool:
+                del _pools[name]
+        pool.shutdown(wait=False)
+        return get_pool(name, workers).submit(fn, *args)
+
+
+def shutdown(name, wait=True):
+    """Arrête le pool « name » (recréé au prochain appel)"""
+    with _lock:
+        pool = _pools.pop(name, None)
+    if pool is not None:
+        pool.shutdown(wait=wait)
@@ -0,0 +1,348 @@
+"""
+Journal des requêtes SQL lentes (SQLite et PostgreSQL) : chaque instruction est
+chronométrée, les instructions au-delà du seuil sont journalisées avec des
+paramètres masqués et leur plan d'exécution (EXPLAIN QUERY PLAN / EXPLAIN ANALYZE).
+Les statistiques par instruction alimentent un rapport des plus coûteuses.
+
+Usage : python -m utils.query_log [--top 15] [--sort total|mean|max|calls] [--plans] [--reset]
+"""
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import argparse
+import contextlib
+import threading
+from functools import lru_cache
+from datetime import datetime
+
+from utils.cache import append_log_line, write_json_file
+from utils.config import get_cache_dir
+
+QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 50))
+SLOW_QUERY_PLAN = os.getenv('SLOW_QUERY_PLAN', 'true').lower() in ('1', 'true', 'yes')
+QUERY_LOG_DIR = os.getenv('QUERY_LOG_DIR', '')  # Par défaut : <cache>/query_log
+QUERY_LOG_MAX_BYTES = int(os.getenv('QUERY_LOG_MAX_BYTES', 20 * 1024 * 1024))  # Au-delà : rotation en .1
+QUERY_STATS_FLUSH_SECONDS = 30
+SLOW_LOG_FILE = 'slow_queries.jsonl'
+
+# Instructions dont le plan peut être demandé (pas de DDL ni de PRAGMA)
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+_stats = {}  # (base, instruction normalisée) -> [appels, total ns, max ns, lentes]
+_explained = set()  # Plan capturé une fois par instruction et par processus
+_lock = threading.Lock()
+_process = {'pid': None, 'instance': None, 'flushed': 0.0}
+
+
+def _log_dir():
+    if QUERY_LOG_DIR:
+        os.makedirs(QUERY_LOG_DIR, exist_ok=True)
+        return QUERY_LOG_DIR
+    return get_cache_dir('query_log')
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement):
+    """Instruction sur une ligne (espaces réduits) : clé d'agrégation des statistiques"""
+    return re.sub(r'\s+', ' ', statement).strip()
+
+
+def redact_parameters(parameters):
+    """Paramètres masqués : seuls le type et la longueur sont conservés"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in parameters]
+    return _redact(parameters)
+
+
+def _redact(value):
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def _caller():
+    """Première fonction appelante hors de ce module (méthode de la base de données)"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename in (__file__, contextlib.__file__):
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else None
+
+
+def _explain(raw_cursor, backend, statement, parameters):
+    """Plan d'exécution sur la même connexion, dans un curseur séparé (None si indisponible)"""
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    if keyword not in EXPLAINABLE:
+        return None
+
+    connection = raw_cursor.connection
+    plan_cursor = connection.cursor()
+    try:
+        if backend == 'sqlite':
+            plan_cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+            depths = {0: -1}
+            lines = []
+            for row in plan_cursor.fetchall():
+                node_id, parent_id, detail = row[0], row[1], row[3]
+                depths[node_id] = depths.get(parent_id, -1) + 1
+                lines.append(f"{'  ' * depths[node_id]}{detail}")
+            return lines
+
+        # PostgreSQL : ANALYZE réexécute l'instruction, donc lecture seule uniquement.
+        # Le point de sauvegarde évite d'interrompre la transaction de l'appelant en cas d'échec.
+        analyze = keyword == 'SELECT'
+        plan_cursor.execute("SAVEPOINT query_log_explain")
+        try:
+            plan_cursor.execute(f"EXPLAIN {'(ANALYZE, BUFFERS) ' if analyze else ''}{statement}", parameters)
+            lines = [row[0] for row in plan_cursor.fetchall()]
+            plan_cursor.execute("RELEASE SAVEPOINT query_log_explain")
+            return lines
+        except Exception:
+            plan_cursor.execute("ROLLBACK TO SAVEPOINT query_log_explain")
+            return None
+    except Exception:
+        return None
+    finally:
+        plan_cursor.close()
+
+
+def _append_slow_log(entry):
+    line = json.dumps(entry, ensure_ascii=False, default=str)
+    append_log_line(os.path.join(_log_dir(), SLOW_LOG_FILE), line, QUERY_LOG_MAX_BYTES)
+
+
+def _record(raw_cursor, backend, statement, parameters, elapsed_ns, error=None, with_plan=True):
+    if _process['pid'] != os.getpid():
+        with _lock:
+            if _process['pid'] != os.getpid():
+                # Processus enfant (fork) : les statistiques héritées appartiennent au parent
+                _stats.clear()
+                _process.update(pid=os.getpid(), instance=f"{os.getpid()}_{time.time_ns()}",
+                                flushed=time.time())
+
+    normalized = normalize_statement(statement)
+    slow = elapsed_ns >= SLOW_QUERY_MS * 1e6
+    with _lock:
+        stats = _stats.get((backend, normalized))
+        if stats is None:
+            stats = _stats[(backend, normalized)] = [0, 0, 0, 0]
+        stats[0] += 1
+        stats[1] += elapsed_ns
+        stats[2] = max(stats[2], elapsed_ns)
+        stats[3] += slow
+        explain = (slow and with_plan and SLOW_QUERY_PLAN and error is None
+                   and (backend, normalized) not in _explained)
+        if explain:
+            _explained.add((backend, normalized))
+
+    if slow:
+        _append_slow_log({
+            'timestamp': datetime.now().isoformat(),
+            'backend': backend,
+            'duration_ms': round(elapsed_ns / 1e6, 3),
+            'statement': normalized,
+            'parameters': redact_parameters(parameters),
+            'caller': _caller(),
+            'error': error,
+            'plan': _explain(raw_cursor, backend, statement, parameters) if explain else None
+        })
+
+    if time.time() - _process['flushed'] >= QUERY_STATS_FLUSH_SECONDS:
+        flush()
+
+
+def flush():
+    """Écrit les statistiques de ce processus (fusionnées par le rapport)"""
+    if _process['instance'] is None:
+        return
+    with _lock:
+        _process['flushed'] = time.time()
+        rows = [[backend, statement] + values for (backend, statement), values in _stats.items()]
+    try:
+        write_json_file(os.path.join(_log_dir(), f"stats_{_process['instance']}.json"), rows)
+    except OSError:
+        pass
+
+
+atexit.register(flush)
+
+
+class QueryLogCursor:
+    """Curseur chronométré (execute / executemany), le reste est délégué au curseur d'origine"""
+
+    def __init__(self, cursor, backend):
+        self._cursor = cursor
+        self._backend = backend
+
+    def _timed(self, method, statement, args, kwargs, log_parameters=True):
+        start = time.perf_counter_ns()
+        error = None
+        try:
+            result = method(statement, *args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            parameters = (args[0] if args else next(iter(kwargs.values()), None)) if log_parameters else None
+            _record(self._cursor, self._backend, statement, parameters,
+                    time.perf_counter_ns() - start, error, with_plan=log_parameters)
+        # sqlite3 renvoie le curseur lui-même (appels chaînés)
+        return self if result is self._cursor else result
+
+    def execute(self, statement, *args, **kwargs):
+        return self._timed(self._cursor.execute, statement, args, kwargs)
+
+    def executemany(self, statement, *args, **kwargs):
+        # Les paramètres d'un lot ne sont pas journalisés (ni plan : un seul jeu ne serait pas représentatif)
+        return self._timed(self._cursor.executemany, statement, args, kwargs, log_parameters=False)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+
+class QueryLogConnection:
+    """Connexion dont les curseurs sont chronométrés"""
+
+    def __init__(self, connection, backend):
+        self._connection = connection
+        self._backend = backend
+
+    def cursor(self, *args, **kwargs):
+        return QueryLogCursor(self._connection.cursor(*args, **kwargs), self._backend)
+
+    def execute(self, statement, *args, **kwargs):
+        return self.cursor().execute(statement, *args, **kwargs)
+
+    def executemany(self, statement, *args, **kwargs):
+        return self.cursor().executemany(statement, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._connection, name, value)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._connection.__exit__(*exc_info)
+
+
+def wrap_connection(connection, backend):
+    """Connexion instrumentée (ou inchangée si QUERY_LOG_ENABLED=false)"""
+    return QueryLogConnection(connection, backend) if QUERY_LOG_ENABLED else connection
+
+
+# === RAPPORT ===
+
+def load_stats():
+    """Statistiques fusionnées de tous les processus : {(base, instruction): [appels, total, max, lentes]}"""
+    flush()
+    merged = {}
+    for entry in os.scandir(_log_dir()):
+        if not (entry.name.startswith('stats_') and entry.name.endswith('.json')):
+            continue
+        try:
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for backend, statement, calls, total_ns, max_ns, slow in rows:
+            current = merged.setdefault((backend, statement), [0, 0, 0, 0])
+            current[0] += calls
+            current[1] += total_ns
+            current[2] = max(current[2], max_ns)
+            current[3] += slow
+    return merged
+
+
+def load_plans():
+    """Dernier plan journalisé pour chaque instruction lente"""
+    plans = {}
+    path = os.path.join(_log_dir(), SLOW_LOG_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('plan'):
+                    plans[(entry['backend'], entry['statement'])] = entry['plan']
+    except OSError:
+        pass
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instructions SQL les plus coûteuses (temps cumulé)")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--sort', choices=['total', 'mean', 'max', 'calls'], default='total')
+    parser.add_argument('--plans', action='store_true', help="Affiche le plan capturé des instructions lentes")
+    parser.add_argument('--reset', action='store_true', help="Efface les statistiques et le journal")
+    args = parser.parse_args()
+
+    directory = _log_dir()
+    if args.reset:
+        for entry in os.scandir(directory):
+            if entry.name.startswith(('stats_', SLOW_LOG_FILE)):
+                os.unlink(entry.path)
+        print(f"Statistiques effacées ({directory})")
+        return
+
+    stats = load_stats()
+    if not stats:
+        print(f"Aucune statistique dans {directory}")
+        return
+
+    sort_keys = {
+        'total': lambda item: item[1][1],
+        'mean': lambda item: item[1][1] / item[1][0],
+        'max': lambda item: item[1][2],
+        'calls': lambda item: item[1][0],
+    }
+    rows = sorted(stats.items(), key=sort_keys[args.sort], reverse=True)[:args.top]
+    plans = load_plans() if args.plans else {}
+    grand_total = sum(values[1] for values in stats.values()) or 1
+
+    print(f"{'total ms':>10} {'%':>5} {'appels':>7} {'moy. ms':>8} {'max ms':>8} {'lentes':>6}  base      instruction")
+    for (backend, statement), (calls, total_ns, max_ns, slow) in rows:
+        print(f"{total_ns / 1e6:10.1f} {100 * total_ns / grand_total:5.1f} {calls:7d} {total_ns / calls / 1e6:8.2f} "
+              f"{max_ns / 1e6:8.2f} {slow:6d}  {backend:8s}  {statement[:110]}")
+        for line in plans.get((backend, statement), []):
+            print(f"{'':60s}↳ {line}")
+    print(f"\nSeuil des requêtes lentes : {SLOW_QUERY_MS:g} ms — journal : {os.path.join(directory, SLOW_LOG_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
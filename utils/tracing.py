@@ -0,0 +1,216 @@
+"""
+Traces légères des requêtes : spans imbriqués (contextvars) chronométrés à la
+nanoseconde, journal JSONL local (format natif ou OTLP/JSON OpenTelemetry) et
+historique en mémoire des dernières requêtes pour le panneau de débogage
+"""
+import os
+import json
+import time
+import secrets
+import functools
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from utils.cache import append_log_line
+from utils.config import get_cache_dir
+from utils.decorators import wrap_public_methods
+
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRACE_FORMAT = os.getenv('TRACE_FORMAT', 'jsonl')  # jsonl | otlp (OpenTelemetry, OTLP/JSON)
+TRACE_LOG_PATH = os.getenv('TRACE_LOG_PATH', '')  # Par défaut : <cache>/traces/traces.jsonl
+TRACE_LOG_MAX_BYTES = int(os.getenv('TRACE_LOG_MAX_BYTES', 20 * 1024 * 1024))  # Au-delà : rotation en .1
+TRACE_HISTORY = int(os.getenv('TRACE_HISTORY', 50))  # Requêtes conservées en mémoire
+TRACE_SERVICE_NAME = 'simandou-ai'
+
+# (trace, span) en cours dans le contexte d'exécution (thread ou tâche)
+_current_span = ContextVar('simandou_current_span', default=None)
+_recent = deque(maxlen=TRACE_HISTORY)
+
+
+def trace_log_path():
+    """Chemin du journal des traces"""
+    return TRACE_LOG_PATH or os.path.join(get_cache_dir('traces'), 'traces.jsonl')
+
+
+@contextmanager
+def _open_span(record, parent_id, name, attributes):
+    current = {
+        'span_id': secrets.token_hex(8),
+        'parent_id': parent_id,
+        'name': name,
+        'attributes': attributes,
+        'status': 'ok'
+    }
+    start = time.perf_counter_ns()
+    current['start_ns'] = start - record['perf_ns']
+    # list.append est atomique : les threads d'ingestion ajoutent leurs spans sans verrou
+    record['spans'].append(current)
+    token = _current_span.set((record, current))
+    try:
+        yield current
+    except Exception as e:
+        # Les interruptions de Streamlit (st.rerun, st.stop) ne sont pas des erreurs
+        current['status'] = 'error'
+        current['error'] = type(e).__name__
+        raise
+    finally:
+        current['duration_ns'] = time.perf_counter_ns() - start
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace(name, **attributes):
+    """
+    Trace une requête (span racine) : à la sortie, la trace est journalisée et
+    ajoutée à l'historique. Dans une trace déjà ouverte, se comporte comme span().
+    """
+    if not TRACE_ENABLED:
+        yield None
+        return
+
+    if _current_span.get() is not None:
+        with span(name, **attributes) as current:
+            yield current
+        return
+
+    record = {
+        'trace_id': secrets.token_hex(16),
+        'name': name,
+        'start_unix_ns': time.time_ns(),
+        'perf_ns': time.perf_counter_ns(),
+        'spans': []
+    }
+    try:
+        with _open_span(record, None, name, attributes) as root:
+            yield root
+    finally:
+        _finish(record)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Étape chronométrée de la requête en cours (sans effet hors d'une trace)"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    record, parent_span = parent
+    with _open_span(record, parent_span['span_id'], name, attributes) as current:
+        yield current
+
+
+def annotate(**attributes):
+    """Ajoute des attributs au span en cours (modèle choisi, mode...)"""
+    current = _current_span.get()
+    if current is not None:
+        current[1]['attributes'].update(attributes)
+
+
+def traced(name):
+    """Décorateur : un span par appel (appel direct, sans surcoût notable, hors d'une trace)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_methods(prefix):
+    """Décorateur de classe : un span « prefix.méthode » par appel de méthode publique"""
+    return wrap_public_methods(lambda func, method: traced(f"{prefix}.{method}")(func))
+
+
+def bind_current_span(func):
+    """Rattache au span courant les spans créés par func dans un autre thread (pool d'ingestion)"""
+    parent = _current_span.get()
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return wrapper
+
+
+# === EXPORT ===
+
+def _to_record(record):
+    """Trace au format natif (durées en nanosecondes, débuts relatifs au début de la requête)"""
+    root = record['spans'][0]
+    return {
+        'trace_id': record['trace_id'],
+        'name': record['name'],
+        'start': datetime.fromtimestamp(record['start_unix_ns'] / 1e9).isoformat(),
+        'start_unix_ns': record['start_unix_ns'],
+        'duration_ns': root.get('duration_ns', 0),
+        'attributes': root['attributes'],
+        'spans': [
+            {key: value for key, value in item.items() if key != 'attributes' or value}
+            for item in record['spans']
+        ]
+    }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _to_otlp(record):
+    """Trace au format OTLP/JSON (lisible par le récepteur otlpjsonfile d'OpenTelemetry)"""
+    base = record['start_unix_ns']
+    spans = []
+    for item in record['spans']:
+        start = base + item['start_ns']
+        attributes = dict(item['attributes'])
+        if item.get('error'):
+            attributes['error.type'] = item['error']
+        spans.append({
+            'traceId': record['trace_id'],
+            'spanId': item['span_id'],
+            'parentSpanId': item['parent_id'] or '',
+            'name': item['name'],
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(start),
+            'endTimeUnixNano': str(start + item.get('duration_ns', 0)),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()],
+            'status': {'code': 2} if item['status'] == 'error' else {}
+        })
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': TRACE_SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': 'simandou.tracing'}, 'spans': spans}]
+    }]}
+
+
+def _finish(record):
+    """Ajoute la trace terminée à l'historique et au journal"""
+    if not record['spans']:
+        return
+    exported = _to_record(record)
+    _recent.append(exported)
+
+    line = json.dumps(_to_otlp(record) if TRACE_FORMAT == 'otlp' else exported,
+                      ensure_ascii=False, default=str)
+    append_log_line(trace_log_path(), line, TRACE_LOG_MAX_BYTES)
+
+
+def recent_traces(limit=None):
+    """Dernières traces terminées dans ce processus, la plus récente en premier"""
+    traces = list(_recent)[::-1]
+    return traces[:limit] if limit else traces
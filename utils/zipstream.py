@@ -0,0 +1,96 @@
+"""
+Écriture de ZIP en flux à mémoire constante : chaque fichier est émis dès qu'il est
+ajouté, le répertoire central est accumulé dans un fichier temporaire (ZIP64 au-delà
+de 65 535 fichiers ou de 4 Go)
+"""
+import time
+import zlib
+import struct
+import tempfile
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+CENTRAL_SPOOL_BYTES = 1024 * 1024  # Au-delà, le répertoire central est écrit sur disque
+UTF8_FLAG = 0x800
+VERSION = 20
+VERSION_ZIP64 = 45
+UNIX_FILE_ATTRIBUTES = 0o100644 << 16
+
+
+def _dos_datetime(timestamp):
+    local = time.localtime(timestamp)
+    dos_time = (local.tm_hour << 11) | (local.tm_min << 5) | (local.tm_sec // 2)
+    dos_date = ((local.tm_year - 1980) << 9) | (local.tm_mon << 5) | local.tm_mday
+    return dos_time, dos_date
+
+
+class StreamingZipWriter:
+    """add() retourne les octets de chaque fichier, finish() ceux du répertoire central"""
+
+    def __init__(self):
+        self.offset = 0
+        self.count = 0
+        self._central = tempfile.SpooledTemporaryFile(max_size=CENTRAL_SPOOL_BYTES)
+        self._central_size = 0
+
+    def add(self, name, data, compress=True):
+        """Ajoute un fichier complet (contenu en mémoire) et retourne les octets à émettre"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        encoded_name = name.encode('utf-8')
+        crc = zlib.crc32(data)
+        if compress:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            payload = compressor.compress(data) + compressor.flush()
+            method = 8
+        else:
+            payload, method = data, 0
+        if len(data) >= ZIP64_LIMIT or len(payload) >= ZIP64_LIMIT:
+            raise ValueError(f"Fichier trop volumineux pour l'archive : {name}")
+
+        dos_time, dos_date = _dos_datetime(time.time())
+        local_header = struct.pack('<IHHHHHIIIHH', 0x04034b50, VERSION, UTF8_FLAG, method, dos_time, dos_date,
+                                   crc, len(payload), len(data), len(encoded_name), 0)
+
+        # Décalage au-delà de 4 Go : champ étendu ZIP64 dans le répertoire central
+        extra = b''
+        offset_field = self.offset
+        version = VERSION
+        if self.offset >= ZIP64_LIMIT:
+            extra = struct.pack('<HHQ', 0x0001, 8, self.offset)
+            offset_field = ZIP64_LIMIT
+            version = VERSION_ZIP64
+
+        central_record = struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | version, version, UTF8_FLAG,
+                                     method, dos_time, dos_date, crc, len(payload), len(data),
+                                     len(encoded_name), len(extra), 0, 0, 0, UNIX_FILE_ATTRIBUTES,
+                                     offset_field) + encoded_name + extra
+        self._central.write(central_record)
+        self._central_size += len(central_record)
+
+        chunk = local_header + encoded_name + payload
+        self.offset += len(chunk)
+        self.count += 1
+        return chunk
+
+    def finish(self, chunk_size=64 * 1024):
+        """Émet le répertoire central puis les enregistrements de fin (ZIP64 si nécessaire)"""
+        central_offset = self.offset
+        self._central.seek(0)
+        for chunk in iter(lambda: self._central.read(chunk_size), b''):
+            yield chunk
+        self._central.close()
+
+        end = b''
+        needs_zip64 = (self.count >= ZIP64_COUNT_LIMIT or central_offset >= ZIP64_LIMIT
+                       or self._central_size >= ZIP64_LIMIT)
+        if needs_zip64:
+            zip64_end_offset = central_offset + self._central_size
+            end += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, (3 << 8) | VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+                               self.count, self.count, self._central_size, central_offset)
+            end += struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1)
+
+        end += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0,
+                           min(self.count, ZIP64_COUNT_LIMIT), min(self.count, ZIP64_COUNT_LIMIT),
+                           min(self._central_size, ZIP64_LIMIT), min(central_offset, ZIP64_LIMIT), 0)
+        yield end